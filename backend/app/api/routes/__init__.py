@@ -1,3 +1,3 @@
-from . import jobs, camera, system, ws
+from . import jobs, camera, system, ws, uploads
 
-__all__ = ["jobs", "camera", "system", "ws"]
+__all__ = ["jobs", "camera", "system", "ws", "uploads"]
@@ -2,10 +2,9 @@
 Camera/Live Stream API Routes
 """
 from fastapi import APIRouter, HTTPException
-import cv2
 
 from app.models import CameraRequest, TestConnectionRequest
-from app.services.db import get_job
+from app.services import blocking, camera_probe
 from app.services.file_handler import handle_rtsp_source
 from app.core.live_detector import stop_live_stream, get_stream_counts, get_stream_analytics, is_stream_running
 
@@ -16,32 +15,27 @@ router = APIRouter()
 async def create_camera_stream(request: CameraRequest):
     """Create a live stream job from RTSP URL or webcam."""
     try:
-        task_id = handle_rtsp_source(request.stream_url, request.source_type)
+        task_id = await blocking.run_probe(handle_rtsp_source, request.stream_url, request.source_type)
         return {"taskId": task_id, "success": True}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out connecting to the stream")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Connection failed: {str(e)}")
 
 
 @router.post("/camera/test")
 async def test_camera_connection(request: TestConnectionRequest):
-    """Test connection to an RTSP stream."""
+    """Test connection to an RTSP stream (the result is reused briefly by create_camera_stream)."""
     try:
-        cap = cv2.VideoCapture(request.stream_url)
-        success = False
-        for _ in range(30):
-            success, frame = cap.read()
-            if success:
-                break
-        
-        if success:
-            height, width = frame.shape[:2]
-            cap.release()
-            return {"success": True, "width": width, "height": height}
-        else:
-            cap.release()
-            return {"success": False, "error": "Could not read frame from stream"}
+        frame = await blocking.run_probe(camera_probe.probe, request.stream_url)
+        height, width = frame.shape[:2]
+        return {"success": True, "width": width, "height": height}
+    except ValueError:
+        return {"success": False, "error": "Could not read frame from stream"}
+    except TimeoutError:
+        return {"success": False, "error": "Timed out connecting to the stream"}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
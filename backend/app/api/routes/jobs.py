@@ -1,19 +1,101 @@
 """
 Locus Jobs API Routes - CRUD operations for video processing jobs
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks, Request, Query
+from fastapi.responses import StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import os
 import csv
 import io
+import json
 
-from app.models import ProcessRequest, UpdateZonesRequest, RenameRequest
-from app.services.db import get_job, update_job, get_all_jobs, delete_job, clear_all_jobs
-from app.services.file_handler import handle_upload_file, safe_remove_file
-from app.services.processor import run_processing_pipeline
+from app.core import heatmap, overlay, track_cache
+from app.core.hls_writer import hls_dir, playlist_path
+from app.models import BatchProcessRequest, ProcessRequest, UpdateZonesRequest, RenameRequest
+from app.services import (
+    batch, blocking, frame_server, job_queue, progress as job_progress, response_cache, response_encoding
+)
+from app.services.db import (
+    PIPELINE_COLUMNS, get_job_fields, get_job_progress, get_job_video_path, job_exists, update_job, get_all_jobs,
+    delete_job, clear_all_jobs
+)
+from app.services.file_handler import handle_upload_file, safe_remove_file, safe_remove_dir
+from app.services.workers import run_job
 
 router = APIRouter()
 
+# Server-Sent Events: how often the registry is checked, and how often a
+# keepalive comment is sent when nothing changed (keeps proxies from timing out)
+PROGRESS_POLL_INTERVAL = 0.5
+PROGRESS_KEEPALIVE_INTERVAL = 15
+
+# A frame of a given upload never changes, so browsers may cache it for a long time
+FRAME_CACHE_CONTROL = "public, max-age=604800, immutable"
+
+# Job responses change whenever the job is written: browsers keep them but
+# revalidate every time (a 304 when the revision is unchanged)
+JOB_CACHE_CONTROL = "private, no-cache"
+
+# Job responses are negotiated (JSON or MessagePack, compressed or not)
+JOB_VARY = "Accept, Accept-Encoding"
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header lists the given ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+def _negotiate(request: Request):
+    """(media type, content encoding) for a request's Accept and Accept-Encoding headers."""
+    return (
+        response_encoding.negotiate_media_type(request.headers.get("accept")),
+        response_encoding.negotiate_encoding(request.headers.get("accept-encoding")),
+    )
+
+
+def _encode(content, media_type, encoding):
+    """Serialize (unless already bytes) and compress a body; returns (body, applied encoding)."""
+    body = content if isinstance(content, bytes) else response_encoding.serialize(content, media_type)
+    return response_encoding.compress(body, encoding)
+
+
+async def _encoded_response(content, media_type, encoding, headers=None, extra_headers=None, cache_key=None):
+    """
+    Response with a serialized, compressed body. Serialization and compression
+    run in a worker thread: a long job's payload takes hundreds of milliseconds.
+
+    Args:
+        extra_headers: Headers that belong to the body (e.g. Content-Disposition), cached with it
+        cache_key: (task_id, kind) to store the body in the response cache under headers["ETag"]
+    """
+    body, applied = await run_in_threadpool(_encode, content, media_type, encoding)
+    extra_headers = dict(extra_headers or {})
+    if applied:
+        extra_headers["Content-Encoding"] = applied
+    if cache_key is not None:
+        response_cache.put(*cache_key, headers["ETag"], body, extra_headers)
+    return Response(content=body, media_type=media_type, headers={**(headers or {}), **extra_headers})
+
+
+def _decoded(job):
+    """Decode every column of a JobRecord (so it happens in the calling worker thread), or None."""
+    return job.to_dict() if job else None
+
+
+def _cached_response(request: Request, task_id: str, kind: str, media_type: str, headers: dict):
+    """A 304 if the client's copy is current, else the cached body for headers["ETag"], else None."""
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    cached = response_cache.get(task_id, kind, headers["ETag"])
+    if cached is None:
+        return None
+    body, extra_headers = cached
+    return Response(content=body, media_type=media_type, headers={**headers, **extra_headers})
+
 
 @router.post("")
 async def upload_video(file: UploadFile = File(...)):
@@ -21,45 +103,106 @@ async def upload_video(file: UploadFile = File(...)):
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
-    task_id = handle_upload_file(file, "uploads/videos")
+    # Copying, hashing and frame extraction block; keep them off the event loop
+    task_id = await run_in_threadpool(handle_upload_file, file, "uploads/videos")
     return {"taskId": task_id, "success": True}
 
 
 @router.get("")
 async def list_jobs(status: str | None = None):
     """Get all jobs, optionally filtered by status."""
-    jobs = get_all_jobs(status=status)
+    jobs = await blocking.run_db(get_all_jobs, status=status)
     return jobs
 
 
-@router.delete("/all")
-async def clear_all_jobs_endpoint():
-    """Delete all jobs and all associated files."""
-    # Get all jobs first to clean up files
-    jobs = get_all_jobs()
-    
+# Columns needed to delete a job's files
+FILE_COLUMNS = ("id", "video_path", "frame_path", "external_video")
+
+
+def _delete_job_files(jobs):
+    """Delete the files of jobs (rows with FILE_COLUMNS); blocks, run it in the file pool."""
     for job in jobs:
-        # Clean up associated files
-        safe_remove_file(job.get("video_path"))
+        # Videos ingested in place from a watch folder are kept
+        if not job.get("external_video"):
+            safe_remove_file(job.get("video_path"))
         safe_remove_file(job.get("frame_path"))
         task_id = job.get("id")
         if task_id:
             output_path = os.path.join("uploads/outputs", f"output_{task_id}.mp4")
             safe_remove_file(output_path)
+            safe_remove_dir(hls_dir(task_id))
+            overlay.delete(task_id)
+            heatmap.delete(task_id)
+            frame_server.delete_index(task_id)
+
+
+@router.delete("/all")
+async def clear_all_jobs_endpoint():
+    """Delete all jobs and all associated files."""
+    # Get all jobs first to clean up files
+    jobs = await blocking.run_db(get_all_jobs, columns=FILE_COLUMNS)
+    await blocking.run_files(_delete_job_files, jobs)
     
-    # Clear database
-    clear_all_jobs()
+    # Clear database, cached tracks and cached responses
+    await blocking.run_db(clear_all_jobs)
+    await blocking.run_files(track_cache.clear)
+    response_cache.clear()
     return {"success": True, "deleted_count": len(jobs)}
 
 
+@router.post("/batch")
+async def process_jobs(request: BatchProcessRequest):
+    """
+    Process many jobs with the same zones, model and tracker settings.
+    Jobs are queued and run one at a time (or by the worker nodes when the job queue is enabled).
+    """
+    try:
+        submitted, skipped = await run_in_threadpool(batch.submit_jobs, request.taskIds, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "submitted": submitted, "skipped": skipped}
+
+
 @router.get("/{task_id}")
-async def get_job_details(task_id: str):
-    """Get details of a specific job."""
-    job = get_job(task_id)
+async def get_job_details(task_id: str, request: Request):
+    """
+    Get details of a specific job.
+
+    The ETag follows the job's revision (and the overlay/HLS files the response
+    points at) and the negotiated representation, so a client revalidating an
+    unchanged job gets a 304; completed jobs are served from the response cache.
+    Sent as MessagePack for `Accept: application/msgpack` and compressed per
+    Accept-Encoding.
+    """
+    job = await blocking.run_db(get_job_fields, task_id, ("revision",))
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    return {
+    # Progressive HLS output (only written when ffmpeg is available)
+    playlist = playlist_path(task_id)
+    has_playlist, has_overlay = await blocking.run_files(
+        lambda: (os.path.exists(playlist), overlay.exists(task_id))
+    )
+    
+    media_type, encoding = _negotiate(request)
+    kind = f"details-{response_encoding.representation(media_type, encoding)}"
+    
+    def make_etag(revision):
+        return f'"{task_id}-{revision}-{int(has_overlay)}{int(has_playlist)}-{kind}"'
+    
+    headers = {"ETag": make_etag(job["revision"]), "Cache-Control": JOB_CACHE_CONTROL, "Vary": JOB_VARY}
+    cached = _cached_response(request, task_id, kind, media_type, headers)
+    if cached is not None:
+        return cached
+    
+    # Reading and decoding a long job's analytics takes a while
+    job = await blocking.run_db(lambda: _decoded(get_job_fields(task_id)))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    # The job may have been written since the revision was read
+    headers["ETag"] = make_etag(job["revision"])
+    
+    content = {
         "id": job["id"],
         "name": job.get("name"),
         "filename": job.get("filename"),
@@ -73,46 +216,130 @@ async def get_job_details(task_id: str):
         "confidence": job.get("confidence", 35),
         "model": job.get("model", "yolo11n.pt"),
         "trackerConfig": job.get("tracker_config"),
+        "motionGate": job.get("motion_gate"),
+        "roi": job.get("roi_config"),
+        "renderVideo": bool(job.get("render_video", 1)),
+        "timeRanges": job.get("time_ranges"),
+        "externalVideo": bool(job.get("external_video")),  # Registered in place from a watch folder
+        "hasOverlay": has_overlay,
         "detectionData": job.get("detection_data", []),
         "dwellData": job.get("dwell_data", []),
         "lineCrossingData": job.get("line_crossing_data", {}),
         "heatmapData": job.get("heatmap_data"),
+        # 'preview' while only the approximate preview pass has finished, 'final' after the full pass
+        "resultQuality": job.get("result_quality"),
+        "preview": job.get("preview_data"),
+        "pipelineStats": job.get("pipeline_stats", {}),
         "processTime": job.get("process_time", 0),
+        "hlsPlaylist": playlist.replace("uploads/", "", 1) if has_playlist else None,
+        "contentHash": job.get("content_hash"),
         "sourceType": job.get("source_type", "file"),
         "streamUrl": job.get("stream_url"),
         "createdAt": job.get("created_at"),
+        "revision": job["revision"],
     }
+    cache_key = (task_id, kind) if job.get("status") == "completed" else None
+    return await _encoded_response(content, media_type, encoding, headers, cache_key=cache_key)
 
 
 @router.patch("/{task_id}")
 async def update_job_details(task_id: str, request: RenameRequest):
     """Rename a job."""
-    job = get_job(task_id)
-    if not job:
+    if not await blocking.run_db(job_exists, task_id):
         raise HTTPException(status_code=404, detail="Job not found")
     
-    update_job(task_id, name=request.name)
+    await blocking.run_db(update_job, task_id, name=request.name)
     return {"success": True}
 
 
 @router.delete("/{task_id}")
 async def remove_job(task_id: str):
     """Delete a job and all associated files."""
-    job = get_job(task_id)
+    job = await blocking.run_db(get_job_fields, task_id, FILE_COLUMNS)
     if job:
-        safe_remove_file(job.get("video_path"))
-        safe_remove_file(job.get("frame_path"))
-        output_path = os.path.join("uploads/outputs", f"output_{task_id}.mp4")
-        safe_remove_file(output_path)
+        await blocking.run_files(_delete_job_files, [job])
     
-    delete_job(task_id)
+    await blocking.run_db(delete_job, task_id)
+    response_cache.discard(task_id)
     return {"success": True}
 
 
+@router.get("/{task_id}/frame")
+async def get_frame(task_id: str, request: Request, t: float = 0.0, width: int | None = None):
+    """
+    Get the source video frame shown at time `t` (seconds) as a JPEG,
+    optionally downscaled to `width` pixels (e.g. for scrub thumbnails).
+    """
+    video_path = await blocking.run_db(get_job_video_path, task_id)
+    if not video_path or not os.path.exists(video_path):
+        raise HTTPException(status_code=404, detail="Video not found")
+    
+    # The frame index is enough to answer a revalidation without decoding
+    frame_idx, frame_time = await run_in_threadpool(frame_server.frame_time_for, task_id, video_path, t)
+    etag = f'"{task_id}-{frame_idx}-{width or 0}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": FRAME_CACHE_CONTROL,
+        "X-Frame-Index": str(frame_idx),
+        "X-Frame-Time": f"{frame_time:.3f}",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    jpeg, frame_idx, frame_time = await run_in_threadpool(frame_server.get_frame_jpeg, task_id, video_path, t, width)
+    if jpeg is None:
+        raise HTTPException(status_code=404, detail="Frame not available")
+    
+    return Response(content=jpeg, media_type="image/jpeg", headers=headers)
+
+
+@router.get("/{task_id}/overlay")
+async def get_overlay(task_id: str, request: Request, start: float = 0.0, end: float | None = None):
+    """
+    Get the per-frame annotations (boxes, track IDs, dot states) for frames with
+    start <= t < end (seconds on the source video's timeline), for drawing over
+    the original video. Zone counts over time are the job's detectionData.
+    """
+    if not overlay.exists(task_id):
+        raise HTTPException(status_code=404, detail="Overlay not found")
+    if end is not None and end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    
+    content = await run_in_threadpool(overlay.get_range, task_id, start, end)
+    media_type, encoding = _negotiate(request)
+    return await _encoded_response(content, media_type, encoding, {"Vary": JOB_VARY})
+
+
+@router.get("/{task_id}/heatmap")
+async def get_heatmap(
+    task_id: str,
+    request: Request,
+    resolution: int = heatmap.LEGACY_RESOLUTION,
+    classes: list[int] | None = Query(None),
+    start: float | None = None,
+    end: float | None = None,
+):
+    """
+    Get the activity heatmap at any resolution up to the stored base grid,
+    optionally filtered by class (?classes=0&classes=2) and time range in seconds
+    (widened to whole time slices).
+    """
+    if resolution < 1:
+        raise HTTPException(status_code=400, detail="resolution must be positive")
+    if start is not None and end is not None and end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if not heatmap.exists(task_id):
+        raise HTTPException(status_code=404, detail="Heatmap not found")
+    
+    content = await run_in_threadpool(heatmap.query, task_id, resolution, classes, start, end)
+    media_type, encoding = _negotiate(request)
+    return await _encoded_response(content, media_type, encoding, {"Vary": JOB_VARY})
+
+
 @router.get("/{task_id}/zones")
 async def get_zones(task_id: str):
     """Get zones for a job."""
-    job = get_job(task_id)
+    job = await blocking.run_db(get_job_fields, task_id, ("zones",))
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
@@ -122,46 +349,37 @@ async def get_zones(task_id: str):
 @router.put("/{task_id}/zones")
 async def update_zones(task_id: str, request: UpdateZonesRequest):
     """Update zones for a job."""
-    job = get_job(task_id)
-    if not job:
+    if not await blocking.run_db(job_exists, task_id):
         raise HTTPException(status_code=404, detail="Job not found")
     
     zones_data = [zone.model_dump() for zone in request.zones]
-    update_job(task_id, zones=zones_data)
+    await blocking.run_db(update_job, task_id, zones=zones_data)
     return {"success": True}
 
 
 @router.post("/{task_id}/process")
 async def process_job(task_id: str, request: ProcessRequest, background_tasks: BackgroundTasks):
     """Start processing a job."""
-    job = get_job(task_id)
+    job = await blocking.run_db(lambda: _decoded(get_job_fields(task_id, PIPELINE_COLUMNS)))
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    zones_data = [zone.model_dump() for zone in request.zones]
-    tracker_config = request.trackerConfig.model_dump() if request.trackerConfig else None
-    
-    update_job(
-        task_id,
-        zones=zones_data,
-        confidence=request.confidence,
-        model=request.model,
-        tracker_config=tracker_config,
-        status="processing"
-    )
+    try:
+        args = batch.job_args(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    await blocking.run_db(batch.mark_processing, task_id, args)
     
     if job.get("source_type") in ("rtsp", "webcam"):
         return {"success": True, "redirect": f"/live/{task_id}"}
     
-    background_tasks.add_task(
-        run_processing_pipeline,
-        task_id,
-        job,
-        zones_data,
-        request.confidence,
-        request.model,
-        tracker_config
-    )
+    if job_queue.QUEUE_ENABLED:
+        # Picked up by a worker node (python -m app.worker)
+        await blocking.run_db(job_queue.enqueue_job, task_id, *args)
+        return {"success": True, "redirect": f"/result/{task_id}"}
+    
+    background_tasks.add_task(run_job, task_id, job, *args)
     
     return {"success": True, "redirect": f"/result/{task_id}"}
 
@@ -169,23 +387,108 @@ async def process_job(task_id: str, request: ProcessRequest, background_tasks: B
 @router.get("/{task_id}/progress")
 async def get_progress(task_id: str):
     """Get processing progress for a job."""
-    job = get_job(task_id)
+    snapshot = job_progress.get(task_id)
+    if snapshot:
+        return {
+            "progress": snapshot["progress"],
+            "status": snapshot["status"],
+            "fps": snapshot["fps"],
+            "eta": snapshot["eta"],
+            "phase": snapshot["phase"]
+        }
+    
+    job = await blocking.run_db(get_job_progress, task_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
     return {
-        "progress": job.get("progress", 0),
-        "status": job.get("status", "pending")
+        "progress": job.get("progress") or 0,
+        "status": job.get("status") or "pending",
+        "fps": None,
+        "eta": None,
+        "phase": None
     }
 
 
+@router.get("/{task_id}/progress/stream")
+async def stream_progress(task_id: str, request: Request):
+    """Push progress, fps and ETA as Server-Sent Events until the job finishes."""
+    if job_progress.get(task_id) is None and await blocking.run_db(get_job_progress, task_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        last_version = None
+        last_sent = 0.0
+        loop = asyncio.get_running_loop()
+        while not await request.is_disconnected():
+            snapshot = job_progress.get(task_id)
+            if snapshot is None:
+                # Not running in this process (finished a while ago, or not started yet)
+                job = await blocking.run_db(get_job_progress, task_id)
+                if job is None:
+                    break
+                status, progress = job.get("status") or "pending", job.get("progress") or 0
+                snapshot = {"status": status, "progress": progress, "fps": None, "eta": None,
+                            "version": ("db", status, progress)}
+            
+            if snapshot["version"] != last_version:
+                last_version = snapshot["version"]
+                last_sent = loop.time()
+                payload = {k: snapshot.get(k) for k in ("status", "progress", "fps", "eta", "phase")}
+                yield f"event: progress\ndata: {json.dumps(payload)}\n\n"
+                if snapshot["status"] in ("completed", "error"):
+                    break
+            elif loop.time() - last_sent >= PROGRESS_KEEPALIVE_INTERVAL:
+                last_sent = loop.time()
+                yield ": keepalive\n\n"
+            
+            await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/{task_id}/export")
-async def export_data(task_id: str, format: str = "json"):
-    """Export detection data as CSV or JSON."""
-    job = get_job(task_id)
+async def export_data(task_id: str, request: Request, format: str = "json"):
+    """
+    Export detection data as CSV or JSON (MessagePack on request), conditional
+    on the job's revision and compressed like the details.
+    """
+    job = await blocking.run_db(get_job_fields, task_id, ("revision",))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    media_type, encoding = _negotiate(request)
+    if format == "csv":
+        media_type = "text/csv"
+        kind = f"export-csv.{encoding}" if encoding else "export-csv"
+    else:
+        kind = f"export-{response_encoding.representation(media_type, encoding)}"
+    headers = {"ETag": f'"{task_id}-{job["revision"]}-{kind}"', "Cache-Control": JOB_CACHE_CONTROL, "Vary": JOB_VARY}
+    cached = _cached_response(request, task_id, kind, media_type, headers)
+    if cached is not None:
+        return cached
+    
+    job = await blocking.run_db(get_job_fields, task_id, ("zones", "detection_data", "process_time", "frame_width",
+                                                          "frame_height", "status", "revision"))
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
+    headers["ETag"] = f'"{task_id}-{job["revision"]}-{kind}"'
+    cache_key = (task_id, kind) if job.get("status") == "completed" else None
     
+    # Decoding and walking every detection event takes a while on long jobs
+    content = await run_in_threadpool(_export_content, task_id, job, format)
+    if format == "csv":
+        disposition = {"Content-Disposition": f"attachment; filename=locus_data_{task_id}.csv"}
+        return await _encoded_response(content, media_type, encoding, headers, disposition, cache_key)
+    return await _encoded_response(content, media_type, encoding, headers, cache_key=cache_key)
+
+
+def _export_content(task_id, job, format):
+    """The CSV export (bytes) or the JSON export (dict with statistics) of a job."""
     detection_data = job.get("detection_data", [])
     zones = job.get("zones", [])
     process_time = job.get("process_time", 0)
@@ -232,11 +535,18 @@ async def export_data(task_id: str, format: str = "json"):
             # Usually detection_data is a sequence of updates.
             time_data[t][z] = c
 
-        # 3. Write rows for every second
-        # If process_time is available, use it as duration, else max_time seen
-        duration = int(job.get("process_time", 0)) or max_time
+        # 3. Write rows for every second of the original video timeline up to the last event
+        # (process_time is how long processing took, not the video's duration)
+        seconds = range(max_time + 1)
+        time_ranges = job.get("time_ranges")
+        if time_ranges:
+            # Only the selected parts of the video were analyzed; skip the seconds in between
+            selected = set(time_data)
+            for r in time_ranges:
+                selected.update(range(int(r["start"]), int(r["end"]) + 1))
+            seconds = sorted(selected)
         
-        for t in range(duration + 1):
+        for t in seconds:
             row = [t]
             for zid in zone_ids:
                 # Get count for this zone at this time
@@ -253,11 +563,7 @@ async def export_data(task_id: str, format: str = "json"):
                 row.append(val)
             writer.writerow(row)
         
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=locus_data_{task_id}.csv"}
-        )
+        return output.getvalue().encode()
     
     # JSON export with statistics
     zone_stats = {}
@@ -2,7 +2,9 @@
 System API Routes
 """
 from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
 
+from app.services import batch, governor, ingest, job_queue
 from app.services.gpu_utils import get_gpu_info
 from app.services.coco_classes import COCO_CLASSES
 
@@ -12,7 +14,8 @@ router = APIRouter()
 @router.get("/system-info")
 async def system_info():
     """Get system information including GPU status."""
-    gpu_info = get_gpu_info()
+    # The first call imports torch; keep that off the event loop
+    gpu_info = await run_in_threadpool(get_gpu_info)
     return {
         "gpu": gpu_info,
         "version": "0.2.0"
@@ -23,3 +26,23 @@ async def system_info():
 async def coco_classes():
     """Get COCO class names."""
     return COCO_CLASSES
+
+
+@router.get("/governor")
+async def governor_stats():
+    """CPU thread budget of each running job/stream and the fps it achieves."""
+    return governor.get_stats()
+
+
+@router.get("/queue")
+async def queue_stats():
+    """Shared job queue: jobs per status and the worker holding each lease."""
+    stats = await run_in_threadpool(job_queue.get_broker().stats)
+    return {"enabled": job_queue.QUEUE_ENABLED, "broker": job_queue.BROKER, **stats}
+
+
+@router.get("/throughput")
+async def throughput_stats():
+    """Jobs per status, submitted backlog, jobs finished per hour and the watch-folder ingester."""
+    stats = await run_in_threadpool(batch.get_stats)
+    return {**stats, "watch": ingest.get_stats()}
@@ -0,0 +1,92 @@
+"""
+Resumable Upload API Routes - chunked video uploads (see app/services/uploads.py)
+"""
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.models import CreateUploadRequest
+from app.services import uploads
+from app.services.file_handler import handle_chunked_upload
+
+router = APIRouter()
+
+# Network reads are small; batch them before handing each write to a worker thread
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def _error_response(e):
+    content = {"detail": str(e)}
+    if e.offset is not None:
+        content["offset"] = e.offset
+    return JSONResponse(status_code=e.status_code, content=content)
+
+
+@router.post("")
+async def create_upload(request: CreateUploadRequest):
+    """Start a resumable upload."""
+    try:
+        return await run_in_threadpool(uploads.create_upload, request.filename, request.size)
+    except uploads.UploadError as e:
+        return _error_response(e)
+
+
+@router.get("/{upload_id}")
+async def get_upload(upload_id: str):
+    """Get the current offset of an upload (where to resume from)."""
+    try:
+        return await run_in_threadpool(uploads.get_upload, upload_id)
+    except uploads.UploadError as e:
+        return _error_response(e)
+
+
+@router.put("/{upload_id}")
+async def upload_chunk(upload_id: str, offset: int, request: Request):
+    """
+    Append the raw request body at `offset`.
+    Returns 409 with the expected offset if the chunk does not continue the upload.
+    """
+    try:
+        f, size = await run_in_threadpool(uploads.open_chunk, upload_id, offset)
+    except uploads.UploadError as e:
+        return _error_response(e)
+
+    written = 0
+    try:
+        buffer = bytearray()
+        async for data in request.stream():
+            if offset + written + len(buffer) + len(data) > size:
+                raise HTTPException(status_code=413, detail="Chunk exceeds declared file size")
+            buffer += data
+            if len(buffer) >= WRITE_BUFFER_SIZE:
+                await run_in_threadpool(uploads.write_chunk, upload_id, f, bytes(buffer))
+                written += len(buffer)
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(uploads.write_chunk, upload_id, f, bytes(buffer))
+            written += len(buffer)
+    finally:
+        # Whatever was written before a disconnect stays; the client resumes from GET's offset
+        await run_in_threadpool(uploads.close_chunk, upload_id, f)
+
+    return {"uploadId": upload_id, "offset": offset + written, "size": size}
+
+
+@router.post("/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    """Finish an upload: verify its size, create the job and extract the first frame."""
+    try:
+        task_id = await run_in_threadpool(handle_chunked_upload, upload_id, "uploads/videos")
+    except uploads.UploadError as e:
+        return _error_response(e)
+    return {"taskId": task_id, "success": True}
+
+
+@router.delete("/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Discard a partial upload."""
+    try:
+        await run_in_threadpool(uploads.abort_upload, upload_id)
+    except uploads.UploadError as e:
+        return _error_response(e)
+    return {"success": True}
@@ -4,10 +4,13 @@ WebSocket Routes for Live Video Streaming
 import asyncio
 import base64
 import threading
+import time
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
-from app.services.db import get_job
-from app.core.live_detector import live_detection, stop_live_stream
+from app.services import blocking, metrics
+from app.services.db import get_job_fields
+from app.services.workers import live_frames
+from app.core.live_detector import stop_live_stream
 
 router = APIRouter()
 
@@ -21,7 +24,12 @@ async def live_stream_endpoint(websocket: WebSocket, task_id: str):
     await websocket.accept()
     
     # Get job data
-    job = get_job(task_id)
+    def read_job():
+        job = get_job_fields(task_id, ("source_type", "stream_url", "zones", "frame_width", "frame_height",
+                                       "confidence", "model", "tracker_config", "motion_gate", "roi_config"))
+        return job.to_dict() if job else None
+    
+    job = await blocking.run_db(read_job)
     if not job:
         await websocket.send_json({"error": "Job not found"})
         await websocket.close()
@@ -40,15 +48,17 @@ async def live_stream_endpoint(websocket: WebSocket, task_id: str):
     confidence = job.get("confidence", 35)
     model = job.get("model", "yolo11n.pt")
     tracker_config = job.get("tracker_config")
+    motion_gate_config = job.get("motion_gate")
+    roi_config = job.get("roi_config")
     
     # Queue for passing frames from thread to async handler
     frame_queue = asyncio.Queue(maxsize=2)
     stop_event = threading.Event()
     
     def detection_thread():
-        """Run blocking detection in separate thread."""
+        """Relay frames from the detection worker (blocking) in a separate thread."""
         try:
-            for jpeg_bytes, counts in live_detection(
+            for jpeg_bytes, counts in live_frames(
                 stream_url=stream_url,
                 zones=zones,
                 frame_size=frame_size,
@@ -56,18 +66,23 @@ async def live_stream_endpoint(websocket: WebSocket, task_id: str):
                 conf=confidence,
                 model_name=model,
                 tracker_config=tracker_config,
-                source_type=source_type
+                source_type=source_type,
+                motion_gate_config=motion_gate_config,
+                roi_config=roi_config
             ):
                 if stop_event.is_set():
                     break
-                # Put frame in queue (drop old frames if full)
+                # Put frame in queue (drop old frames if full); the timestamp lets
+                # clients measure delivery latency (see benchmarks/load_test.py)
+                frame = (jpeg_bytes, counts, time.time())
                 try:
-                    frame_queue.put_nowait((jpeg_bytes, counts))
+                    frame_queue.put_nowait(frame)
                 except asyncio.QueueFull:
                     # Drop oldest frame and add new one
+                    metrics.frame_dropped('live', 'queue_full')
                     try:
                         frame_queue.get_nowait()
-                        frame_queue.put_nowait((jpeg_bytes, counts))
+                        frame_queue.put_nowait(frame)
                     except:
                         pass
         except Exception as e:
@@ -78,12 +93,13 @@ async def live_stream_endpoint(websocket: WebSocket, task_id: str):
     # Start detection in thread
     thread = threading.Thread(target=detection_thread, daemon=True)
     thread.start()
+    metrics.register_queue(id(frame_queue), 'ws_frames', task_id, frame_queue.qsize)
     
     try:
         while True:
             try:
                 # Wait for frame with timeout
-                jpeg_bytes, counts = await asyncio.wait_for(
+                jpeg_bytes, counts, produced_at = await asyncio.wait_for(
                     frame_queue.get(), 
                     timeout=5.0
                 )
@@ -93,7 +109,8 @@ async def live_stream_endpoint(websocket: WebSocket, task_id: str):
                 await websocket.send_json({
                     "type": "frame",
                     "frame": frame_base64,
-                    "counts": counts
+                    "counts": counts,
+                    "ts": produced_at  # Unix time the frame left the detection worker
                 })
             except asyncio.TimeoutError:
                 # Send keepalive ping
@@ -106,6 +123,7 @@ async def live_stream_endpoint(websocket: WebSocket, task_id: str):
     except WebSocketDisconnect:
         pass
     finally:
+        metrics.unregister_queue(id(frame_queue))
         stop_event.set()
         stop_live_stream(task_id)
 
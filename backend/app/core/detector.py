@@ -1,14 +1,22 @@
 import cv2
+import math
 import os
 import tempfile
-import shutil
 import colorsys
 import time
 import numpy as np
-from collections import defaultdict
-from ultralytics import YOLO
 
+from app.services import governor, metrics
+from app.services.coco_classes import COCO_CLASSES
 from app.services.gpu_utils import get_device, get_gpu_info
+from app.core.heatmap import HeatmapAccumulator
+from app.core.hls_writer import HlsWriter, hls_available
+from app.core.model_loader import acquire_model, release_model
+from app.core.motion_gate import MotionGate
+from app.core import overlay
+from app.core.overlay import OverlayWriter, STATE_ACTIVE, STATE_COUNTED, STATE_DETECTED, STATE_NONE
+from app.core.track_cache import TrackCacheWriter
+from app.core.track_store import TrackStore
 
 def get_color_from_class_id(class_id):
     """
@@ -72,7 +80,9 @@ def check_line_crossing(prev_pos, curr_pos, line_start, line_end):
     return 0
 
 
-def detection(path_x, zones, frame_size, taskID, conf=40, model_name='yolo11n.pt', tracker_config=None):
+def detection(path_x, zones, frame_size, taskID, conf=40, model_name='yolo11n.pt', tracker_config=None,
+              motion_gate_config=None, stats=None, roi_config=None, model=None, track_cache_key=None,
+              render_video=True, target_fps=24, imgsz=None, save_artifacts=True, time_ranges=None):
     """
     Process video with multiple detection zones.
     
@@ -84,6 +94,18 @@ def detection(path_x, zones, frame_size, taskID, conf=40, model_name='yolo11n.pt
         conf: Confidence threshold (1-100)
         model_name: Name of the YOLO model file (default: yolo11n.pt)
         tracker_config: ByteTrack configuration dict
+        motion_gate_config: Motion gate configuration dict (None disables the gate)
+        stats: Optional dict filled in with pipeline statistics (e.g. motion gate skip ratio)
+        roi_config: ROI cropping/tiling configuration dict (None runs on the full frame)
+        model: Already-loaded model to use instead of loading model_name (e.g. a benchmark stub)
+        track_cache_key: If set, per-frame tracks are written to the track cache under this key
+        render_video: Draw annotations and encode the output video. When False the
+            overlay data (see app.core.overlay) is written instead and the frontend draws it
+        target_fps: Frames per second of video to analyze (sources with more are sampled down)
+        imgsz: Model input size (None uses the model's default)
+        save_artifacts: Write the job's overlay and heatmap files (False for preview passes)
+        time_ranges: Only analyze these parts of the video ([{start, end}, ...] in seconds);
+            None analyzes all of it. Timestamps stay on the source video's timeline
     """
     # Default tracker config
     if tracker_config is None:
@@ -110,99 +132,146 @@ fuse_score: True
     tracker_yaml_file.write(tracker_yaml_content)
     tracker_yaml_file.close()
 
+    owns_model = model is None
+    cache_writer = TrackCacheWriter(track_cache_key) if track_cache_key else None
+    overlay_writer = None
+    if save_artifacts:
+        if render_video:
+            # The frontend only draws the overlay over unrendered jobs; don't keep a stale one
+            overlay.delete(taskID)
+        else:
+            overlay_writer = OverlayWriter(taskID)
+    metrics.pipeline_started('offline', taskID)
+    allocation = None
     try:
-        yield from _run_detection(path_x, zones, frame_size, taskID, conf, model_name, tracker_yaml_path)
+        if owns_model:
+            model = acquire_model(model_name)
+        # Thread budget for this job, applied in the thread that consumes this generator
+        allocation = governor.acquire('offline', taskID)
+        yield from _run_detection(path_x, zones, frame_size, taskID, conf, model, tracker_yaml_path,
+                                  motion_gate_config, stats, roi_config,
+                                  track_ttl=int(tracker_config.get('track_buffer', 30)),
+                                  cache_writer=cache_writer, render_video=render_video,
+                                  overlay_writer=overlay_writer,
+                                  allocation=allocation, target_fps=target_fps, imgsz=imgsz,
+                                  save_heatmap=save_artifacts, time_ranges=time_ranges)
     finally:
+        metrics.pipeline_finished('offline', taskID)
+        if allocation is not None:
+            governor.release(allocation)
+        if cache_writer is not None:
+            # No-op after a successful commit; drops the partial file otherwise
+            cache_writer.discard()
+        if overlay_writer is not None:
+            overlay_writer.discard()
+        if owns_model and model is not None:
+            release_model(model_name, model)
         if os.path.exists(tracker_yaml_path):
             os.remove(tracker_yaml_path)
     
-# Heatmap resolution constant
-HEATMAP_RESOLUTION = 50
+# Dot colors (BGR) drawn on tracked objects, by overlay state
+DOT_COLORS = {
+    STATE_ACTIVE: (244, 133, 66),    # Blue: in a zone / crossing a line
+    STATE_COUNTED: (83, 168, 51),    # Green: counted
+    STATE_DETECTED: (54, 67, 234),   # Red: not counted but matched class
+}
 
-def _run_detection(path_x, zones, frame_size, taskID, conf, model_name, tracker_yaml_path):
-    # Constants
-    SOURCE_VIDEO = path_x
-    DESTIN_VIDEO = 'uploads/outputs/' + 'output_' + taskID + '.mp4'
 
-    font = cv2.FONT_ITALIC
-    frame_counter = 0
-    track_history = defaultdict(lambda: [])
-    
-    # Initialize heatmap grid for activity visualization
-    heatmap_grid = np.zeros((HEATMAP_RESOLUTION, HEATMAP_RESOLUTION), dtype=np.float32)
-    
-    # Per-zone tracking: {zone_id: {track_id: {'in_zone': True/False, 'entry_time': timestamp}}}
-    crossed_objects_per_zone = {z['id']: {} for z in zones}
-    
-    # Detection events for each zone
-    detection_events = []
-    
-    # Dwell time events: [{zone_id, track_id, duration}]
-    dwell_events = []
-    
-    # Line crossing counts: {zone_id: {'in': count, 'out': count}} for line zones
-    line_crossing_counts = {z['id']: {'in': 0, 'out': 0} for z in zones if len(z.get('points', [])) == 2}
+def _open_video_writer(taskID, path, fps, frame_size):
+    """Progressive HLS writer when ffmpeg is available, otherwise cv2.VideoWriter (avc1, then mp4v)."""
+    if hls_available():
+        # Progressive HLS segments (watchable while processing); the MP4 is remuxed at the end.
+        # If ffmpeg dies mid-job, the rest of the video goes to cv2.VideoWriter instead.
+        try:
+            out = HlsWriter(taskID, path, fps, frame_size,
+                            fallback=lambda: _open_cv2_writer(path, fps, frame_size))
+            if out.isOpened():
+                return out
+            out.abort()
+        except OSError as e:
+            print(f"Failed to start HLS writer, falling back to cv2: {e}")
+    return _open_cv2_writer(path, fps, frame_size)
 
-    width = frame_size[0]
-    height = frame_size[1]
 
-    BASE_FONT_SIZE = 1.2
-    font_scale = min(width, height) / 1000 * BASE_FONT_SIZE
-    BASE_FONT_THICKNESS = 2
-    font_thickness = max(1, max(width, height) // 1000 * BASE_FONT_THICKNESS)
-
-    model_path = f"weights/{model_name}"
-    
-    # Check if model exists in weights folder
-    if not os.path.exists(model_path):
-        print(f"Model {model_name} not found in weights/. Attempting auto-download...")
-        try:
-            # Download to current directory (default YOLO behavior)
-            temp_model = YOLO(model_name) 
-            
-            # YOLO downloads to current directory
-            if os.path.exists(model_name):
-                os.makedirs("weights", exist_ok=True)
-                shutil.move(model_name, model_path)
-                print(f"Moved {model_name} to {model_path}")
-                
-            model = YOLO(model_path)
-        except Exception as e:
-            print(f"Failed to auto-download {model_name}: {e}. Falling back to yolo11n.pt")
-            model = YOLO('weights/yolo11n.pt')
+def _close_video_writer(out, completed):
+    """Finish the output video, or stop an HLS encoder without finalizing if processing stopped early."""
+    if completed or not isinstance(out, HlsWriter):
+        out.release()
     else:
-        model = YOLO(model_path)
-    
-    # Set device for GPU acceleration
-    device = get_device()
-    gpu_info = get_gpu_info()
-    print(f"Using device: {device} ({gpu_info['name']})")
+        out.abort()
 
-    cap = cv2.VideoCapture(SOURCE_VIDEO)
 
-    targetFPS = 24
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    newFPS = targetFPS if fps > targetFPS else fps
-    interval = fps / newFPS
-    
-    process_idx = 0
-    
+def _open_cv2_writer(path, fps, frame_size):
     fourcc = cv2.VideoWriter_fourcc(*'avc1')
-    out = cv2.VideoWriter(DESTIN_VIDEO, fourcc, newFPS, (width, height))
+    out = cv2.VideoWriter(path, fourcc, fps, frame_size)
     
     if not out.isOpened():
         print("Failed to open video writer with avc1, falling back to mp4v")
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(DESTIN_VIDEO, fourcc, newFPS, (width, height))
+        out = cv2.VideoWriter(path, fourcc, fps, frame_size)
         
     if not out.isOpened():
         print("Failed to open video writer with mp4v")
         # Handle failure appropriately, maybe raise exception or continue without video
-    
-    start_time = time.time()
+    return out
 
-    # Preprocess zones
+
+def _count_track(zone_counts, zone_class_counts, zone_id, class_id):
+    """Add a newly counted track to the running per-zone totals."""
+    zone_counts[zone_id] += 1
+    class_counts = zone_class_counts[zone_id]
+    class_counts[class_id] = class_counts.get(class_id, 0) + 1
+
+
+def _finalize_evicted_track(track_id, track, crossed_objects_per_zone, dwell_events):
+    """
+    Drop per-zone state for an evicted track.
+    If the track was still inside a polygon zone, its dwell interval is closed
+    at the last time it was seen.
+    """
+    for zone_id, zone_tracks in crossed_objects_per_zone.items():
+        obj_data = zone_tracks.pop(track_id, None)
+        if not obj_data or not obj_data.get('in_zone', False):
+            continue
+        entry_time = obj_data.get('entry_time', track.last_time)
+        dwell_duration = round(track.last_time - entry_time, 2)
+        if dwell_duration > 0:
+            dwell_events.append({
+                'zone_id': zone_id,
+                'track_id': track_id,
+                'entry_time': entry_time,
+                'exit_time': track.last_time,
+                'duration': dwell_duration
+            })
+
+def _frame_ranges(time_ranges, fps, total_frames):
+    """
+    Source frame ranges [(first, end), ...] (0-based, end exclusive) covering time ranges
+    in seconds, sorted, merged where they overlap and clipped to the video.
+    """
+    frame_ranges = []
+    for time_range in sorted(time_ranges, key=lambda r: r['start']):
+        first = max(0, math.ceil(round(time_range['start'] * fps, 6)))
+        end = math.ceil(round(time_range['end'] * fps, 6))
+        if total_frames > 0:
+            end = min(end, total_frames)
+        if end <= first:
+            continue
+        if frame_ranges and first <= frame_ranges[-1][1]:
+            frame_ranges[-1] = (frame_ranges[-1][0], max(frame_ranges[-1][1], end))
+        else:
+            frame_ranges.append((first, end))
+    return frame_ranges
+
+
+def _prepare_zones(zones):
+    """
+    Zones with at least two points, in the form the per-frame loop uses.
+
+    Returns:
+        (zone_data, all_class_ids): zone dicts with 'area'/'area_np' points and a BGR
+        'color', and the set of class IDs targeted by any zone
+    """
     zone_data = []
     all_class_ids = set()
     for zone in zones:
@@ -232,255 +301,528 @@ def _run_detection(path_x, zones, frame_size, taskID, conf, model_name, tracker_
             'is_line': len(points) == 2,
             'label': zone.get('label', f'Zone {len(zone_data) + 1}')
         })
+    return zone_data, all_class_ids
+
+
+def _draw_zones(frame, zone_data, zone_counts, line_crossing_counts, width, height):
+    """Draw the zones and their running counts on a rendered frame (resized to width x height)."""
+    BASE_FONT_SIZE = 1.2
+    font_scale = min(width, height) / 1000 * BASE_FONT_SIZE
+    BASE_FONT_THICKNESS = 2
+    font_thickness = max(1, max(width, height) // 1000 * BASE_FONT_THICKNESS)
+
+    # Draw all zones
+    for zd in zone_data:
+        if zd['is_line']:
+            pt1 = (int(zd['area'][0][0]), int(zd['area'][0][1]))
+            pt2 = (int(zd['area'][1][0]), int(zd['area'][1][1]))
+            cv2.line(frame, pt1, pt2, zd['color'], 3)
+        else:
+            cv2.polylines(frame, [zd['area_np']], True, zd['color'], 3)
+
+    # Draw count text for each zone (stacked vertically)
+    y_offset = int(height * 0.05)
+    for idx, zd in enumerate(zone_data):
+        zone_id = zd['id']
+        text_color = get_color_from_class_id(zd['class_ids'][0])  # Use first class for display color
+    
+        # Zone label with count
+        zone_label = zd.get('label', f'Zone {idx + 1}')
+    
+        # Different display for line zones vs polygon zones
+        if zd['is_line'] and zone_id in line_crossing_counts:
+            lc = line_crossing_counts[zone_id]
+            count_text = f"{zone_label}: IN {lc['in']} | OUT {lc['out']}"
+        else:
+            count = zone_counts.get(zone_id, 0)
+            count_text = f"{zone_label}: {count}"
+    
+        text_position = (int(width * 0.02), y_offset + int(idx * height * 0.05))
+        cv2.putText(frame, count_text, text_position, cv2.FONT_ITALIC, font_scale, text_color, font_thickness)
+
+    # Only resize if necessary
+    if frame.shape[1] != width or frame.shape[0] != height:
+         frame = cv2.resize(frame, (width, height))
+    return frame
+
+
+def _sampled_frames(cap, frame_ranges, interval, selected_frames):
+    """
+    Decode the frames the pipeline analyzes: every `interval`-th source frame (sampled
+    down to the target fps) of each frame range, seeking over the gaps between ranges.
+
+    Args:
+        cap: Open cv2.VideoCapture
+        frame_ranges: [(first, end), ...] from _frame_ranges(), or [(0, math.inf)]
+        interval: Source frames per analyzed frame
+        selected_frames: Frames in all ranges together, for the progress
+
+    Yields:
+        (frame_counter, frame, new_range, progress): the 1-based source frame number,
+        the frame, whether it is the first one read in its range, and the progress (0-100)
+    """
+    frame_counter = 0
+    frames_before_range = 0  # Selected frames in the ranges already analyzed
+    for range_first, range_end in frame_ranges:
+        if range_first > frame_counter:
+            # Seek through the container index instead of decoding the gap
+            cap.set(cv2.CAP_PROP_POS_FRAMES, range_first)
+            frame_counter = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+            range_first = frame_counter
+        # First sampled frame in this range
+        process_idx = math.ceil((frame_counter + 0.5) / interval)
+        new_range = True
+        while frame_counter < range_end:
+            target_frame_idx = round(interval * process_idx)
+            
+            # If the current frame matches the target frame 
+            if (frame_counter + 1) != target_frame_idx:
+                # If we passed the target (should process next)
+                if (frame_counter + 1) > target_frame_idx:
+                    process_idx += 1
+                    target_frame_idx = round(interval * process_idx)
+                
+                if (frame_counter + 1) != target_frame_idx:
+                    if not cap.grab():
+                        return
+                    frame_counter += 1
+                    continue
+            
+            # Target frame reached
+            process_idx += 1
+            success, frame = cap.read()
+            if not success:
+                return
+            frame_counter += 1
+            
+            # Over the selected frames (the whole video without time ranges)
+            done_frames = frames_before_range + frame_counter - range_first
+            progress = int((done_frames / selected_frames) * 100) if selected_frames > 0 else 0
+            yield frame_counter, frame, new_range, progress
+            new_range = False
+        frames_before_range += range_end - range_first
+
+
+def _run_detection(path_x, zones, frame_size, taskID, conf, model, tracker_yaml_path,
+                   motion_gate_config=None, stats=None, roi_config=None, track_ttl=30, cache_writer=None,
+                   render_video=True, overlay_writer=None, allocation=None, target_fps=24, imgsz=None,
+                   save_heatmap=True, time_ranges=None):
+    # Constants
+    SOURCE_VIDEO = path_x
+    DESTIN_VIDEO = 'uploads/outputs/' + 'output_' + taskID + '.mp4'
+
+    processed_frames = 0
+    # Bounded per-track point history; tracks unseen for track_buffer frames are evicted
+    track_store = TrackStore(max_points=30, ttl=track_ttl)
+    
+    # Per-zone tracking: {zone_id: {track_id: {'in_zone': True/False, 'entry_time': timestamp}}}
+    # Entries are dropped when a track is evicted, so totals live in the counters below
+    crossed_objects_per_zone = {z['id']: {} for z in zones}
+    
+    # Running totals per zone: unique counted tracks, and the same broken down by class
+    zone_counts = {z['id']: 0 for z in zones}
+    zone_class_counts = {z['id']: {} for z in zones}
+    
+    # Detection events for each zone
+    detection_events = []
+    
+    # Dwell time events: [{zone_id, track_id, duration}]
+    dwell_events = []
+    
+    # Line crossing counts: {zone_id: {'in': count, 'out': count}} for line zones
+    line_crossing_counts = {z['id']: {'in': 0, 'out': 0} for z in zones if len(z.get('points', [])) == 2}
+
+    width = frame_size[0]
+    height = frame_size[1]
+
+    # Activity heatmap: per-class, time-sliced counts on a fine grid (see app.core.heatmap)
+    heatmap = HeatmapAccumulator((width, height))
+
+    # Set device for GPU acceleration
+    device = get_device()
+    gpu_info = get_gpu_info()
+    print(f"Using device: {device} ({gpu_info['name']})")
+
+    cap = cv2.VideoCapture(SOURCE_VIDEO)
+
+    targetFPS = target_fps
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    newFPS = targetFPS if fps > targetFPS else fps
+    interval = fps / newFPS
+    
+    # Parts of the video to analyze; without time ranges the whole video is one range
+    if time_ranges:
+        frame_ranges = _frame_ranges(time_ranges, fps, total_frames)
+        if not frame_ranges:
+            cap.release()
+            raise ValueError("Time ranges are outside the video")
+    else:
+        # Read until the stream ends (the container's frame count may be off)
+        frame_ranges = [(0, math.inf)]
+    selected_frames = sum(end - first for first, end in frame_ranges) if time_ranges else total_frames
+    
+    start_time = time.time()
+
+    # Preprocess zones
+    zone_data, all_class_ids = _prepare_zones(zones)
     
     # Convert class IDs to list for YOLO
     ClassIDs = list(all_class_ids) if all_class_ids else [19]
+    # Reduced input size (e.g. preview passes); otherwise the model's default
+    track_kwargs = {'imgsz': imgsz} if imgsz else {}
 
-    while cap.isOpened():
-        
-        target_frame_idx = round(interval * process_idx)
-        
-        # If the current frame matches the target frame 
-        if (frame_counter + 1) != target_frame_idx:
-             # If we passed the target (should process next)
-             if (frame_counter + 1) > target_frame_idx:
-                 process_idx += 1
-                 target_frame_idx = round(interval * process_idx)
-             
-             if (frame_counter + 1) != target_frame_idx:
-                success = cap.grab()
-                if not success:
-                    break
-                frame_counter += 1
-                continue
-        
-        # Target frame reached
-        process_idx += 1
-        success, frame = cap.read()
-        
-        if not success:
-            break
-        
-        frame_counter += 1
+    # Motion gate: skip inference on static frames and carry tracks forward
+    motion_gate = MotionGate(motion_gate_config or {'enabled': False}, (width, height), zones)
+    last_results = None
 
-        # Normalize confidence to 0.0-1.0 range
-        conf_float = conf / 100.0
-        results = model.track(frame, classes=ClassIDs, persist=True, save=False, tracker=tracker_yaml_path, conf=conf_float, device=device)
-        boxes = results[0].boxes.xywh.cpu()
-        track_ids = results[0].boxes.id.int().cpu().tolist() if results[0].boxes is not None and results[0].boxes.id is not None else []
-        detected_classes = results[0].boxes.cls.int().cpu().tolist() if results[0].boxes is not None else []
+    # Zone-aware ROI: only run inference on the region covered by the zones
+    roi_tracker = None
+    if roi_config and roi_config.get('enabled', True):
+        # Imported on use: the tiled tracker pulls in ultralytics/torch
+        from app.core.roi import RoiTracker, compute_zone_roi
+        roi = compute_zone_roi(zones, (width, height), int(roi_config.get('padding', 32)))
+        if roi is not None:
+            roi_tracker = RoiTracker(model, tracker_yaml_path, roi, roi_config)
+            if stats is not None:
+                roi_area = (roi[2] - roi[0]) * (roi[3] - roi[1])
+                stats['roi'] = {
+                    'region': list(roi),
+                    'tiles': len(roi_tracker.tiles),
+                    'pixel_ratio': round(roi_area / (width * height), 4)
+                }
 
-        frame = results[0].plot()
+    # Without rendering, annotations only go to the overlay data and nothing is encoded
+    out = _open_video_writer(taskID, DESTIN_VIDEO, newFPS, (width, height)) if render_video else None
+
+    completed = False
+    try:
+        stage_start = time.perf_counter()
+        for frame_counter, frame, new_range, progress in _sampled_frames(cap, frame_ranges, interval, selected_frames):
+            if new_range and processed_frames:
+                # Tracks don't continue across the gap: evict them as if lost for track_ttl
+                # frames (the track cache replay sees the same jump in processed frame indices)
+                processed_frames += track_ttl + 1
+                for track_id, track in track_store.evict_stale(processed_frames + 1):
+                    _finalize_evicted_track(track_id, track, crossed_objects_per_zone, dwell_events)
+                last_results = None
+            processed_frames += 1
+            timestamp = round(frame_counter / fps, 2)
+            now = time.perf_counter()
+            metrics.observe_stage('offline', 'decode', now - stage_start)
+            stage_start = now
+
+            # Normalize confidence to 0.0-1.0 range
+            conf_float = conf / 100.0
+            if motion_gate.should_infer(frame) or last_results is None:
+                if roi_tracker is not None:
+                    results = roi_tracker.track(frame, ClassIDs, conf_float, device)
+                else:
+                    results = model.track(frame, classes=ClassIDs, persist=True, save=False, tracker=tracker_yaml_path, conf=conf_float, device=device, **track_kwargs)
+                last_results = results
+                now = time.perf_counter()
+                metrics.observe_inference('offline', results, now - stage_start)
+                stage_start = now
+                if render_video:
+                    frame = results[0].plot()
+            else:
+                # Static scene - carry the previous tracks forward and draw them on the current frame
+                results = last_results
+                if render_video:
+                    frame = results[0].plot(img=frame)
+            now = time.perf_counter()
+            render_time = now - stage_start
+            stage_start = now
+            boxes = results[0].boxes.xywh.cpu()
+            track_ids = results[0].boxes.id.int().cpu().tolist() if results[0].boxes is not None and results[0].boxes.id is not None else []
+            detected_classes = results[0].boxes.cls.int().cpu().tolist() if results[0].boxes is not None else []
+            if cache_writer is not None and track_ids:
+                cache_writer.add_frame(processed_frames, frame_counter, track_ids, detected_classes,
+                                       results[0].boxes.conf.cpu().numpy(), boxes.numpy())
 
-        center_x, center_y = 0, 0
+            center_x, center_y = 0, 0
+            dot_states = []
         
-        # Process each detection
-        for i, (box, track_id) in enumerate(zip(boxes, track_ids)):
-            x, y, w, h = box
-            center_x, center_y = int(x), int(y)
-            detected_class = detected_classes[i] if i < len(detected_classes) else -1
+            # Process each detection
+            for i, (box, track_id) in enumerate(zip(boxes, track_ids)):
+                x, y, w, h = box
+                center_x, center_y = int(x), int(y)
+                detected_class = detected_classes[i] if i < len(detected_classes) else -1
             
-            track = track_history[track_id]
-            track.append((float(x), float(y)))
-            if len(track) > 30:
-                track.pop(0)
+                track = track_store.update(track_id, float(x), float(y), processed_frames, timestamp)
             
-            # Update heatmap grid with object position
-            grid_x = int((center_x / width) * HEATMAP_RESOLUTION)
-            grid_y = int((center_y / height) * HEATMAP_RESOLUTION)
-            grid_x = min(max(grid_x, 0), HEATMAP_RESOLUTION - 1)
-            grid_y = min(max(grid_y, 0), HEATMAP_RESOLUTION - 1)
-            heatmap_grid[grid_y, grid_x] += 1
-            
-            # Track object status across all zones to determine dot color
-            is_active_in_any_zone = False
-            is_counted_in_any_zone = False
-            matches_any_zone_class = False
-
-            # Check each zone
-            for zd in zone_data:
-                # Only check if detection matches any of zone's target classes
-                if detected_class not in zd['class_ids']:
-                    continue
+                # Track object status across all zones to determine dot color
+                is_active_in_any_zone = False
+                is_counted_in_any_zone = False
+                matches_any_zone_class = False
+
+                # Check each zone
+                for zd in zone_data:
+                    # Only check if detection matches any of zone's target classes
+                    if detected_class not in zd['class_ids']:
+                        continue
                 
-                matches_any_zone_class = True
-                zone_id = zd['id']
+                    matches_any_zone_class = True
+                    zone_id = zd['id']
                 
-                # Check if object is in zone (different logic for line vs polygon)
-                in_zone = False
-                crossing_direction = 0
+                    # Check if object is in zone (different logic for line vs polygon)
+                    in_zone = False
+                    crossing_direction = 0
                 
-                if zd['is_line']:
-                    # For 2-point line: check if object crosses the line
-                    if len(track) >= 2:
-                        prev_pos = track[-2]
-                        curr_pos = track[-1]
-                        line_pt1 = (int(zd['area'][0][0]), int(zd['area'][0][1]))
-                        line_pt2 = (int(zd['area'][1][0]), int(zd['area'][1][1]))
-                        crossing_direction = check_line_crossing(prev_pos, curr_pos, line_pt1, line_pt2)
+                    if zd['is_line']:
+                        # For 2-point line: check if object crosses the line
+                        if len(track) >= 2:
+                            prev_pos = track[-2]
+                            curr_pos = track[-1]
+                            line_pt1 = (int(zd['area'][0][0]), int(zd['area'][0][1]))
+                            line_pt2 = (int(zd['area'][1][0]), int(zd['area'][1][1]))
+                            crossing_direction = check_line_crossing(prev_pos, curr_pos, line_pt1, line_pt2)
                         
-                        # For line zones, process crossing event
-                        if crossing_direction != 0:
-                            timestamp = round(frame_counter / fps, 2)
+                            # For line zones, process crossing event
+                            if crossing_direction != 0:
+                                # Check if this track already crossed in this direction
+                                track_data = crossed_objects_per_zone[zone_id].get(track_id, {})
+                                last_direction = track_data.get('last_direction', 0)
                             
-                            # Check if this track already crossed in this direction
-                            track_data = crossed_objects_per_zone[zone_id].get(track_id, {})
-                            last_direction = track_data.get('last_direction', 0)
-                            
-                            # Only count if this is a new crossing (not same direction as last)
-                            if last_direction != crossing_direction:
-                                crossed_objects_per_zone[zone_id][track_id] = {
-                                   'last_direction': crossing_direction,
-                                    'timestamp': timestamp,
-                                    'counted': True,
-                                    'class_id': detected_class  # Store class
-                                }
+                                # Only count if this is a new crossing (not same direction as last)
+                                if last_direction != crossing_direction:
+                                    if track_id not in crossed_objects_per_zone[zone_id]:
+                                        _count_track(zone_counts, zone_class_counts, zone_id, detected_class)
+                                    crossed_objects_per_zone[zone_id][track_id] = {
+                                       'last_direction': crossing_direction,
+                                        'timestamp': timestamp,
+                                        'counted': True,
+                                        'class_id': detected_class  # Store class
+                                    }
                                 
-                                # Update IN/OUT counts
-                                if crossing_direction > 0:
-                                    line_crossing_counts[zone_id]['in'] += 1
-                                else:
-                                    line_crossing_counts[zone_id]['out'] += 1
+                                    # Update IN/OUT counts
+                                    if crossing_direction > 0:
+                                        line_crossing_counts[zone_id]['in'] += 1
+                                    else:
+                                        line_crossing_counts[zone_id]['out'] += 1
                                 
-                                # Log detection event with direction info
-                                lc = line_crossing_counts[zone_id]
+                                    # Log detection event with direction info
+                                    lc = line_crossing_counts[zone_id]
                                 
-                                # Calculate per-class counts
-                                class_counts = {}
-                                for track_data in crossed_objects_per_zone[zone_id].values():
-                                    cls_id = track_data.get('class_id', -1)
-                                    class_counts[cls_id] = class_counts.get(cls_id, 0) + 1
+                                    # Per-class counts
+                                    class_counts = dict(zone_class_counts[zone_id])
                                 
-                                detection_events.append({
-                                    "time": timestamp,
-                                    "zone_id": zone_id,
-                                    "class_id": zd['class_ids'][0],  # Use first class for event logging
-                                    "class_counts": class_counts,  # Per-class breakdown
-                                    "count": lc['in'] + lc['out'],
-                                    "in_count": lc['in'],
-                                    "out_count": lc['out'],
-                                    "direction": "in" if crossing_direction > 0 else "out"
-                                })
+                                    detection_events.append({
+                                        "time": timestamp,
+                                        "zone_id": zone_id,
+                                        "class_id": zd['class_ids'][0],  # Use first class for event logging
+                                        "class_counts": class_counts,  # Per-class breakdown
+                                        "count": lc['in'] + lc['out'],
+                                        "in_count": lc['in'],
+                                        "out_count": lc['out'],
+                                        "direction": "in" if crossing_direction > 0 else "out"
+                                    })
                             
-                            # Mark as currently crossing (contributes to Blue status)
-                            is_active_in_any_zone = True
-                        else:
-                            # Not crossing - check if previously counted (contributes to Green status)
-                            if track_id in crossed_objects_per_zone[zone_id]:
-                                is_counted_in_any_zone = True
-                    continue  # Skip polygon logic for line zones
-                else:
-                    # For 3+ point polygon: use standard containment test
-                    result = cv2.pointPolygonTest(zd['area_np'], ((center_x, center_y)), False)
-                    in_zone = result >= 0
+                                # Mark as currently crossing (contributes to Blue status)
+                                is_active_in_any_zone = True
+                            else:
+                                # Not crossing - check if previously counted (contributes to Green status)
+                                if track_id in crossed_objects_per_zone[zone_id]:
+                                    is_counted_in_any_zone = True
+                        continue  # Skip polygon logic for line zones
+                    else:
+                        # For 3+ point polygon: use standard containment test
+                        result = cv2.pointPolygonTest(zd['area_np'], ((center_x, center_y)), False)
+                        in_zone = result >= 0
 
-                timestamp = round(frame_counter / fps, 2)
-                
-                if in_zone:
-                    if track_id not in crossed_objects_per_zone[zone_id]:
-                        # First entry - track entry time
-                        crossed_objects_per_zone[zone_id][track_id] = {
-                            'in_zone': True,
-                            'entry_time': timestamp,
-                            'counted': True,
-                            'class_id': detected_class  # Store class for per-class counting
-                        }
-                        # Log detection event with per-class breakdown
-                        class_counts = {}
-                        for track_data in crossed_objects_per_zone[zone_id].values():
-                            cls_id = track_data.get('class_id', -1)
-                            class_counts[cls_id] = class_counts.get(cls_id, 0) + 1
-                        
-                        detection_events.append({
-                            "time": timestamp,
-                            "zone_id": zone_id,
-                            "class_id": zd['class_ids'][0],  # Use first class for event logging
-                            "class_counts": class_counts,  # Per-class breakdown
-                            "count": len(crossed_objects_per_zone[zone_id])
-                        })
-                    elif not crossed_objects_per_zone[zone_id][track_id].get('in_zone', False):
-                        # Re-entering zone
-                        crossed_objects_per_zone[zone_id][track_id]['in_zone'] = True
-                        crossed_objects_per_zone[zone_id][track_id]['entry_time'] = timestamp
+                    if in_zone:
+                        if track_id not in crossed_objects_per_zone[zone_id]:
+                            # First entry - track entry time
+                            crossed_objects_per_zone[zone_id][track_id] = {
+                                'in_zone': True,
+                                'entry_time': timestamp,
+                                'counted': True,
+                                'class_id': detected_class  # Store class for per-class counting
+                            }
+                            _count_track(zone_counts, zone_class_counts, zone_id, detected_class)
+                            # Log detection event with per-class breakdown
+                            detection_events.append({
+                                "time": timestamp,
+                                "zone_id": zone_id,
+                                "class_id": zd['class_ids'][0],  # Use first class for event logging
+                                "class_counts": dict(zone_class_counts[zone_id]),  # Per-class breakdown
+                                "count": zone_counts[zone_id]
+                            })
+                        elif not crossed_objects_per_zone[zone_id][track_id].get('in_zone', False):
+                            # Re-entering zone
+                            crossed_objects_per_zone[zone_id][track_id]['in_zone'] = True
+                            crossed_objects_per_zone[zone_id][track_id]['entry_time'] = timestamp
                         
-                    # Currently in zone -> Active (Blue)
-                    is_active_in_any_zone = True
+                        # Currently in zone -> Active (Blue)
+                        is_active_in_any_zone = True
 
-                else:
-                    if track_id in crossed_objects_per_zone[zone_id]:
-                        obj_data = crossed_objects_per_zone[zone_id][track_id]
-                        if obj_data.get('in_zone', False):
-                            # Object just exited - calculate dwell time
-                            entry_time = obj_data.get('entry_time', timestamp)
-                            dwell_duration = round(timestamp - entry_time, 2)
-                            if dwell_duration > 0:
-                                dwell_events.append({
-                                    'zone_id': zone_id,
-                                    'track_id': track_id,
-                                    'entry_time': entry_time,
-                                    'exit_time': timestamp,
-                                    'duration': dwell_duration
-                                })
-                            obj_data['in_zone'] = False
+                    else:
+                        if track_id in crossed_objects_per_zone[zone_id]:
+                            obj_data = crossed_objects_per_zone[zone_id][track_id]
+                            if obj_data.get('in_zone', False):
+                                # Object just exited - calculate dwell time
+                                entry_time = obj_data.get('entry_time', timestamp)
+                                dwell_duration = round(timestamp - entry_time, 2)
+                                if dwell_duration > 0:
+                                    dwell_events.append({
+                                        'zone_id': zone_id,
+                                        'track_id': track_id,
+                                        'entry_time': entry_time,
+                                        'exit_time': timestamp,
+                                        'duration': dwell_duration
+                                    })
+                                obj_data['in_zone'] = False
                         
-                        if obj_data.get('counted', False):
-                            is_counted_in_any_zone = True
-            
-            # Draw dot based on priority: Active (Blue) > Counted (Green) > Detected (Red)
-            if is_active_in_any_zone:
-                cv2.circle(frame, (center_x, center_y), 9, (244, 133, 66), -1) # Blue (Active)
-            elif is_counted_in_any_zone:
-                cv2.circle(frame, (center_x, center_y), 9, (83, 168, 51), -1) # Green (Counted)
-            elif matches_any_zone_class:
-                cv2.circle(frame, (center_x, center_y), 9, (54, 67, 234), -1) # Red (Not Counted but Matched Class)
-
-        # Draw all zones
-        for zd in zone_data:
-            if zd['is_line']:
-                pt1 = (int(zd['area'][0][0]), int(zd['area'][0][1]))
-                pt2 = (int(zd['area'][1][0]), int(zd['area'][1][1]))
-                cv2.line(frame, pt1, pt2, zd['color'], 3)
-            else:
-                cv2.polylines(frame, [zd['area_np']], True, zd['color'], 3)
-        
-        # Draw count text for each zone (stacked vertically)
-        y_offset = int(height * 0.05)
-        for idx, zd in enumerate(zone_data):
-            zone_id = zd['id']
-            text_color = get_color_from_class_id(zd['class_ids'][0])  # Use first class for display color
-            
-            # Zone label with count
-            zone_label = zd.get('label', f'Zone {idx + 1}')
-            
-            # Different display for line zones vs polygon zones
-            if zd['is_line'] and zone_id in line_crossing_counts:
-                lc = line_crossing_counts[zone_id]
-                count_text = f"{zone_label}: IN {lc['in']} | OUT {lc['out']}"
-            else:
-                count = len(crossed_objects_per_zone.get(zone_id, {}))
-                count_text = f"{zone_label}: {count}"
+                            if obj_data.get('counted', False):
+                                is_counted_in_any_zone = True
             
-            text_position = (int(width * 0.02), y_offset + int(idx * height * 0.05))
-            cv2.putText(frame, count_text, text_position, font, font_scale, text_color, font_thickness)
-        
-        # Only resize if necessary
-        if frame.shape[1] != width or frame.shape[0] != height:
-             frame = cv2.resize(frame, (width, height))
+                # Dot state by priority: Active (Blue) > Counted (Green) > Detected (Red)
+                if is_active_in_any_zone:
+                    dot_state = STATE_ACTIVE
+                elif is_counted_in_any_zone:
+                    dot_state = STATE_COUNTED
+                elif matches_any_zone_class:
+                    dot_state = STATE_DETECTED
+                else:
+                    dot_state = STATE_NONE
+                dot_states.append(dot_state)
+                if render_video and dot_state != STATE_NONE:
+                    cv2.circle(frame, (center_x, center_y), 9, DOT_COLORS[dot_state], -1)
+
+            if track_ids:
+                tracked = boxes.numpy()[:len(track_ids)]
+                heatmap.add_frame(timestamp, tracked[:, 0], tracked[:, 1], detected_classes)
+
+            if overlay_writer is not None:
+                # Presentation time of this frame in the source video (the frontend overlays the original)
+                overlay_writer.add_frame((frame_counter - 1) / fps, track_ids, detected_classes,
+                                         boxes.numpy(), dot_states)
+
+            # Evict tracks ByteTrack has given up on, closing any open dwell intervals
+            for track_id, track in track_store.evict_stale(processed_frames):
+                _finalize_evicted_track(track_id, track, crossed_objects_per_zone, dwell_events)
+
+            now = time.perf_counter()
+            metrics.observe_stage('offline', 'zones', now - stage_start)
+            stage_start = now
+
+            if render_video:
+                frame = _draw_zones(frame, zone_data, zone_counts, line_crossing_counts, width, height)
+            now = time.perf_counter()
+            metrics.observe_stage('offline', 'render', render_time + now - stage_start)
+            stage_start = now
              
-        out.write(frame)
+            if out is not None:
+                out.write(frame)
+            now = time.perf_counter()
+            metrics.observe_stage('offline', 'encode', now - stage_start)
+            metrics.pipeline_frame('offline', taskID)
+            if allocation is not None:
+                allocation.frame()
         
-        # Calculate progress percentage
-        progress = int((frame_counter / total_frames) * 100) if total_frames > 0 else 0
-        
-        if success:
-            # Convert heatmap grid to list for JSON serialization
-            heatmap_data = heatmap_grid.tolist()
-            yield frame, progress, detection_events, dwell_events, line_crossing_counts, heatmap_data
-        else:
-            break
-        
-    cap.release()
-    out.release()
+            # The accumulator itself; consumers take heatmap.grid() once they are done
+            yield frame, progress, detection_events, dwell_events, line_crossing_counts, heatmap
+            # Don't bill the consumer's time (DB writes etc.) to the next decode
+            stage_start = time.perf_counter()
+        completed = True
+    finally:
+        # Also on errors and when the consumer stops early (generator closed, worker
+        # terminated): don't leave ffmpeg running with a partial playlist
+        cap.release()
+        if out is not None:
+            _close_video_writer(out, completed)
     end_time = time.time()
     process_time = end_time - start_time
     print("Processing time:", process_time, "seconds")
+
+    if motion_gate.enabled:
+        print(f"Motion gate skipped {motion_gate.frames_skipped}/{motion_gate.frames_seen} frames "
+              f"({motion_gate.skip_ratio:.1%})")
+    if cache_writer is not None:
+        cache_writer.commit(fps=fps, frames=processed_frames, frame_size=(width, height), names=model.names)
+    if overlay_writer is not None:
+        overlay_writer.save(fps=fps, frame_size=(width, height))
+    if save_heatmap:
+        heatmap.save(taskID)
+    if stats is not None:
+        stats['motion_gate'] = motion_gate.stats()
+        stats['tracks'] = {'active': len(track_store), 'evicted': track_store.evicted_count}
+
+
+def render_cached_tracks(path_x, zones, frame_size, taskID, records, meta, states, detection_events,
+                         target_fps=24, time_ranges=None):
+    """
+    Re-render the annotated output video for new zones from the track cache, without
+    inference: the frames the original run analyzed are decoded again and its cached
+    boxes are drawn with the new dot states and zone counts.
+    
+    Args:
+        records, meta: The job's tracks, from track_cache.load()
+        states: Dot state of every record (track_cache.recompute_analytics(return_states=True))
+        detection_events: Detection events recomputed for these zones; they drive the drawn counts
+        path_x, zones, frame_size, taskID, target_fps, time_ranges: As for detection(); target_fps
+            and time_ranges must be the ones the cache was made with
+    
+    Yields:
+        (frame, progress) for every rendered frame
+    """
+    # Imported on use: ultralytics pulls in torch
+    import torch
+    from ultralytics.engine.results import Results
+    
+    width, height = frame_size
+    names = {int(class_id): name for class_id, name in meta['names'].items()} if meta.get('names') else COCO_CLASSES
+    zone_data, _ = _prepare_zones(zones)
+    zone_counts = {z['id']: 0 for z in zones}
+    line_crossing_counts = {zd['id']: {'in': 0, 'out': 0} for zd in zone_data if zd['is_line']}
+    # Records are in pipeline order, so each frame's boxes are one slice
+    sources = np.asarray(records['source'])
+    next_event = 0
+    
+    cap = cv2.VideoCapture(path_x)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    newFPS = target_fps if fps > target_fps else fps
+    if time_ranges:
+        frame_ranges = _frame_ranges(time_ranges, fps, total_frames)
+        if not frame_ranges:
+            cap.release()
+            raise ValueError("Time ranges are outside the video")
+    else:
+        frame_ranges = [(0, math.inf)]
+    selected_frames = sum(end - first for first, end in frame_ranges) if time_ranges else total_frames
+    
+    out = _open_video_writer(taskID, 'uploads/outputs/' + 'output_' + taskID + '.mp4', newFPS, (width, height))
+    completed = False
+    try:
+        for frame_counter, frame, _, progress in _sampled_frames(cap, frame_ranges, fps / newFPS, selected_frames):
+            timestamp = round(frame_counter / fps, 2)
+            first = np.searchsorted(sources, frame_counter, side='left')
+            end = np.searchsorted(sources, frame_counter, side='right')
+            if end > first:
+                rows = records[first:end]
+                # Same drawing as the pipeline's results[0].plot(): xyxy, track id, conf, class
+                boxes = np.stack([rows['x'] - rows['w'] / 2, rows['y'] - rows['h'] / 2,
+                                  rows['x'] + rows['w'] / 2, rows['y'] + rows['h'] / 2,
+                                  rows['track_id'], rows['conf'], rows['cls']], axis=1).astype(np.float32)
+                frame = Results(frame, path='', names=names, boxes=torch.from_numpy(boxes)).plot()
+                for row, dot_state in zip(rows, states[first:end]):
+                    if dot_state != STATE_NONE:
+                        cv2.circle(frame, (int(row['x']), int(row['y'])), 9, DOT_COLORS[dot_state], -1)
+        
+            # Counts as of this frame
+            while next_event < len(detection_events) and detection_events[next_event]['time'] <= timestamp:
+                event = detection_events[next_event]
+                if event['zone_id'] in line_crossing_counts:
+                    line_crossing_counts[event['zone_id']] = {'in': event['in_count'], 'out': event['out_count']}
+                else:
+                    zone_counts[event['zone_id']] = event['count']
+                next_event += 1
+        
+            frame = _draw_zones(frame, zone_data, zone_counts, line_crossing_counts, width, height)
+            out.write(frame)
+            yield frame, progress
+        completed = True
+    finally:
+        cap.release()
+        _close_video_writer(out, completed)
@@ -0,0 +1,173 @@
+"""
+Activity heatmap accumulation.
+
+Box centers are binned once per frame (vectorized) into a fine base grid, kept
+per class and per time slice. Each slice is stored sparsely as (slice, class,
+cell, count) rows in instance/heatmaps/<task_id>.npz, so any coarser
+resolution, class filter or time range is served by summing the stored
+partial sums instead of reprocessing the video.
+"""
+import os
+
+import numpy as np
+
+HEATMAP_DIR = 'instance/heatmaps'
+
+# Base grid (cells per side). Multiples of the legacy 50x50 grid downsample exactly.
+BASE_RESOLUTION = 200
+
+# Length of a time slice in seconds (granularity of time range queries)
+SLICE_SECONDS = 10.0
+
+# Resolution of the heatmap_data grid stored on the job
+LEGACY_RESOLUTION = 50
+
+
+def cell_index(xs, ys, frame_size, resolution=BASE_RESOLUTION):
+    """Flat grid cell (row-major) for each box center, clamped to the grid."""
+    width, height = frame_size
+    # Same binning as the pipeline always used: integer centers, truncated cell coordinates
+    cx = np.asarray(xs).astype(np.int64)
+    cy = np.asarray(ys).astype(np.int64)
+    gx = np.clip((cx / width * resolution).astype(np.int64), 0, resolution - 1)
+    gy = np.clip((cy / height * resolution).astype(np.int64), 0, resolution - 1)
+    return gy * resolution + gx
+
+
+def downsample(grid, resolution):
+    """
+    Sum a square base grid into `resolution` x `resolution` cells. Base cell i
+    goes to cell floor(i * resolution / base), which is exact when resolution
+    divides the base.
+    """
+    base = grid.shape[0]
+    if resolution == base:
+        return grid
+    starts = -(-np.arange(resolution) * base // resolution)  # ceil(j * base / resolution)
+    return np.add.reduceat(np.add.reduceat(grid, starts, axis=0), starts, axis=1)
+
+
+class HeatmapAccumulator:
+    """
+    Usage:
+        heatmap = HeatmapAccumulator((width, height))
+        heatmap.add_frame(timestamp, xs, ys, classes)
+        heatmap.grid(50)       # all classes, whole video
+        heatmap.save(task_id)  # per-class, time-sliced partial sums
+    """
+
+    def __init__(self, frame_size, base=BASE_RESOLUTION, slice_seconds=SLICE_SECONDS):
+        self.frame_size = tuple(frame_size)
+        self.base = base
+        self.slice_seconds = slice_seconds
+        self.total = np.zeros(base * base, dtype=np.float32)
+        self._slice = None
+        self._keys = []  # class * base^2 + cell, for every box in the current slice
+        self._rows = []  # (slices, classes, cells, counts) per flushed slice
+
+    def add_frame(self, timestamp, xs, ys, classes):
+        if not len(xs):
+            return
+        cells = cell_index(xs, ys, self.frame_size, self.base)
+        np.add.at(self.total, cells, 1)
+
+        slice_idx = int(timestamp // self.slice_seconds)
+        if slice_idx != self._slice:
+            self._flush()
+            self._slice = slice_idx
+        self._keys.append(np.asarray(classes, dtype=np.int64)[:len(cells)] * self.base * self.base + cells)
+
+    def _flush(self):
+        if not self._keys:
+            return
+        keys, counts = np.unique(np.concatenate(self._keys), return_counts=True)
+        classes, cells = np.divmod(keys, self.base * self.base)
+        self._rows.append((np.full(len(keys), self._slice, dtype=np.uint32), classes.astype(np.int16),
+                           cells.astype(np.uint32), counts.astype(np.uint32)))
+        self._keys = []
+
+    def grid(self, resolution=LEGACY_RESOLUTION):
+        """All classes over the whole video, as a resolution x resolution float32 array."""
+        return downsample(self.total.reshape(self.base, self.base), resolution)
+
+    def save(self, task_id):
+        self._flush()
+        if self._rows:
+            slices, classes, cells, counts = (np.concatenate(col) for col in zip(*self._rows))
+        else:
+            slices, cells, counts = (np.empty(0, dtype=np.uint32) for _ in range(3))
+            classes = np.empty(0, dtype=np.int16)
+        os.makedirs(HEATMAP_DIR, exist_ok=True)
+        tmp = _path(task_id) + '.tmp.npz'
+        np.savez(tmp, slice=slices, cls=classes, cell=cells, count=counts, base=self.base,
+                 slice_seconds=self.slice_seconds, frame_size=np.asarray(self.frame_size))
+        os.replace(tmp, _path(task_id))
+
+
+def build(timestamps, xs, ys, classes, frame_size):
+    """Accumulator for a whole set of boxes at once (e.g. rows of a track cache)."""
+    heatmap = HeatmapAccumulator(frame_size)
+    timestamps = np.asarray(timestamps)
+    slices = (timestamps // heatmap.slice_seconds).astype(np.int64)
+    order = np.argsort(slices, kind='stable')
+    bounds = np.flatnonzero(np.r_[True, slices[order][1:] != slices[order][:-1], True])
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        rows = order[start:end]
+        heatmap.add_frame(float(timestamps[rows[0]]), np.asarray(xs)[rows], np.asarray(ys)[rows],
+                          np.asarray(classes)[rows])
+    return heatmap
+
+
+def _path(task_id):
+    return os.path.join(HEATMAP_DIR, f'{task_id}.npz')
+
+
+def exists(task_id):
+    return os.path.exists(_path(task_id))
+
+
+def delete(task_id):
+    try:
+        os.remove(_path(task_id))
+    except OSError:
+        pass
+
+
+def query(task_id, resolution=LEGACY_RESOLUTION, classes=None, start=None, end=None):
+    """
+    Sum the stored partial sums for a class filter and time range.
+    Time ranges are widened to whole slices (SLICE_SECONDS).
+
+    Returns:
+        dict with grid (resolution x resolution list), max, total, the slice-aligned
+        start/end actually covered, and the classes present in the data
+    """
+    with np.load(_path(task_id)) as data:
+        slices, cls, cells, counts = data['slice'], data['cls'], data['cell'], data['count']
+        base = int(data['base'])
+        slice_seconds = float(data['slice_seconds'])
+
+    resolution = min(max(int(resolution), 1), base)
+    mask = np.ones(len(cells), dtype=bool)
+    if classes:
+        mask &= np.isin(cls, classes)
+    first = int(start // slice_seconds) if start is not None else 0
+    if end is not None:
+        last = int(-(-end // slice_seconds))  # Exclusive
+    else:
+        last = int(slices.max()) + 1 if len(slices) else 0
+    mask &= (slices >= first) & (slices < last)
+
+    grid = np.bincount(cells[mask], weights=counts[mask], minlength=base * base)
+    grid = downsample(grid.reshape(base, base), resolution)
+    return {
+        'resolution': resolution,
+        'baseResolution': base,
+        'sliceSeconds': slice_seconds,
+        'start': first * slice_seconds,
+        'end': max(last, first) * slice_seconds,
+        'classes': np.unique(cls).tolist(),
+        'total': int(grid.sum()),
+        'max': int(grid.max()) if grid.size else 0,
+        'grid': grid.astype(np.int64).tolist(),
+    }
@@ -0,0 +1,158 @@
+"""
+Progressive HLS output for the offline pipeline.
+
+Annotated frames are piped to an ffmpeg process that encodes H.264 and writes
+fragmented MP4 segments plus an EVENT playlist as it goes, so results can be
+watched (and seeked segment by segment) while the job is still running. When
+the pipeline finishes, the segments are remuxed without re-encoding into the
+usual output_<task>.mp4 for download.
+
+ffmpeg is an optional system dependency (installed in the Docker image); when
+it is not on PATH the pipeline keeps using cv2.VideoWriter. If ffmpeg exits
+mid-job, the writer switches to a fallback writer instead of failing the job.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+# Target segment length in seconds (a keyframe is forced at every boundary)
+SEGMENT_SECONDS = 2
+
+PLAYLIST_NAME = 'index.m3u8'
+
+# Fixed profile/level so clients know the codec string up front (avc1.640033)
+H264_PROFILE = 'high'
+H264_LEVEL = '5.1'
+
+
+def hls_available():
+    return shutil.which('ffmpeg') is not None
+
+
+def hls_dir(task_id):
+    return os.path.join('uploads/outputs', f'hls_{task_id}')
+
+
+def playlist_path(task_id):
+    return os.path.join(hls_dir(task_id), PLAYLIST_NAME)
+
+
+class HlsWriter:
+    """
+    Drop-in replacement for cv2.VideoWriter (write / isOpened / release).
+
+    Usage:
+        out = HlsWriter(task_id, 'uploads/outputs/output_<task>.mp4', fps, (width, height))
+        out.write(frame)
+        out.release()  # finalizes the playlist and writes the full MP4 (or out.abort())
+
+    fallback: Called with no arguments to open another writer for output_path
+    (e.g. cv2.VideoWriter) if ffmpeg exits while frames are written. The frames
+    ffmpeg had already received are lost, the job goes on.
+    """
+
+    def __init__(self, task_id, output_path, fps, frame_size, segment_seconds=SEGMENT_SECONDS, fallback=None):
+        self.output_path = output_path
+        self.frame_size = tuple(frame_size)
+        self._fallback = fallback
+        self._fallback_writer = None
+        self.dir = hls_dir(task_id)
+        self.playlist = os.path.join(self.dir, PLAYLIST_NAME)
+
+        # Start from a clean directory when a job is reprocessed
+        shutil.rmtree(self.dir, ignore_errors=True)
+        os.makedirs(self.dir, exist_ok=True)
+
+        width, height = self.frame_size
+        gop = max(1, round(fps * segment_seconds))
+        cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{width}x{height}', '-r', f'{fps}', '-i', '-',
+            # yuv420p needs even dimensions: pad odd ones with a black row/column
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+            '-profile:v', H264_PROFILE, '-level', H264_LEVEL,
+            '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0',
+            '-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'event',
+            '-hls_segment_type', 'fmp4', '-hls_fmp4_init_filename', 'init.mp4',
+            '-hls_segment_filename', os.path.join(self.dir, 'seg_%05d.m4s'),
+            self.playlist,
+        ]
+        # A file rather than a pipe: nobody reads stderr while frames are written,
+        # and a full pipe would block ffmpeg
+        self._stderr_file = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=self._stderr_file)
+
+    def isOpened(self):
+        if self._fallback_writer is not None:
+            return self._fallback_writer.isOpened()
+        return self._proc is not None and self._proc.poll() is None
+
+    def write(self, frame):
+        if frame.shape[1] != self.frame_size[0] or frame.shape[0] != self.frame_size[1]:
+            raise ValueError(f'Frame size {frame.shape[1]}x{frame.shape[0]} does not match {self.frame_size}')
+        if self._fallback_writer is not None:
+            self._fallback_writer.write(frame)
+            return
+        try:
+            self._proc.stdin.write(frame.tobytes())
+        except (BrokenPipeError, OSError, ValueError):
+            error = f'ffmpeg exited: {self._stderr()}'
+            if self._fallback is None:
+                raise RuntimeError(error)
+            print(f"{error}; falling back to another video writer")
+            self.abort()
+            self._fallback_writer = self._fallback()
+            self._fallback_writer.write(frame)
+
+    def release(self):
+        """Finish the playlist (adds #EXT-X-ENDLIST) and remux the segments into one MP4."""
+        if self._fallback_writer is not None:
+            self._fallback_writer.release()
+            self._fallback_writer = None
+            return
+        if self._proc is None:
+            return
+        proc, self._proc = self._proc, None
+        proc.stdin.close()
+        if proc.wait() != 0:
+            print(f"ffmpeg HLS encoder failed: {self._stderr()}")
+            return
+        remux = subprocess.run(
+            ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-i', self.playlist,
+             '-c', 'copy', '-movflags', '+faststart', self.output_path],
+            stderr=subprocess.PIPE
+        )
+        if remux.returncode != 0:
+            print(f"Failed to remux HLS segments: {remux.stderr.decode(errors='replace').strip()}")
+
+    def abort(self):
+        """
+        Stop encoding without finalizing (processing failed or was cancelled): ffmpeg is
+        killed and its segments are removed, so no playlist that stops partway is served.
+        """
+        if self._fallback_writer is not None:
+            self._fallback_writer.release()
+            self._fallback_writer = None
+        if self._proc is None:
+            return
+        proc, self._proc = self._proc, None
+        proc.kill()
+        proc.wait()
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass  # Frames still buffered for the dead process
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _stderr(self):
+        try:
+            self._stderr_file.seek(0)
+            return self._stderr_file.read().decode(errors='replace').strip()
+        except (OSError, ValueError):
+            return ''
+
+    def __del__(self):
+        # The pipeline generator may be closed mid-video; don't leave ffmpeg running
+        self.abort()
@@ -7,11 +7,13 @@ import cv2
 import os
 import tempfile
 import time
-import shutil
 import colorsys
 import numpy as np
-from collections import defaultdict
-from ultralytics import YOLO
+
+from app.core.model_loader import acquire_model, release_model
+from app.services import governor, metrics
+from app.core.motion_gate import MotionGate
+from app.core.track_store import TrackStore
 
 
 def get_color_from_class_id(class_id):
@@ -38,6 +40,9 @@ def check_line_crossing(prev_pos, curr_pos, line_start, line_end):
     return ccw(A, C, D) != ccw(B, C, D) and ccw(A, B, C) != ccw(A, B, D)
 
 
+# Frame rate limit for streaming (frames arriving faster are dropped)
+TARGET_FPS = 15
+
 # Global state management for live streams
 _active_streams = {}
 
@@ -60,6 +65,67 @@ def get_stream_counts(task_id):
     return {}
 
 
+def get_skip_ratio(task_id):
+    """Fraction of frames where the motion gate skipped inference for a running stream."""
+    if task_id in _active_streams:
+        return _active_streams[task_id].get('skip_ratio', 0.0)
+    return 0.0
+
+
+def open_stream(task_id):
+    """Initialize stream state with analytics history."""
+    _active_streams[task_id] = {
+        'running': True,
+        'counts': {},
+        'history': [],  # List of {time: seconds_since_start, counts: {zone_id: count}}
+        'peak_counts': {},  # {zone_id: {count: N, time: T}}
+        'skip_ratio': 0.0,  # Fraction of frames where the motion gate skipped inference
+        'start_time': time.time()
+    }
+
+
+def close_stream(task_id):
+    if task_id in _active_streams:
+        del _active_streams[task_id]
+
+
+def record_counts(task_id, counts, skip_ratio):
+    """
+    Update a stream's counts, history and peaks after a frame.
+    
+    Returns:
+        False if the stream was stopped and its state removed
+    """
+    if task_id not in _active_streams:
+        return False
+        
+    stream_state = _active_streams[task_id]
+    stream_state['counts'] = counts
+    stream_state['skip_ratio'] = skip_ratio
+    
+    # Record history snapshot (for rolling chart)
+    elapsed_time = round(time.time() - stream_state['start_time'], 1)
+    stream_state['history'].append({
+        'time': elapsed_time,
+        'counts': counts.copy()
+    })
+    
+    # Keep only last 120 seconds of history (2 minutes)
+    max_history_time = 120
+    stream_state['history'] = [
+        h for h in stream_state['history'] 
+        if h['time'] > elapsed_time - max_history_time
+    ]
+    
+    # Track peaks
+    for zone_id, count in counts.items():
+        if zone_id not in stream_state['peak_counts']:
+            stream_state['peak_counts'][zone_id] = {'count': 0, 'time': 0}
+        if count > stream_state['peak_counts'][zone_id]['count']:
+            stream_state['peak_counts'][zone_id] = {'count': count, 'time': elapsed_time}
+    return True
+
+
 def get_stream_analytics(task_id):
     """Get comprehensive analytics data for a running stream."""
     if task_id not in _active_streams:
@@ -95,12 +161,14 @@ def get_stream_analytics(task_id):
         'rates': rates,
         'history': history[-60:],  # Last 60 data points for chart
         'elapsed': elapsed,
+        'skip_ratio': stream.get('skip_ratio', 0.0),
         'running': stream.get('running', False)
     }
 
 
 def live_detection(stream_url, zones, frame_size, task_id, conf=40, 
-                   model_name='yolo11n.pt', tracker_config=None, source_type='rtsp'):
+                   model_name='yolo11n.pt', tracker_config=None, source_type='rtsp',
+                   motion_gate_config=None, roi_config=None, model=None):
     """
     Generator yielding processed frames from live stream.
     
@@ -113,6 +181,9 @@ def live_detection(stream_url, zones, frame_size, task_id, conf=40,
         model_name: Name of the YOLO model file
         tracker_config: ByteTrack configuration dict
         source_type: "rtsp" or "webcam"
+        motion_gate_config: Motion gate configuration dict (None disables the gate)
+        roi_config: ROI cropping/tiling configuration dict (None runs on the full frame)
+        model: Already-loaded model to use instead of loading model_name (e.g. a benchmark stub)
     
     Yields:
         (jpeg_bytes, counts_dict) - JPEG encoded frame and current counts per zone
@@ -142,30 +213,37 @@ fuse_score: True
     tracker_yaml_file.write(tracker_yaml_content)
     tracker_yaml_file.close()
     
-    # Initialize stream state with analytics history
-    _active_streams[task_id] = {
-        'running': True,
-        'counts': {},
-        'history': [],  # List of {time: seconds_since_start, counts: {zone_id: count}}
-        'peak_counts': {},  # {zone_id: {count: N, time: T}}
-        'start_time': time.time()
-    }
+    open_stream(task_id)
     
+    owns_model = model is None
+    metrics.pipeline_started('live', task_id)
+    allocation = None
     try:
+        if owns_model:
+            model = acquire_model(model_name)
+        # Thread budget for this stream, applied in the thread that consumes this generator
+        allocation = governor.acquire('live', task_id)
         yield from _run_live_detection(
             stream_url, zones, frame_size, task_id, conf, 
-            model_name, tracker_yaml_path, source_type
+            model, tracker_yaml_path, source_type, motion_gate_config, roi_config,
+            track_ttl=int(tracker_config.get('track_buffer', 30)),
+            allocation=allocation
         )
     finally:
         # Cleanup
+        metrics.pipeline_finished('live', task_id)
+        if allocation is not None:
+            governor.release(allocation)
+        if owns_model and model is not None:
+            release_model(model_name, model)
         if os.path.exists(tracker_yaml_path):
             os.remove(tracker_yaml_path)
-        if task_id in _active_streams:
-            del _active_streams[task_id]
+        close_stream(task_id)
 
 
 def _run_live_detection(stream_url, zones, frame_size, task_id, conf, 
-                        model_name, tracker_yaml_path, source_type):
+                        model, tracker_yaml_path, source_type, motion_gate_config=None,
+                        roi_config=None, track_ttl=30, allocation=None):
     """Internal generator for live detection processing."""
     
     width, height = frame_size
@@ -177,22 +255,6 @@ def _run_live_detection(stream_url, zones, frame_size, task_id, conf,
     BASE_FONT_THICKNESS = 2
     font_thickness = max(1, max(width, height) // 1000 * BASE_FONT_THICKNESS)
     
-    # Load model
-    model_path = f"weights/{model_name}"
-    if not os.path.exists(model_path):
-        print(f"Model {model_name} not found in weights/. Attempting auto-download...")
-        try:
-            temp_model = YOLO(model_name)
-            if os.path.exists(model_name):
-                os.makedirs("weights", exist_ok=True)
-                shutil.move(model_name, model_path)
-            model = YOLO(model_path)
-        except Exception as e:
-            print(f"Failed to auto-download {model_name}: {e}. Falling back to yolo11n.pt")
-            model = YOLO('weights/yolo11n.pt')
-    else:
-        model = YOLO(model_path)
-    
     # Connect to stream
     if source_type == 'webcam':
         cap = cv2.VideoCapture(int(stream_url))
@@ -202,9 +264,10 @@ def _run_live_detection(stream_url, zones, frame_size, task_id, conf,
     if not cap.isOpened():
         raise ValueError(f"Could not open stream: {stream_url}")
     
-    # Tracking state
-    track_history = defaultdict(lambda: [])
-    crossed_objects_per_zone = {z['id']: {} for z in zones}
+    # Tracking state (bounded: tracks unseen for track_buffer frames are evicted)
+    track_store = TrackStore(max_points=30, ttl=track_ttl)
+    crossed_objects_per_zone = {z['id']: set() for z in zones}
+    zone_counts = {z['id']: 0 for z in zones}
     
     # Preprocess zones
     zone_data = []
@@ -237,12 +300,26 @@ def _run_live_detection(stream_url, zones, frame_size, task_id, conf,
     ClassIDs = list(all_class_ids) if all_class_ids else [19]
     conf_float = conf / 100.0
     
+    # Motion gate: skip inference on static frames and carry tracks forward
+    motion_gate = MotionGate(motion_gate_config or {'enabled': False}, (width, height), zones)
+    last_results = None
+    
     frame_count = 0
-    target_fps = 15  # Limit FPS for streaming
-    frame_interval = 1.0 / target_fps
+    processed_frames = 0  # Frames that went through the tracker (drives track eviction)
+    frame_interval = 1.0 / TARGET_FPS
+    
+    # Zone-aware ROI: only run inference on the region covered by the zones
+    roi_tracker = None
+    if roi_config and roi_config.get('enabled', True):
+        # Imported on use: the tiled tracker pulls in ultralytics/torch
+        from app.core.roi import RoiTracker, compute_zone_roi
+        roi = compute_zone_roi(zones, (width, height), int(roi_config.get('padding', 32)))
+        if roi is not None:
+            roi_tracker = RoiTracker(model, tracker_yaml_path, roi, roi_config)
     last_frame_time = 0
     
     while _active_streams.get(task_id, {}).get('running', False):
+        stage_start = time.perf_counter()
         success, frame = cap.read()
         if not success:
             # Try to reconnect
@@ -259,34 +336,49 @@ def _run_live_detection(stream_url, zones, frame_size, task_id, conf,
         # Control frame rate
         current_time = time.time()
         if current_time - last_frame_time < frame_interval:
+            metrics.frame_dropped('live', 'rate_limit')
             continue
         last_frame_time = current_time
+        processed_frames += 1
+        now = time.perf_counter()
+        metrics.observe_stage('live', 'decode', now - stage_start)
+        stage_start = now
         
         # Resize if needed
         if frame.shape[1] != width or frame.shape[0] != height:
             frame = cv2.resize(frame, (width, height))
         
-        # Run detection
-        results = model.track(frame, classes=ClassIDs, persist=True, save=False, 
-                             tracker=tracker_yaml_path, conf=conf_float, verbose=False)
+        # Run detection (unless the scene is static)
+        if motion_gate.should_infer(frame) or last_results is None:
+            if roi_tracker is not None:
+                results = roi_tracker.track(frame, ClassIDs, conf_float)
+            else:
+                results = model.track(frame, classes=ClassIDs, persist=True, save=False, 
+                                     tracker=tracker_yaml_path, conf=conf_float, verbose=False)
+            last_results = results
+            now = time.perf_counter()
+            metrics.observe_inference('live', results, now - stage_start)
+            stage_start = now
+            frame = results[0].plot()
+        else:
+            results = last_results
+            frame = results[0].plot(img=frame)
+        now = time.perf_counter()
+        render_time = now - stage_start
+        stage_start = now
         boxes = results[0].boxes.xywh.cpu()
         track_ids = (results[0].boxes.id.int().cpu().tolist() 
                     if results[0].boxes is not None and results[0].boxes.id is not None else [])
         detected_classes = (results[0].boxes.cls.int().cpu().tolist() 
                            if results[0].boxes is not None else [])
         
-        frame = results[0].plot()
-        
         # Process detections per zone
         for i, (box, track_id) in enumerate(zip(boxes, track_ids)):
             x, y, w, h = box
             center_x, center_y = int(x), int(y)
             detected_class = detected_classes[i] if i < len(detected_classes) else -1
             
-            track = track_history[track_id]
-            track.append((float(x), float(y)))
-            if len(track) > 30:
-                track.pop(0)
+            track = track_store.update(track_id, float(x), float(y), processed_frames)
             
             for zd in zone_data:
                 # Only check if detection matches any of zone's target classes
@@ -309,7 +401,8 @@ def _run_live_detection(stream_url, zones, frame_size, task_id, conf,
                 
                 if in_zone:
                     if track_id not in crossed_objects_per_zone[zone_id]:
-                        crossed_objects_per_zone[zone_id][track_id] = True
+                        crossed_objects_per_zone[zone_id].add(track_id)
+                        zone_counts[zone_id] += 1
                     cv2.circle(frame, (center_x, center_y), 9, (244, 133, 66), -1)
                 else:
                     if track_id in crossed_objects_per_zone[zone_id]:
@@ -317,6 +410,15 @@ def _run_live_detection(stream_url, zones, frame_size, task_id, conf,
                     else:
                         cv2.circle(frame, (center_x, center_y), 9, (54, 67, 234), -1)
         
+        now = time.perf_counter()
+        metrics.observe_stage('live', 'zones', now - stage_start)
+        stage_start = now
+        
+        # Evict tracks ByteTrack has given up on; totals stay in zone_counts
+        for track_id, _ in track_store.evict_stale(processed_frames):
+            for zone_tracks in crossed_objects_per_zone.values():
+                zone_tracks.discard(track_id)
+        
         # Draw zones
         for zd in zone_data:
             if zd['is_line']:
@@ -331,7 +433,7 @@ def _run_live_detection(stream_url, zones, frame_size, task_id, conf,
         counts = {}
         for idx, zd in enumerate(zone_data):
             zone_id = zd['id']
-            count = len(crossed_objects_per_zone.get(zone_id, {}))
+            count = zone_counts.get(zone_id, 0)
             counts[zone_id] = count
             text_color = get_color_from_class_id(zd['class_ids'][0])  # Use first class for display color
             zone_label = zd.get('label', f'Zone {idx + 1}')
@@ -340,36 +442,20 @@ def _run_live_detection(stream_url, zones, frame_size, task_id, conf,
             cv2.putText(frame, count_text, text_position, font, font_scale, text_color, font_thickness)
         
         # Update global state with history and peaks (safely)
-        if task_id not in _active_streams:
+        if not record_counts(task_id, counts, motion_gate.skip_ratio):
             break  # Stream was stopped, exit loop
-            
-        stream_state = _active_streams[task_id]
-        stream_state['counts'] = counts
-        
-        # Record history snapshot (for rolling chart)
-        elapsed_time = round(time.time() - stream_state['start_time'], 1)
-        stream_state['history'].append({
-            'time': elapsed_time,
-            'counts': counts.copy()
-        })
-        
-        # Keep only last 120 seconds of history (2 minutes)
-        max_history_time = 120
-        stream_state['history'] = [
-            h for h in stream_state['history'] 
-            if h['time'] > elapsed_time - max_history_time
-        ]
         
-        # Track peaks
-        for zone_id, count in counts.items():
-            if zone_id not in stream_state['peak_counts']:
-                stream_state['peak_counts'][zone_id] = {'count': 0, 'time': 0}
-            if count > stream_state['peak_counts'][zone_id]['count']:
-                stream_state['peak_counts'][zone_id] = {'count': count, 'time': elapsed_time}
+        now = time.perf_counter()
+        metrics.observe_stage('live', 'render', render_time + now - stage_start)
+        stage_start = now
         
         # Encode as JPEG
         _, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
         jpeg_bytes = jpeg.tobytes()
+        metrics.observe_stage('live', 'encode', time.perf_counter() - stage_start)
+        metrics.pipeline_frame('live', task_id)
+        if allocation is not None:
+            allocation.frame()
         
         yield jpeg_bytes, counts
     
@@ -0,0 +1,141 @@
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from app.services import metrics
+
+# Loaded and run once in the background at startup, so the first job doesn't pay for it
+WARMUP_MODEL = 'yolo11n.pt'
+WARMUP_IMAGE_SIZE = 640
+
+# Idle loaded models per model name. A model is only ever used by one job or
+# stream at a time because ByteTrack state lives on the model's predictor.
+_model_pool = {}
+_pool_lock = threading.Lock()
+_loaded_count = {}
+
+
+def load_model(model_name='yolo11n.pt'):
+    """
+    Load a YOLO model from the weights/ folder, downloading it on first use.
+    Falls back to yolo11n.pt if the requested model cannot be downloaded.
+    """
+    # Deferred: importing ultralytics (and torch) takes seconds
+    from ultralytics import YOLO
+
+    model_path = f"weights/{model_name}"
+    
+    # Check if model exists in weights folder
+    if not os.path.exists(model_path):
+        print(f"Model {model_name} not found in weights/. Attempting auto-download...")
+        try:
+            # Download to current directory (default YOLO behavior)
+            temp_model = YOLO(model_name) 
+            
+            # YOLO downloads to current directory
+            if os.path.exists(model_name):
+                os.makedirs("weights", exist_ok=True)
+                shutil.move(model_name, model_path)
+                print(f"Moved {model_name} to {model_path}")
+                
+            return YOLO(model_path)
+        except Exception as e:
+            print(f"Failed to auto-download {model_name}: {e}. Falling back to yolo11n.pt")
+            return YOLO('weights/yolo11n.pt')
+    
+    return YOLO(model_path)
+
+
+def acquire_model(model_name='yolo11n.pt'):
+    """Take an idle model from the cache, or load a new one."""
+    with _pool_lock:
+        idle = _model_pool.get(model_name)
+        if idle:
+            metrics.inc_counter('locus_model_cache_hits_total', 'Models reused from the cache')
+            return idle.pop()
+
+    metrics.inc_counter('locus_model_cache_misses_total', 'Models loaded from disk')
+    model = load_model(model_name)
+    with _pool_lock:
+        _loaded_count[model_name] = _loaded_count.get(model_name, 0) + 1
+    return model
+
+
+def release_model(model_name, model):
+    """Return a model to the cache once its job or stream has finished."""
+    # Drop the predictor so the next user starts with fresh tracker state
+    model.predictor = None
+    with _pool_lock:
+        _model_pool.setdefault(model_name, []).append(model)
+
+
+def get_cache_stats():
+    """Loaded and idle model counts per model name."""
+    with _pool_lock:
+        return {
+            name: {'loaded': loaded, 'idle': len(_model_pool.get(name, []))}
+            for name, loaded in _loaded_count.items()
+        }
+
+
+_warmup = {'state': 'pending', 'model': None, 'error': None, 'seconds': None}
+_warmup_lock = threading.Lock()
+
+
+def warmup_model(model_name=WARMUP_MODEL):
+    """
+    Import the ML stack, load a model and run one inference on a blank frame
+    (device init, layer fusing), then leave it idle in the cache for the first job.
+    """
+    with _warmup_lock:
+        if _warmup['state'] == 'warming':
+            return
+        _warmup.update(state='warming', model=model_name, error=None, seconds=None)
+
+    start = time.perf_counter()
+    try:
+        from app.services.gpu_utils import get_device
+
+        model = acquire_model(model_name)
+        try:
+            blank = np.zeros((WARMUP_IMAGE_SIZE, WARMUP_IMAGE_SIZE, 3), dtype=np.uint8)
+            model.predict(blank, device=get_device(), verbose=False)
+        finally:
+            release_model(model_name, model)
+    except Exception as e:
+        print(f"Model warmup failed for {model_name}: {e}")
+        with _warmup_lock:
+            _warmup.update(state='failed', error=str(e), seconds=round(time.perf_counter() - start, 2))
+        return
+
+    seconds = round(time.perf_counter() - start, 2)
+    print(f"Model {model_name} warmed up in {seconds}s")
+    with _warmup_lock:
+        _warmup.update(state='ready', seconds=seconds)
+
+
+def start_warmup(model_name=WARMUP_MODEL):
+    """Warm up a model on a background thread (returns immediately)."""
+    threading.Thread(target=warmup_model, args=(model_name,), name='model-warmup', daemon=True).start()
+
+
+def get_warmup_status():
+    """
+    Returns:
+        dict with state ('pending', 'warming', 'ready' or 'failed'), model, error and seconds
+    """
+    with _warmup_lock:
+        return dict(_warmup)
+
+
+metrics.register_gauge(
+    'locus_model_cache_loaded_models', 'Models loaded into memory',
+    lambda: {(('model', name),): s['loaded'] for name, s in get_cache_stats().items()}
+)
+metrics.register_gauge(
+    'locus_model_cache_idle_models', 'Loaded models not currently in use',
+    lambda: {(('model', name),): s['idle'] for name, s in get_cache_stats().items()}
+)
@@ -0,0 +1,140 @@
+"""
+Motion gate for skipping inference on static frames.
+
+Fixed cameras often show an empty, unchanging scene for long stretches. The gate
+compares a heavily downscaled grayscale copy of each sampled frame against the
+frame on which inference last ran, and only lets the detector run when enough
+pixels changed (or when a forced refresh is due).
+"""
+
+import cv2
+import numpy as np
+
+# Default motion gate settings (mirrors MotionGateConfig in app/models/schemas.py)
+DEFAULT_MOTION_GATE_CONFIG = {
+    'enabled': True,
+    'threshold': 25,
+    'min_changed_ratio': 0.002,
+    'refresh_interval': 30,
+    'downscale_width': 160,
+    'zones_only': False
+}
+
+
+class MotionGate:
+    """
+    Decides per frame whether the detector needs to run.
+
+    Usage:
+        gate = MotionGate(config, frame_size, zones)
+        if gate.should_infer(frame):
+            results = model.track(frame, ...)
+        else:
+            ...  # carry forward the previous tracks
+    """
+
+    def __init__(self, config, frame_size, zones=None):
+        """
+        Args:
+            config: Motion gate configuration dict (see DEFAULT_MOTION_GATE_CONFIG)
+            frame_size: Tuple of (width, height) of the frames passed to should_infer
+            zones: List of zone objects [{id, points, ...}] used when zones_only is set
+        """
+        config = {**DEFAULT_MOTION_GATE_CONFIG, **(config or {})}
+
+        self.enabled = bool(config['enabled'])
+        self.threshold = int(config['threshold'])
+        self.min_changed_ratio = float(config['min_changed_ratio'])
+        self.refresh_interval = max(1, int(config['refresh_interval']))
+
+        width, height = frame_size
+        self.small_width = min(int(config['downscale_width']), width) or width
+        self.small_height = max(1, int(round(height * self.small_width / width)))
+        self.scale = self.small_width / width
+
+        self.mask = None
+        if config['zones_only'] and zones:
+            self.mask = self._build_zone_mask(zones)
+
+        self.reference = None
+        self.frames_since_inference = 0
+        self.frames_seen = 0
+        self.frames_skipped = 0
+
+    def _build_zone_mask(self, zones):
+        """Rasterize zone polygons/lines into a mask at the downscaled resolution."""
+        mask = np.zeros((self.small_height, self.small_width), dtype=np.uint8)
+        for zone in zones:
+            points = zone.get('points', [])
+            if len(points) < 2:
+                continue
+            area = np.array([(p['x'] * self.scale, p['y'] * self.scale) for p in points], np.int32)
+            if len(points) == 2:
+                # Line zones: watch a band around the tripwire
+                cv2.line(mask, tuple(area[0]), tuple(area[1]), 255, max(3, self.small_width // 20))
+            else:
+                cv2.fillPoly(mask, [area], 255)
+
+        # Grow the mask slightly so objects approaching a zone wake the detector
+        kernel = np.ones((5, 5), np.uint8)
+        mask = cv2.dilate(mask, kernel, iterations=2)
+        return mask if cv2.countNonZero(mask) > 0 else None
+
+    def _prepare(self, frame):
+        small = cv2.resize(frame, (self.small_width, self.small_height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def should_infer(self, frame):
+        """
+        Returns True if the detector should run on this frame.
+
+        The reference frame is only replaced when inference runs, so slow
+        movement accumulates until it crosses the threshold.
+        """
+        self.frames_seen += 1
+
+        if not self.enabled:
+            return True
+
+        gray = self._prepare(frame)
+
+        if self.reference is None or self.frames_since_inference + 1 >= self.refresh_interval:
+            self._mark_inferred(gray)
+            return True
+
+        diff = cv2.absdiff(gray, self.reference)
+        _, changed = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+
+        if self.mask is not None:
+            changed = cv2.bitwise_and(changed, self.mask)
+            total = cv2.countNonZero(self.mask)
+        else:
+            total = changed.size
+
+        changed_ratio = cv2.countNonZero(changed) / total if total else 0.0
+        if changed_ratio >= self.min_changed_ratio:
+            self._mark_inferred(gray)
+            return True
+
+        self.frames_since_inference += 1
+        self.frames_skipped += 1
+        return False
+
+    def _mark_inferred(self, gray):
+        self.reference = gray
+        self.frames_since_inference = 0
+
+    @property
+    def skip_ratio(self):
+        """Fraction of frames on which inference was skipped."""
+        return round(self.frames_skipped / self.frames_seen, 4) if self.frames_seen else 0.0
+
+    def stats(self):
+        """Summary suitable for storing alongside job results."""
+        return {
+            'enabled': self.enabled,
+            'frames_seen': self.frames_seen,
+            'frames_skipped': self.frames_skipped,
+            'skip_ratio': self.skip_ratio
+        }
@@ -0,0 +1,186 @@
+"""
+Overlay-as-data: per-frame annotations stored separately from the video.
+
+When a job is processed without a rendered video (render_video=False), the
+offline pipeline records each tracked box of every processed frame with its
+track id, class and dot state (the colored dot drawn on the rendered video).
+The frontend draws these over the original upload instead, so the pipeline
+skips plotting and re-encoding entirely, and overlay layers can be toggled
+without reprocessing. Zone counts over time come from the job's
+detection events.
+
+Files live in instance/overlays/<task_id>/ as .npy arrays that are memory-mapped
+when a time range is requested.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+OVERLAY_DIR = 'instance/overlays'
+
+# Dot states, in increasing priority (matches the colors drawn by the pipeline)
+STATE_NONE = 0      # Class not targeted by any zone
+STATE_DETECTED = 1  # Red: matches a zone class, not counted
+STATE_COUNTED = 2   # Green: counted in a zone, currently outside it
+STATE_ACTIVE = 3    # Blue: inside a zone or crossing a line
+
+ROW_DTYPE = np.dtype([
+    ('frame', '<u4'),     # Index into frames.npy
+    ('track_id', '<i4'),
+    ('cls', '<i2'),
+    ('state', 'u1'),
+    ('x', '<f4'),         # Box center / size in frame pixels (xywh)
+    ('y', '<f4'),
+    ('w', '<f4'),
+    ('h', '<f4'),
+], align=False)
+
+
+def overlay_dir(task_id):
+    return os.path.join(OVERLAY_DIR, task_id)
+
+
+def exists(task_id):
+    return os.path.exists(os.path.join(overlay_dir(task_id), 'meta.json'))
+
+
+def delete(task_id):
+    shutil.rmtree(overlay_dir(task_id), ignore_errors=True)
+
+
+class OverlayWriter:
+    """
+    Streams annotations to disk while the pipeline runs (like track_cache.TrackCacheWriter),
+    so memory use doesn't grow with the length of the video.
+
+    Usage:
+        writer = OverlayWriter(task_id)
+        writer.add_frame(timestamp, track_ids, classes, boxes_xywh, states)
+        writer.save(fps=fps, frame_size=(w, h))  # or writer.discard()
+    """
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.frames = 0
+        self.rows = 0
+        os.makedirs(OVERLAY_DIR, exist_ok=True)
+        self._tmp_dir = f'{overlay_dir(task_id)}.{os.getpid()}.tmp'
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+        os.makedirs(self._tmp_dir)
+        self._times_file = open(os.path.join(self._tmp_dir, 'frames.raw'), 'wb')
+        self._rows_file = open(os.path.join(self._tmp_dir, 'rows.raw'), 'wb')
+
+    def add_frame(self, timestamp, track_ids, classes, boxes_xywh, states):
+        frame_idx = self.frames
+        self.frames += 1
+        self._times_file.write(np.float64(timestamp).tobytes())
+        n = len(track_ids)
+        if n == 0:
+            return
+        rows = np.empty(n, dtype=ROW_DTYPE)
+        rows['frame'] = frame_idx
+        rows['track_id'] = track_ids
+        rows['cls'] = classes[:n] if len(classes) >= n else -1
+        rows['state'] = states
+        boxes = np.asarray(boxes_xywh, dtype=np.float32)[:n]
+        rows['x'], rows['y'], rows['w'], rows['h'] = boxes.T
+        self._rows_file.write(rows.tobytes())
+        self.rows += n
+
+    def save(self, fps, frame_size):
+        """Publish the overlay (atomically replaces the job's previous one)."""
+        self._times_file.close()
+        self._rows_file.close()
+        _raw_to_npy(os.path.join(self._tmp_dir, 'frames.raw'), np.dtype('<f8'), self.frames)
+        _raw_to_npy(os.path.join(self._tmp_dir, 'rows.raw'), ROW_DTYPE, self.rows)
+        _publish(self.task_id, self._tmp_dir, fps, frame_size, self.rows)
+
+    def discard(self):
+        """Drop a partial overlay (processing failed or was cancelled); no-op after save()."""
+        for f in (self._times_file, self._rows_file):
+            if not f.closed:
+                f.close()
+        shutil.rmtree(self._tmp_dir, ignore_errors=True)
+
+
+def _raw_to_npy(raw_path, dtype, count):
+    """Turn a file of raw records into a .npy next to it, copying in blocks."""
+    npy_path = f'{os.path.splitext(raw_path)[0]}.npy'
+    with open(npy_path, 'wb') as out, open(raw_path, 'rb') as raw:
+        np.lib.format.write_array_header_1_0(out, {
+            'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (count,),
+        })
+        shutil.copyfileobj(raw, out, 1 << 20)
+    os.remove(raw_path)
+
+
+def _publish(task_id, tmp_dir, fps, frame_size, rows):
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({'fps': fps, 'frame_size': list(frame_size), 'rows': int(rows)}, f)
+    final_dir = overlay_dir(task_id)
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+
+
+def write(task_id, times, rows, fps, frame_size):
+    """Replace a job's overlay (written to a temp dir first so readers never see half a file set)."""
+    final_dir = overlay_dir(task_id)
+    tmp_dir = f'{final_dir}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, 'frames.npy'), times)
+    np.save(os.path.join(tmp_dir, 'rows.npy'), rows)
+    _publish(task_id, tmp_dir, fps, frame_size, len(rows))
+
+
+def load(task_id):
+    """
+    Returns:
+        (times, rows, meta); times and rows are read-only memmaps
+    """
+    path = overlay_dir(task_id)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    times = np.load(os.path.join(path, 'frames.npy'), mmap_mode='r')
+    rows = np.load(os.path.join(path, 'rows.npy'), mmap_mode='r')
+    return times, rows, meta
+
+
+def get_range(task_id, start=0.0, end=None):
+    """
+    Annotations for frames with start <= time < end, grouped per frame.
+
+    Returns:
+        {fps, frameSize, frames: [{t, boxes: [[x, y, w, h, trackId, classId, state], ...]}]}
+        Box coordinates are rounded to whole pixels (xywh, center based).
+    """
+    times, rows, meta = load(task_id)
+    first = int(np.searchsorted(times, start, side='left'))
+    last = int(np.searchsorted(times, end, side='left')) if end is not None else len(times)
+
+    # Rows are written in frame order, so a frame range is a contiguous row range
+    frame_col = rows['frame']
+    row_start = int(np.searchsorted(frame_col, first, side='left'))
+    row_end = int(np.searchsorted(frame_col, last, side='left'))
+    selected = np.asarray(rows[row_start:row_end])
+
+    boxes = np.column_stack([
+        np.rint(selected['x']), np.rint(selected['y']), np.rint(selected['w']), np.rint(selected['h']),
+        selected['track_id'], selected['cls'], selected['state'],
+    ]).astype(np.int64).tolist() if len(selected) else []
+    bounds = np.searchsorted(selected['frame'], np.arange(first, last + 1), side='left').tolist()
+
+    frames = []
+    for i, frame_idx in enumerate(range(first, last)):
+        frames.append({
+            't': round(float(times[frame_idx]), 3),
+            'boxes': boxes[bounds[i]:bounds[i + 1]],
+        })
+
+    return {
+        'fps': meta['fps'],
+        'frameSize': meta['frame_size'],
+        'frames': frames,
+    }
@@ -0,0 +1,194 @@
+"""
+Zone-aware ROI cropping and tiled inference.
+
+Instead of letting YOLO downscale the whole (possibly 4K) frame, inference only
+runs on the bounding region of all zones. Large regions are split into
+overlapping tiles at native resolution so small, distant objects survive.
+Detections are merged back into full-frame coordinates and fed to ByteTrack, so
+tracking, zone tests and rendering work exactly as with model.track().
+"""
+
+import math
+import numpy as np
+import torch
+import yaml
+from ultralytics.engine.results import Boxes, Results
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace
+
+# Default ROI settings (mirrors RoiConfig in app/models/schemas.py)
+DEFAULT_ROI_CONFIG = {
+    'enabled': True,
+    'padding': 32,
+    'tile': True,
+    'tile_size': 1280,
+    'overlap': 0.2,
+    'iou_threshold': 0.5
+}
+
+
+def compute_zone_roi(zones, frame_size, padding=32):
+    """
+    Compute the bounding region of all zones.
+
+    Args:
+        zones: List of zone objects [{id, points, ...}]
+        frame_size: Tuple of (width, height)
+        padding: Extra pixels around the zones so objects are seen before they enter
+
+    Returns:
+        (x0, y0, x1, y1) clamped to the frame, or None if there are no usable zones
+    """
+    width, height = frame_size
+    xs, ys = [], []
+    for zone in zones:
+        points = zone.get('points', [])
+        if len(points) < 2:
+            continue
+        xs.extend(p['x'] for p in points)
+        ys.extend(p['y'] for p in points)
+
+    if not xs:
+        return None
+
+    x0 = max(0, int(math.floor(min(xs))) - padding)
+    y0 = max(0, int(math.floor(min(ys))) - padding)
+    x1 = min(width, int(math.ceil(max(xs))) + padding)
+    y1 = min(height, int(math.ceil(max(ys))) + padding)
+
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return None
+    return (x0, y0, x1, y1)
+
+
+def _axis_starts(start, end, tile, overlap_px):
+    """Evenly spaced tile start positions covering [start, end)."""
+    length = end - start
+    if length <= tile:
+        return [start]
+    count = math.ceil((length - overlap_px) / (tile - overlap_px))
+    step = (length - tile) / (count - 1)
+    return [start + int(round(i * step)) for i in range(count)]
+
+
+def make_tiles(roi, tile_size=1280, overlap=0.2):
+    """
+    Split an ROI into overlapping square tiles.
+
+    A region only slightly larger than a tile is kept whole: a single crop that
+    YOLO downscales a little is cheaper than four tiles.
+
+    Returns:
+        List of (x0, y0, x1, y1) tiles in full-frame coordinates
+    """
+    x0, y0, x1, y1 = roi
+    if (x1 - x0) <= tile_size * 1.25 and (y1 - y0) <= tile_size * 1.25:
+        return [roi]
+
+    overlap_px = int(tile_size * min(max(overlap, 0.0), 0.9))
+    tile_w = min(tile_size, x1 - x0)
+    tile_h = min(tile_size, y1 - y0)
+
+    tiles = []
+    for ty in _axis_starts(y0, y1, tile_h, overlap_px):
+        for tx in _axis_starts(x0, x1, tile_w, overlap_px):
+            tiles.append((tx, ty, tx + tile_w, ty + tile_h))
+    return tiles
+
+
+def nms(xyxy, scores, classes, iou_threshold=0.5):
+    """
+    Class-aware non-maximum suppression used to merge overlapping tile detections.
+
+    Returns:
+        Indices of the boxes to keep, highest score first
+    """
+    if len(xyxy) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Offset boxes per class so different classes never suppress each other
+    offset = classes.astype(np.float32)[:, None] * (xyxy.max() + 1)
+    boxes = xyxy + offset
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(boxes[i, 0], boxes[order[1:], 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[order[1:], 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[order[1:], 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[order[1:], 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+class RoiTracker:
+    """
+    Drop-in replacement for model.track() that only looks at the zone region.
+
+    track() returns a list with a single ultralytics Results object whose boxes
+    are in full-frame coordinates, so callers can keep using
+    results[0].boxes.xywh / .id / .cls and results[0].plot().
+    """
+
+    def __init__(self, model, tracker_yaml_path, roi, config=None):
+        """
+        Args:
+            model: Loaded YOLO model
+            tracker_yaml_path: Path to the ByteTrack YAML config
+            roi: (x0, y0, x1, y1) region from compute_zone_roi
+            config: ROI configuration dict (see DEFAULT_ROI_CONFIG)
+        """
+        config = {**DEFAULT_ROI_CONFIG, **(config or {})}
+
+        self.model = model
+        self.roi = roi
+        self.iou_threshold = float(config['iou_threshold'])
+        if config['tile']:
+            self.tiles = make_tiles(roi, int(config['tile_size']), float(config['overlap']))
+        else:
+            self.tiles = [roi]
+
+        with open(tracker_yaml_path) as f:
+            tracker_args = IterableSimpleNamespace(**yaml.safe_load(f))
+        # Same construction as model.track(), so track_buffer means the same thing
+        self.tracker = BYTETracker(args=tracker_args)
+
+        roi_area = (roi[2] - roi[0]) * (roi[3] - roi[1])
+        print(f"ROI inference on {roi} ({len(self.tiles)} tile(s), {roi_area} px)")
+
+    def track(self, frame, classes, conf, device=None):
+        """Detect in every tile, merge into frame coordinates and update the tracker."""
+        crops = [frame[y0:y1, x0:x1] for (x0, y0, x1, y1) in self.tiles]
+        tile_results = self.model.predict(crops, classes=classes, conf=conf, device=device,
+                                          save=False, verbose=False)
+
+        detections = []
+        for (x0, y0, _, _), result in zip(self.tiles, tile_results):
+            data = result.boxes.data.cpu().numpy() if result.boxes is not None else None
+            if data is None or len(data) == 0:
+                continue
+            data = data.copy()
+            data[:, [0, 2]] += x0
+            data[:, [1, 3]] += y0
+            detections.append(data)
+
+        if detections:
+            detections = np.concatenate(detections, axis=0)
+            if len(self.tiles) > 1:
+                keep = nms(detections[:, :4], detections[:, 4], detections[:, 5], self.iou_threshold)
+                detections = detections[keep]
+        else:
+            detections = np.zeros((0, 6), dtype=np.float32)
+
+        tracks = self.tracker.update(Boxes(detections, frame.shape[:2]), frame)
+        if len(tracks) == 0:
+            tracks = np.zeros((0, 8), dtype=np.float32)
+
+        result = Results(frame, path='', names=self.model.names,
+                         boxes=torch.as_tensor(tracks[:, :-1], dtype=torch.float32))
+        return [result]
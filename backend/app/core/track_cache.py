@@ -0,0 +1,434 @@
+"""
+Per-frame track cache for re-zoning without re-running inference.
+
+Detections and ByteTrack IDs do not depend on zone geometry, so the offline
+pipeline records every tracked box it sees into a flat binary file of fixed-size
+records (see RECORD_DTYPE) plus a small JSON sidecar. When a job is reprocessed
+with the same video, model, confidence, tracker settings and target classes,
+counts, dwell times, line crossings and the heatmap are recomputed from the
+memory-mapped records with numpy instead of decoding the video again.
+
+On a cache hit, jobs without a rendered video (renderVideo off) only get their
+overlay data (app.core.overlay) rewritten with the new zones' dot states. Jobs
+that render have the annotated output video redrawn from the cached boxes
+(detector.render_cached_tracks()), which decodes the video but runs no inference.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from app.core import overlay
+
+CACHE_DIR = 'instance/track_cache'
+CACHE_VERSION = 1
+
+# One record per tracked box per processed frame (32 bytes)
+RECORD_DTYPE = np.dtype([
+    ('frame', '<u4'),      # Processed frame index (1-based, drives track eviction)
+    ('source', '<u4'),     # Frame number in the source video (1-based, drives timestamps)
+    ('track_id', '<i4'),
+    ('cls', '<i2'),
+    ('conf', '<f2'),
+    ('x', '<f4'),          # Box center / size in frame pixels (xywh)
+    ('y', '<f4'),
+    ('w', '<f4'),
+    ('h', '<f4'),
+])
+
+
+def zone_class_ids(zones):
+    """The class filter the pipeline passes to the model for these zones."""
+    class_ids = set()
+    for zone in zones:
+        if len(zone.get('points', [])) < 2:
+            continue
+        class_ids.update(zone.get('classIds', [19]))
+    return sorted(class_ids) if class_ids else [19]
+
+
+def cache_key(content_hash, model_name, conf, tracker_config, zones, roi_config=None, motion_gate_config=None,
+              time_ranges=None):
+    """
+    Key for everything the cached tracks depend on (None if the video hash is unknown).
+    Zone geometry is deliberately left out; zone target classes are included because
+    they select which classes the model detects. ROI and motion gate settings change
+    which boxes are produced, so they are part of the key as well, and so are the
+    time ranges that were analyzed.
+    """
+    if not content_hash:
+        return None
+    params = {
+        'version': CACHE_VERSION,
+        'video': content_hash,
+        'model': model_name,
+        'conf': conf,
+        'tracker': tracker_config or {},
+        'classes': zone_class_ids(zones),
+        'roi': roi_config if roi_config and roi_config.get('enabled', True) else None,
+        'motion_gate': motion_gate_config if motion_gate_config and motion_gate_config.get('enabled', True) else None,
+    }
+    if time_ranges:
+        # Only when set, so keys of whole-video runs are unchanged
+        params['ranges'] = [[r['start'], r['end']] for r in time_ranges]
+    blob = json.dumps(params, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(blob.encode()).hexdigest()[:32]
+
+
+def _paths(key):
+    return os.path.join(CACHE_DIR, f'{key}.bin'), os.path.join(CACHE_DIR, f'{key}.json')
+
+
+def exists(key):
+    if not key:
+        return False
+    data_path, meta_path = _paths(key)
+    return os.path.exists(data_path) and os.path.exists(meta_path)
+
+
+def clear():
+    """Remove all cached track files."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    for name in os.listdir(CACHE_DIR):
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except OSError:
+            pass
+
+
+class TrackCacheWriter:
+    """
+    Streams track records to disk while the pipeline runs.
+
+    Usage:
+        writer = TrackCacheWriter(key)
+        writer.add_frame(processed_idx, source_idx, track_ids, classes, confs, boxes_xywh)
+        writer.commit(fps=fps, frames=processed_frames, frame_size=(w, h), names=model.names)  # or writer.discard()
+    """
+
+    def __init__(self, key):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self.key = key
+        self.rows = 0
+        self._data_path, self._meta_path = _paths(key)
+        self._tmp_path = f'{self._data_path}.{os.getpid()}.tmp'
+        self._file = open(self._tmp_path, 'wb')
+
+    def add_frame(self, frame_idx, source_idx, track_ids, classes, confs, boxes_xywh):
+        n = len(track_ids)
+        if n == 0:
+            return
+        records = np.empty(n, dtype=RECORD_DTYPE)
+        records['frame'] = frame_idx
+        records['source'] = source_idx
+        records['track_id'] = track_ids
+        records['cls'] = classes[:n] if len(classes) >= n else -1
+        records['conf'] = confs[:n] if len(confs) >= n else 0
+        boxes = np.asarray(boxes_xywh, dtype=np.float32)[:n]
+        records['x'], records['y'], records['w'], records['h'] = boxes.T
+        self._file.write(records.tobytes())
+        self.rows += n
+
+    def commit(self, fps, frames, frame_size, names=None):
+        """
+        Publish the cache (atomically replaces any older file with the same key).
+        names: The model's class names ({class_id: name}), drawn when the video is re-rendered
+        """
+        self._file.close()
+        os.replace(self._tmp_path, self._data_path)
+        meta = {
+            'version': CACHE_VERSION,
+            'rows': self.rows,
+            'fps': fps,
+            'frames': frames,
+            'frame_size': list(frame_size),
+        }
+        if names:
+            meta['names'] = {str(class_id): name for class_id, name in names.items()}
+        tmp_meta = f'{self._meta_path}.tmp'
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, self._meta_path)
+
+    def discard(self):
+        """Drop a partial cache (processing failed or was cancelled)."""
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+
+def load(key):
+    """
+    Open a cache.
+
+    Returns:
+        (records, meta): records is a read-only memmap of RECORD_DTYPE
+    """
+    data_path, meta_path = _paths(key)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get('version') != CACHE_VERSION:
+        raise ValueError(f'Unsupported track cache version: {meta.get("version")}')
+    if meta['rows'] == 0:
+        return np.empty(0, dtype=RECORD_DTYPE), meta
+    records = np.memmap(data_path, dtype=RECORD_DTYPE, mode='r', shape=(meta['rows'],))
+    return records, meta
+
+
+def points_in_polygon(xs, ys, polygon):
+    """
+    Vectorized point-in-polygon test; points on the boundary count as inside
+    (same as cv2.pointPolygonTest(...) >= 0).
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    inside = np.zeros(xs.shape, dtype=bool)
+    on_edge = np.zeros(xs.shape, dtype=bool)
+    count = len(polygon)
+    for i in range(count):
+        x1, y1 = polygon[i]
+        x2, y2 = polygon[(i + 1) % count]
+        straddles = (y1 > ys) != (y2 > ys)
+        if y1 != y2:
+            x_cross = x1 + (ys - y1) * (x2 - x1) / (y2 - y1)
+            inside ^= straddles & (xs < x_cross)
+        cross = (x2 - x1) * (ys - y1) - (y2 - y1) * (xs - x1)
+        on_edge |= ((cross == 0) & (xs >= min(x1, x2)) & (xs <= max(x1, x2))
+                    & (ys >= min(y1, y2)) & (ys <= max(y1, y2)))
+    return inside | on_edge
+
+
+def _line_crossings(ax, ay, bx, by, line_start, line_end):
+    """Vectorized check_line_crossing(): 1 = IN, -1 = OUT, 0 = no crossing."""
+    (cx, cy), (dx, dy) = line_start, line_end
+
+    def ccw(px, py, qx, qy, rx, ry):
+        return (ry - py) * (qx - px) > (qy - py) * (rx - px)
+
+    crosses = ((ccw(ax, ay, cx, cy, dx, dy) != ccw(bx, by, cx, cy, dx, dy))
+               & (ccw(ax, ay, bx, by, cx, cy) != ccw(ax, ay, bx, by, dx, dy)))
+    side = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+    return np.where(crosses, np.where(side > 0, 1, -1), 0)
+
+
+def _segment_last(segment, values):
+    """Last value of each segment (segments are contiguous and numbered 0..n-1)."""
+    ends = np.flatnonzero(np.r_[segment[1:] != segment[:-1], True])
+    return values[ends]
+
+
+def _seen_before(marked, segment, seg_first_pos):
+    """
+    For every (sorted) row: whether a marked row precedes it in the same track segment.
+    """
+    flags = np.zeros(len(segment), dtype=np.int64)
+    flags[marked] = 1
+    before = np.cumsum(flags) - flags
+    return before - before[seg_first_pos][segment] > 0
+
+
+def recompute_analytics(records, meta, zones, ttl=30, heatmap_resolution=50, return_states=False):
+    """
+    Rebuild the offline pipeline's analytics for a new set of zones from cached tracks.
+
+    Mirrors the per-frame logic in detector._run_detection(), including track
+    eviction after `ttl` unseen processed frames (evicted tracks close their open
+    dwell intervals and are counted again if their ID reappears).
+
+    Returns:
+        (detection_events, dwell_events, line_crossing_counts, heatmap_data), plus a
+        per-row uint8 array of overlay dot states (see app.core.overlay) when
+        return_states is True
+    """
+    width, height = meta['frame_size']
+    fps = meta['fps']
+    last_frame = meta['frames']
+    ttl = max(1, int(ttl))
+
+    line_crossing_counts = {z['id']: {'in': 0, 'out': 0} for z in zones if len(z.get('points', [])) == 2}
+
+    # Heatmap over every tracked box (row order does not matter)
+    heatmap = np.zeros(heatmap_resolution * heatmap_resolution, dtype=np.float32)
+    if len(records):
+        cx = records['x'].astype(np.int64)
+        cy = records['y'].astype(np.int64)
+        gx = np.clip((cx / width * heatmap_resolution).astype(np.int64), 0, heatmap_resolution - 1)
+        gy = np.clip((cy / height * heatmap_resolution).astype(np.int64), 0, heatmap_resolution - 1)
+        heatmap += np.bincount(gy * heatmap_resolution + gx, minlength=heatmap.size).astype(np.float32)
+    heatmap_data = heatmap.reshape(heatmap_resolution, heatmap_resolution).tolist()
+
+    if not len(records):
+        if return_states:
+            return [], [], line_crossing_counts, heatmap_data, np.zeros(0, dtype=np.uint8)
+        return [], [], line_crossing_counts, heatmap_data
+
+    # Order rows by track, then time; `order` maps back to the original row (= pipeline) order
+    order = np.lexsort((np.arange(len(records)), records['frame'], records['track_id']))
+    track_ids = records['track_id'][order].astype(np.int64)
+    frames = records['frame'][order].astype(np.int64)
+    times = np.round(records['source'][order] / fps, 2)
+    classes = records['cls'][order].astype(np.int64)
+    xs = records['x'][order].astype(np.float64)
+    ys = records['y'][order].astype(np.float64)
+
+    # A track "segment" ends when the track is evicted (unseen for more than ttl frames)
+    new_track = np.r_[True, track_ids[1:] != track_ids[:-1]]
+    gap_evicted = np.r_[False, frames[1:] - frames[:-1] > ttl + 1]
+    segment_start = new_track | gap_evicted
+    segment = np.cumsum(segment_start) - 1
+    seg_last_frame = _segment_last(segment, frames)
+    seg_last_time = _segment_last(segment, times)
+    seg_first_row = order[np.flatnonzero(segment_start)]
+    seg_evicted = seg_last_frame + ttl < last_frame
+
+    count_events = []  # (row, zone_idx, kind, payload)
+    dwell_events = []  # (sort key, event)
+    # Dot state per (sorted) row: the highest over all zones
+    states = np.zeros(len(records), dtype=np.uint8)
+    seg_first_pos = np.flatnonzero(segment_start)
+
+    for zone_idx, zone in enumerate(zones):
+        points = zone.get('points', [])
+        if len(points) < 2:
+            continue
+        zone_id = zone['id']
+        class_ids = zone.get('classIds', [19])
+        matches = np.isin(classes, class_ids)
+        states[matches] = np.maximum(states[matches], overlay.STATE_DETECTED)
+
+        if len(points) == 2:
+            line_start = (int(points[0]['x']), int(points[0]['y']))
+            line_end = (int(points[1]['x']), int(points[1]['y']))
+            # Crossing from the previous point of the same track segment (any class)
+            has_prev = ~segment_start
+            prev_x = np.r_[0.0, xs[:-1]]
+            prev_y = np.r_[0.0, ys[:-1]]
+            direction = _line_crossings(prev_x, prev_y, xs, ys, line_start, line_end)
+            idx = np.flatnonzero(matches & has_prev & (direction != 0))
+            if not len(idx):
+                continue
+            states[idx] = overlay.STATE_ACTIVE
+            dirs = direction[idx]
+            segs = segment[idx]
+            first_in_seg = np.r_[True, segs[1:] != segs[:-1]]
+            # Only a change of direction counts again for the same track
+            accepted = first_in_seg | (dirs != np.r_[0, dirs[:-1]])
+            # Unique count: first accepted crossing per segment
+            acc_idx = idx[accepted]
+            acc_segs = segs[accepted]
+            acc_first = np.r_[True, acc_segs[1:] != acc_segs[:-1]]
+            # Green once the track has an accepted crossing earlier in its segment
+            counted = np.flatnonzero(_seen_before(acc_idx, segment, seg_first_pos) & matches & has_prev)
+            states[counted] = np.maximum(states[counted], overlay.STATE_COUNTED)
+            for i, d, first in zip(acc_idx, dirs[accepted], acc_first):
+                count_events.append((int(order[i]), zone_idx, 'line',
+                                     (zone_id, int(classes[i]), float(times[i]), int(d), bool(first))))
+            continue
+
+        polygon = [(int(p['x']), int(p['y'])) for p in points]
+        idx = np.flatnonzero(matches)
+        if not len(idx):
+            continue
+        # The pipeline tests integer box centers
+        inside = points_in_polygon(xs[idx].astype(np.int64), ys[idx].astype(np.int64), polygon)
+        segs = segment[idx]
+        seg_begin = np.r_[True, segs[1:] != segs[:-1]]
+        prev_inside = np.r_[False, inside[:-1]] & ~seg_begin
+        run_starts = np.flatnonzero(inside & ~prev_inside)
+        exits = np.flatnonzero(~inside & prev_inside)
+
+        # Blue while inside; green once the track has been inside earlier in its segment
+        counted = idx[_seen_before(idx[inside], segment, seg_first_pos)[idx]]
+        states[counted] = np.maximum(states[counted], overlay.STATE_COUNTED)
+        states[idx[inside]] = overlay.STATE_ACTIVE
+
+        # First entry per segment is a new unique count
+        start_segs = segs[run_starts]
+        first_entries = run_starts[np.r_[True, start_segs[1:] != start_segs[:-1]]] if len(run_starts) else run_starts
+        for j in first_entries:
+            i = idx[j]
+            count_events.append((int(order[i]), zone_idx, 'polygon',
+                                 (zone_id, int(classes[i]), float(times[i]))))
+
+        # Each exit closes the most recent run in the same segment
+        run_of_exit = np.searchsorted(run_starts, exits) - 1
+        closed = np.zeros(len(run_starts), dtype=bool)
+        closed[run_of_exit] = True
+        for j, r in zip(exits, run_of_exit):
+            entry_time = float(times[idx[run_starts[r]]])
+            exit_time = float(times[idx[j]])
+            duration = round(exit_time - entry_time, 2)
+            if duration > 0:
+                dwell_events.append(((int(frames[idx[j]]), 0, int(order[idx[j]]), zone_idx), {
+                    'zone_id': zone_id,
+                    'track_id': int(track_ids[idx[j]]),
+                    'entry_time': entry_time,
+                    'exit_time': exit_time,
+                    'duration': duration
+                }))
+
+        # Runs still open when their track is evicted are closed at its last sighting
+        for r in np.flatnonzero(~closed):
+            seg = segs[run_starts[r]]
+            if not seg_evicted[seg]:
+                continue
+            entry_time = float(times[idx[run_starts[r]]])
+            exit_time = float(seg_last_time[seg])
+            duration = round(exit_time - entry_time, 2)
+            if duration > 0:
+                dwell_events.append(((int(seg_last_frame[seg]) + ttl + 1, 1, int(seg_first_row[seg]), zone_idx), {
+                    'zone_id': zone_id,
+                    'track_id': int(track_ids[idx[run_starts[r]]]),
+                    'entry_time': entry_time,
+                    'exit_time': exit_time,
+                    'duration': duration
+                }))
+
+    # Replay count events in pipeline order to build the running totals
+    zone_counts = {z['id']: 0 for z in zones}
+    zone_class_counts = {z['id']: {} for z in zones}
+    first_class = {z['id']: z.get('classIds', [19])[0] for z in zones}
+    detection_events = []
+    count_events.sort(key=lambda e: (e[0], e[1]))
+    for _, _, kind, payload in count_events:
+        if kind == 'polygon':
+            zone_id, class_id, timestamp = payload
+            zone_counts[zone_id] += 1
+            zone_class_counts[zone_id][class_id] = zone_class_counts[zone_id].get(class_id, 0) + 1
+            detection_events.append({
+                "time": timestamp,
+                "zone_id": zone_id,
+                "class_id": first_class[zone_id],
+                "class_counts": dict(zone_class_counts[zone_id]),
+                "count": zone_counts[zone_id]
+            })
+        else:
+            zone_id, class_id, timestamp, direction, is_new = payload
+            if is_new:
+                zone_counts[zone_id] += 1
+                zone_class_counts[zone_id][class_id] = zone_class_counts[zone_id].get(class_id, 0) + 1
+            lc = line_crossing_counts[zone_id]
+            lc['in' if direction > 0 else 'out'] += 1
+            detection_events.append({
+                "time": timestamp,
+                "zone_id": zone_id,
+                "class_id": first_class[zone_id],
+                "class_counts": dict(zone_class_counts[zone_id]),
+                "count": lc['in'] + lc['out'],
+                "in_count": lc['in'],
+                "out_count": lc['out'],
+                "direction": "in" if direction > 0 else "out"
+            })
+
+    dwell_events.sort(key=lambda e: e[0])
+    dwell_events = [event for _, event in dwell_events]
+    if return_states:
+        row_states = np.empty(len(records), dtype=np.uint8)
+        row_states[order] = states
+        return detection_events, dwell_events, line_crossing_counts, heatmap_data, row_states
+    return detection_events, dwell_events, line_crossing_counts, heatmap_data
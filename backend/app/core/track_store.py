@@ -0,0 +1,101 @@
+"""
+Bounded track state for long-running streams.
+
+ByteTrack hands out new IDs forever, so per-track state keyed by ID must be
+pruned or memory grows without bound. Each track keeps a fixed-size ring buffer
+of recent center points, and tracks not seen for longer than the tracker's
+track_buffer are evicted.
+"""
+
+from array import array
+
+
+class Track:
+    """Fixed-capacity ring buffer of (x, y) center points for one track."""
+
+    __slots__ = ('_xs', '_ys', '_head', '_size', 'last_seen', 'last_time')
+
+    def __init__(self, max_points):
+        self._xs = array('d', bytes(8 * max_points))
+        self._ys = array('d', bytes(8 * max_points))
+        self._head = 0  # Next write position
+        self._size = 0
+        self.last_seen = 0  # Processed frame index of the last update
+        self.last_time = 0.0  # Video/stream timestamp (seconds) of the last update
+
+    def append(self, x, y):
+        """Add a point, overwriting the oldest one when the buffer is full."""
+        self._xs[self._head] = x
+        self._ys[self._head] = y
+        capacity = len(self._xs)
+        self._head = (self._head + 1) % capacity
+        if self._size < capacity:
+            self._size += 1
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        """Return point (x, y); supports negative indices like a list."""
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError('track index out of range')
+        pos = (self._head - self._size + index) % len(self._xs)
+        return (self._xs[pos], self._ys[pos])
+
+
+class TrackStore:
+    """
+    Track histories with TTL-based eviction.
+
+    Usage:
+        store = TrackStore(max_points=30, ttl=track_buffer)
+        track = store.update(track_id, x, y, frame_idx, timestamp)
+        for track_id, track in store.evict_stale(frame_idx):
+            ...  # finalize per-track state
+    """
+
+    def __init__(self, max_points=30, ttl=30):
+        """
+        Args:
+            max_points: Number of recent points kept per track
+            ttl: Processed frames a track may go unseen before it is evicted
+        """
+        self.max_points = max_points
+        self.ttl = max(1, int(ttl))
+        self._tracks = {}
+        self.evicted_count = 0
+
+    def update(self, track_id, x, y, frame_idx, timestamp=0.0):
+        """Append a point to a track (creating it if needed) and mark it as seen."""
+        track = self._tracks.get(track_id)
+        if track is None:
+            track = Track(self.max_points)
+            self._tracks[track_id] = track
+        track.append(x, y)
+        track.last_seen = frame_idx
+        track.last_time = timestamp
+        return track
+
+    def evict_stale(self, frame_idx):
+        """
+        Remove tracks not seen for more than ttl frames.
+
+        Returns:
+            List of (track_id, Track) that were evicted
+        """
+        cutoff = frame_idx - self.ttl
+        stale = [tid for tid, track in self._tracks.items() if track.last_seen < cutoff]
+        evicted = [(tid, self._tracks.pop(tid)) for tid in stale]
+        self.evicted_count += len(evicted)
+        return evicted
+
+    def get(self, track_id):
+        return self._tracks.get(track_id)
+
+    def __contains__(self, track_id):
+        return track_id in self._tracks
+
+    def __len__(self):
+        return len(self._tracks)
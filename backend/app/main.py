@@ -1,22 +1,44 @@
 """
 Locus FastAPI Backend - Main Application Entry Point
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse
 import os
 
-from app.api.routes import jobs, camera, system, ws
+from app.api.routes import jobs, camera, system, ws, uploads
+from app.services import batch, blocking, ingest, loop_monitor, metrics, workers
 from app.services.db import init_db
 
 # Initialize database
 init_db()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm the default model in the background (in the first detection
+    # worker process); requests are served meanwhile
+    workers.start_warmup()
+    # Run jobs that were processing when the previous process stopped
+    batch.recover()
+    # Register and queue new videos from LOCUS_WATCH_DIR, if set
+    ingest.start()
+    # Log anything that blocks the event loop
+    loop_monitor.start()
+    yield
+    await loop_monitor.stop()
+    ingest.stop()
+    workers.shutdown()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Locus API",
     description="AI Object Counter & Analytics API",
-    version="0.2.0"
+    version="0.2.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for Next.js frontend
@@ -33,25 +55,75 @@ app.add_middleware(
 
 # Ensure directories exist
 os.makedirs("uploads/videos", exist_ok=True)
+os.makedirs("uploads/incoming", exist_ok=True)
 os.makedirs("uploads/frames", exist_ok=True)
 os.makedirs("uploads/outputs", exist_ok=True)
 os.makedirs("weights", exist_ok=True)
 os.makedirs("instance", exist_ok=True)
 
+# Rendered outputs and HLS playlists are rewritten when a job is reprocessed,
+# so browsers revalidate media (StaticFiles answers with a 304 when unchanged)
+MEDIA_CACHE_CONTROL = "no-cache"
+
+
+class MediaFiles(StaticFiles):
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", MEDIA_CACHE_CONTROL)
+        return response
+
+
 # Mount static files for media serving
-app.mount("/media", StaticFiles(directory="uploads"), name="media")
+app.mount("/media", MediaFiles(directory="uploads"), name="media")
 
 # Include routers
 app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(uploads.router, prefix="/api/uploads", tags=["uploads"])
 app.include_router(camera.router, prefix="/api", tags=["camera"])
 app.include_router(system.router, prefix="/api", tags=["system"])
 app.include_router(ws.router, tags=["websocket"])
 
 
+@app.exception_handler(TimeoutError)
+async def timeout_handler(request, exc):
+    """Blocking work that didn't finish in time (see app/services/blocking.py)."""
+    return JSONResponse(status_code=503, content={"detail": str(exc) or "Timed out"})
+
+
+def _readiness():
+    warmup = workers.get_warmup_status()
+    # A failed warmup doesn't block traffic: the model is loaded again by the first job
+    return warmup["state"] in ("ready", "failed"), warmup
+
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy"}
+    """Liveness (always 200 while the process serves requests), plus readiness."""
+    ready, warmup = _readiness()
+    return {
+        "status": "healthy",
+        "live": True,
+        "ready": ready,
+        "model": warmup,
+        "loop": loop_monitor.get_stats(),  # Event loop lag and stalls
+        "pools": blocking.get_stats(),
+    }
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the default model has been loaded and warmed up."""
+    ready, warmup = _readiness()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "starting", "model": warmup}
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus-style metrics (stage timings, fps, queues, model cache)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
@@ -2,11 +2,16 @@ from .schemas import (
     Zone,
     ZonePoint,
     TrackerConfig,
+    MotionGateConfig,
+    RoiConfig,
+    TimeRange,
     ProcessRequest,
+    BatchProcessRequest,
     UpdateZonesRequest,
     RenameRequest,
     CameraRequest,
     TestConnectionRequest,
+    CreateUploadRequest,
     JobResponse,
 )
 
@@ -14,10 +19,15 @@ __all__ = [
     "Zone",
     "ZonePoint",
     "TrackerConfig",
+    "MotionGateConfig",
+    "RoiConfig",
+    "TimeRange",
     "ProcessRequest",
+    "BatchProcessRequest",
     "UpdateZonesRequest",
     "RenameRequest",
     "CameraRequest",
     "TestConnectionRequest",
+    "CreateUploadRequest",
     "JobResponse",
 ]
@@ -25,11 +25,43 @@ class TrackerConfig(BaseModel):
     track_buffer: int = 30
 
 
+class MotionGateConfig(BaseModel):
+    enabled: bool = True
+    threshold: int = 25  # Per-pixel intensity change (0-255) counted as motion
+    min_changed_ratio: float = 0.002  # Fraction of changed pixels that wakes the detector
+    refresh_interval: int = 30  # Force inference at least every N sampled frames
+    downscale_width: int = 160
+    zones_only: bool = False  # Only look for motion inside/near zones
+
+
+class RoiConfig(BaseModel):
+    enabled: bool = True
+    padding: int = 32  # Pixels added around the zones' bounding box
+    tile: bool = True  # Split large regions into overlapping tiles
+    tile_size: int = 1280  # Tiles are still downscaled to the model input size, but far less than a 4K frame
+    overlap: float = 0.2  # Tile overlap as a fraction of tile_size
+    iou_threshold: float = 0.5  # NMS threshold when merging tile detections
+
+
+class TimeRange(BaseModel):
+    start: float  # Seconds from the start of the video
+    end: float
+
+
 class ProcessRequest(BaseModel):
     zones: list[Zone]
     confidence: int = 35
     model: str = "yolo11n.pt"
     trackerConfig: Optional[TrackerConfig] = None
+    motionGate: Optional[MotionGateConfig] = None
+    roi: Optional[RoiConfig] = None
+    renderVideo: bool = True  # False: skip drawing/encoding, the frontend draws the overlay data
+    preview: bool = False  # Publish approximate results from a fast low-resolution pass first
+    timeRanges: Optional[list[TimeRange]] = None  # Only analyze these parts of the video (None: all of it)
+
+
+class BatchProcessRequest(ProcessRequest):
+    taskIds: list[str]  # Jobs to process with the same configuration
 
 
 class UpdateZonesRequest(BaseModel):
@@ -49,6 +81,11 @@ class TestConnectionRequest(BaseModel):
     stream_url: str
 
 
+class CreateUploadRequest(BaseModel):
+    filename: str
+    size: int  # Total file size in bytes
+
+
 class JobResponse(BaseModel):
     id: str
     name: Optional[str]
@@ -63,10 +100,15 @@ class JobResponse(BaseModel):
     confidence: int
     model: str
     trackerConfig: Optional[dict]
+    motionGate: Optional[dict]
+    roi: Optional[dict]
     detectionData: list
     dwellData: list
     lineCrossingData: dict
+    pipelineStats: Optional[dict]
     processTime: float
+    hlsPlaylist: Optional[str]
+    contentHash: Optional[str]
     sourceType: str
     streamUrl: Optional[str]
     createdAt: Optional[str]
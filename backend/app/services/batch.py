@@ -0,0 +1,200 @@
+"""
+Batch processing: one zone/model/tracker configuration applied to many jobs.
+
+Jobs submitted here (by POST /api/jobs/batch or the watch-folder ingester, see
+app/services/ingest.py) go to the shared queue when it is enabled (see
+app/services/job_queue.py). Otherwise a runner thread in this process works
+through them one at a time, so a batch of hundreds of clips doesn't start
+hundreds of pipelines at once. That local backlog only lives in memory:
+recover() requeues the jobs a restart interrupted.
+
+Throughput and backlog are derived from the jobs table (finished_at), so they
+include jobs finished by worker nodes; see get_stats() and /api/throughput.
+"""
+import queue
+import threading
+import time
+
+from app.services import job_queue
+from app.services.db import PIPELINE_COLUMNS, get_all_jobs, get_job_fields, get_job_stats, update_job
+from app.services.workers import run_job
+
+# Window over which throughput is reported (seconds)
+THROUGHPUT_WINDOW = 3600
+
+# Columns mark_processing() stores a job's settings in
+SETTINGS_COLUMNS = ('zones', 'confidence', 'model', 'tracker_config', 'motion_gate', 'roi_config',
+                    'render_video', 'time_ranges')
+
+_pending = queue.Queue()  # (task_id, args) waiting for the local runner
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def job_args(request):
+    """
+    Pipeline arguments for a ProcessRequest, in the order run_job() and
+    enqueue_job() take them after the task ID (and job).
+
+    Raises:
+        ValueError: If a time range is invalid
+    """
+    time_ranges = [r.model_dump() for r in request.timeRanges] if request.timeRanges else None
+    if time_ranges and any(r['start'] < 0 or r['end'] <= r['start'] for r in time_ranges):
+        raise ValueError('Time ranges must have 0 <= start < end')
+    return (
+        [zone.model_dump() for zone in request.zones],
+        request.confidence,
+        request.model,
+        request.trackerConfig.model_dump() if request.trackerConfig else None,
+        request.motionGate.model_dump() if request.motionGate else None,
+        request.roi.model_dump() if request.roi else None,
+        request.renderVideo,
+        request.preview,
+        time_ranges,
+    )
+
+
+def mark_processing(task_id, args):
+    """Store the settings a job is about to be processed with and mark it as processing."""
+    zones, confidence, model, tracker_config, motion_gate_config, roi_config, render_video, _, time_ranges = args
+    update_job(
+        task_id,
+        zones=zones,
+        confidence=confidence,
+        model=model,
+        tracker_config=tracker_config,
+        motion_gate=motion_gate_config,
+        roi_config=roi_config,
+        render_video=render_video,
+        time_ranges=time_ranges,
+        preview_data=None,
+        result_quality=None,
+        finished_at=None,
+        status='processing'
+    )
+
+
+def submit(task_id, args):
+    """Queue a job marked as processing: on the shared queue if enabled, else for the local runner."""
+    if job_queue.QUEUE_ENABLED:
+        job_queue.enqueue_job(task_id, *args)
+        return
+    _pending.put((task_id, args))
+    _ensure_runner()
+
+
+def submit_jobs(task_ids, request):
+    """
+    Process many jobs with one configuration.
+
+    Returns:
+        (submitted task IDs, [{taskId, error}, ...] for jobs that were skipped)
+
+    Raises:
+        ValueError: If the configuration is invalid
+    """
+    args = job_args(request)
+    submitted, skipped = [], []
+    for task_id in dict.fromkeys(task_ids):
+        job = get_job_fields(task_id, ('source_type', 'status', 'frame_width'))
+        if not job:
+            skipped.append({'taskId': task_id, 'error': 'Job not found'})
+        elif job.get('source_type') in ('rtsp', 'webcam'):
+            skipped.append({'taskId': task_id, 'error': 'Live sources are not batch processed'})
+        elif job.get('status') == 'processing':
+            skipped.append({'taskId': task_id, 'error': 'Already processing'})
+        elif not job.get('frame_width'):
+            skipped.append({'taskId': task_id, 'error': 'Video could not be read'})
+        else:
+            mark_processing(task_id, args)
+            submit(task_id, args)
+            submitted.append(task_id)
+    return submitted, skipped
+
+
+def recover():
+    """
+    Requeue file jobs left 'processing' by a previous run of the API process.
+
+    Without the shared queue, jobs waiting for or running in this process are
+    only held in memory; after a restart they would stay 'processing' forever
+    and submit_jobs() would refuse them. They are run again by the local runner
+    with the settings mark_processing() stored (without a preview pass). With the
+    queue enabled the broker holds them and requeues expired leases itself.
+
+    Returns:
+        Task IDs that were requeued
+    """
+    if job_queue.QUEUE_ENABLED:
+        return []
+    requeued = []
+    # Oldest first, as they were submitted
+    for job in reversed(get_all_jobs(status='processing', columns=('id', 'source_type'))):
+        if job['source_type'] in ('rtsp', 'webcam'):
+            continue
+        settings = get_job_fields(job['id'], SETTINGS_COLUMNS)
+        args = (
+            settings['zones'],
+            settings['confidence'],
+            settings['model'],
+            settings['tracker_config'],
+            settings['motion_gate'],
+            settings['roi_config'],
+            settings['render_video'] != 0,  # NULL in rows from before the column: rendered
+            False,
+            settings['time_ranges'],
+        )
+        submit(job['id'], args)
+        requeued.append(job['id'])
+    if requeued:
+        print(f"Requeued {len(requeued)} jobs interrupted by a restart")
+    return requeued
+
+
+def _ensure_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None or not _runner.is_alive():
+            _runner = threading.Thread(target=_run_pending, name='batch-runner', daemon=True)
+            _runner.start()
+
+
+def _run_pending():
+    """Runner thread: process submitted jobs one at a time."""
+    while True:
+        task_id, args = _pending.get()
+        try:
+            # Re-read the job: it may have been deleted while it waited
+            job = get_job_fields(task_id, PIPELINE_COLUMNS)
+            if job:
+                run_job(task_id, job.to_dict(), *args)
+        except Exception as e:
+            # The pipeline has already marked the job as failed
+            print(f"Batch job {task_id} failed: {e}")
+        finally:
+            _pending.task_done()
+
+
+def get_stats():
+    """Jobs per status, the submitted backlog and throughput over THROUGHPUT_WINDOW."""
+    now = time.time()
+    counts, finished = get_job_stats(now - THROUGHPUT_WINDOW)
+    if job_queue.QUEUE_ENABLED:
+        backlog = job_queue.get_broker().stats()['counts'].get('queued', 0)
+    else:
+        backlog = _pending.qsize()
+    completed = finished.get('completed', {'count': 0, 'processTime': 0.0})
+    # Seconds per finished job at the current rate, over all nodes and concurrent jobs
+    seconds_per_job = THROUGHPUT_WINDOW / completed['count'] if completed['count'] else None
+    return {
+        'jobs': counts,
+        'backlog': backlog,
+        'running': max(0, counts.get('processing', 0) - backlog),
+        'window': THROUGHPUT_WINDOW,
+        'completed': completed['count'],
+        'failed': finished.get('error', {}).get('count', 0),
+        'jobsPerHour': round(completed['count'] * 3600 / THROUGHPUT_WINDOW, 1),
+        'avgProcessTime': round(completed['processTime'] / completed['count'], 1) if completed['count'] else None,
+        'backlogEta': round(backlog * seconds_per_job) if seconds_per_job and backlog else None,
+    }
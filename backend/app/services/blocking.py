@@ -0,0 +1,107 @@
+"""
+Bounded thread pools for blocking work done on behalf of async routes.
+
+SQLite queries, file deletion and camera probes block; run on the event loop
+they stall every other request and WebSocket. Each kind of work gets its own
+small pool, so a burst of slow camera probes can't starve database reads, and
+every call has a timeout: the route gives up (TimeoutError, a 503) while the
+worker thread finishes in the background. Threads can't be interrupted, so
+slow calls should also bound themselves (e.g. OpenCV's open/read timeouts).
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import metrics
+
+
+class Pool:
+    """A named ThreadPoolExecutor with a per-call timeout and queue statistics."""
+
+    def __init__(self, name, workers, timeout):
+        self.name = name
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-io')
+        self._lock = threading.Lock()
+        self.pending = 0  # Submitted and not finished (running + queued)
+        self.timeouts = 0
+
+    def _done(self, future):
+        # Also called for calls cancelled while still queued (timed out or request cancelled)
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the pool and await its result.
+
+        Raises:
+            TimeoutError: If it doesn't finish within `timeout` (default: the pool's)
+        """
+        with self._lock:
+            self.pending += 1
+        future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(self._done)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f'{self.name} call {getattr(fn, "__name__", fn)} timed out after {timeout}s') from None
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'running': min(self.pending, self.workers),
+                'queued': max(0, self.pending - self.workers),
+                'timeouts': self.timeouts,
+            }
+
+
+# SQLite reads and writes (each a few milliseconds; a timeout means the database is locked)
+DB_WORKERS = 8
+DB_TIMEOUT = 10
+
+# Deleting uploads, outputs and HLS segments
+FILE_WORKERS = 4
+FILE_TIMEOUT = 120
+
+# Connecting to cameras (see app/services/camera_probe.py)
+PROBE_WORKERS = 4
+PROBE_TIMEOUT = 20
+
+db = Pool('db', DB_WORKERS, DB_TIMEOUT)
+files = Pool('files', FILE_WORKERS, FILE_TIMEOUT)
+probe = Pool('probe', PROBE_WORKERS, PROBE_TIMEOUT)
+
+POOLS = (db, files, probe)
+
+
+def run_db(fn, *args, **kwargs):
+    return db.run(fn, *args, **kwargs)
+
+
+def run_files(fn, *args, **kwargs):
+    return files.run(fn, *args, **kwargs)
+
+
+def run_probe(fn, *args, **kwargs):
+    return probe.run(fn, *args, **kwargs)
+
+
+def get_stats():
+    return {pool.name: pool.get_stats() for pool in POOLS}
+
+
+metrics.register_gauge(
+    'locus_blocking_pool_queued', 'Blocking calls waiting for a worker thread',
+    lambda: {(('pool', name),): stats['queued'] for name, stats in get_stats().items()}
+)
+metrics.register_gauge(
+    'locus_blocking_pool_timeouts', 'Blocking calls that timed out',
+    lambda: {(('pool', name),): stats['timeouts'] for name, stats in get_stats().items()}
+)
@@ -0,0 +1,91 @@
+"""
+Camera connection probes with a short-lived per-URL cache.
+
+Connecting to an RTSP camera takes seconds (longer when it is unreachable).
+The camera page tests a URL and then creates the stream with it, and several
+users may test the same camera at once, so probes of one source share a single
+connection attempt and the result (first frame, or the error) is reused for a
+few seconds. OpenCV's open/read timeouts bound each attempt.
+
+Everything here blocks; call it from a worker thread (see app/services/blocking.py).
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+
+# How long a probe result is reused (seconds); failures expire sooner so a fixed camera is picked up
+PROBE_CACHE_TTL = 10
+PROBE_FAILURE_TTL = 3
+
+# FFmpeg connection and read timeouts for network streams (milliseconds)
+OPEN_TIMEOUT_MS = 5000
+READ_TIMEOUT_MS = 5000
+
+# Frames tried before giving up (streams often start with undecodable frames)
+READ_ATTEMPTS = 30
+
+_lock = threading.Lock()
+_probes = {}  # (source_type, stream_url) -> (Future, expires or None while running)
+
+
+def _open(stream_url, source_type):
+    if source_type == 'webcam':
+        return cv2.VideoCapture(int(stream_url))
+    return cv2.VideoCapture(stream_url, cv2.CAP_FFMPEG, [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, OPEN_TIMEOUT_MS,
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, READ_TIMEOUT_MS,
+    ])
+
+
+def _read_first_frame(stream_url, source_type):
+    cap = _open(stream_url, source_type)
+    try:
+        for _ in range(READ_ATTEMPTS):
+            success, frame = cap.read()
+            if success:
+                return frame
+            if not cap.isOpened():
+                break
+    finally:
+        cap.release()
+    raise ValueError(f"Could not connect to stream: {stream_url}")
+
+
+def probe(stream_url, source_type='rtsp'):
+    """
+    First frame of a stream or webcam (BGR ndarray; don't modify it, it may be shared).
+
+    Raises:
+        ValueError: If the source can't be opened or read
+    """
+    key = (source_type, stream_url)
+    now = time.monotonic()
+    with _lock:
+        entry = _probes.get(key)
+        owner = entry is None or (entry[1] is not None and entry[1] <= now)
+        if owner:
+            future = Future()
+            _probes[key] = (future, None)
+        else:
+            future = entry[0]
+
+    if owner:
+        try:
+            future.set_result(_read_first_frame(stream_url, source_type))
+            ttl = PROBE_CACHE_TTL
+        except Exception as e:
+            future.set_exception(e)
+            ttl = PROBE_FAILURE_TTL
+        with _lock:
+            _probes[key] = (future, time.monotonic() + ttl)
+            # Drop other expired results
+            for other in [k for k, (_, expires) in _probes.items() if expires is not None and expires <= now]:
+                del _probes[other]
+    return future.result()
+
+
+def clear():
+    with _lock:
+        _probes.clear()
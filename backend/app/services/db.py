@@ -1,6 +1,10 @@
+import copy
 import sqlite3
 import os
 import json
+import time
+
+from app.services import blob_codec, metrics
 
 DB_PATH = 'instance/tasks.db'
 
@@ -46,7 +50,18 @@ def init_db():
         ('stream_url', 'TEXT'),
         ('dwell_data', 'TEXT'),
         ('line_crossing_data', 'TEXT'),
-        ('heatmap_data', 'TEXT')
+        ('heatmap_data', 'TEXT'),
+        ('motion_gate', 'TEXT'),
+        ('pipeline_stats', 'TEXT'),
+        ('roi_config', 'TEXT'),
+        ('content_hash', 'TEXT'),
+        ('render_video', 'INTEGER DEFAULT 1'),
+        ('preview_data', 'TEXT'),
+        ('result_quality', 'TEXT'),
+        ('time_ranges', 'TEXT'),
+        ('external_video', 'INTEGER DEFAULT 0'),
+        ('finished_at', 'REAL'),
+        ('revision', 'INTEGER DEFAULT 0')
     ]
 
     for col_name, col_def in columns_to_add:
@@ -55,10 +70,58 @@ def init_db():
         except sqlite3.OperationalError:
             # Column likely already exists
             pass
+    
+    # Shared processing queue leased by worker nodes (see app/services/job_queue.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS job_queue (
+            task_id TEXT PRIMARY KEY,
+            payload TEXT,
+            status TEXT DEFAULT 'queued',
+            worker_id TEXT,
+            attempts INTEGER DEFAULT 0,
+            enqueued_at REAL,
+            leased_at REAL,
+            lease_expires REAL,
+            heartbeat_at REAL,
+            finished_at REAL,
+            error TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_job_queue_status ON job_queue (status, enqueued_at)')
+    
+    # Files registered by the watch-folder ingester (see app/services/ingest.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ingested_files (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            task_id TEXT,
+            ingested_at REAL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (finished_at)')
             
     conn.commit()
+    _migrate_blob_columns(conn)
     conn.close()
 
+def _migrate_blob_columns(conn):
+    """Re-encode analytics blobs that older versions stored as JSON text (see app/services/blob_codec.py)."""
+    migrated = 0
+    for column in BLOB_COLUMNS:
+        ids = [row['id'] for row in conn.execute(f"SELECT id FROM jobs WHERE typeof({column}) = 'text'")]
+        for task_id in ids:
+            row = conn.execute(f'SELECT {column} FROM jobs WHERE id = ?', (task_id,)).fetchone()
+            try:
+                value = json.loads(row[column])
+            except (TypeError, ValueError):
+                continue  # Unreadable either way; reads fall back to the column default
+            conn.execute(f'UPDATE jobs SET {column} = ? WHERE id = ?', (blob_codec.encode(value), task_id))
+            conn.commit()
+            migrated += 1
+    if migrated:
+        print(f"Migrated {migrated} analytics columns to the binary format")
+
 def create_job(task_id, filename, video_path):
     conn = get_db()
     # Default name to filename, status to pending, confidence to 35
@@ -70,92 +133,157 @@ def create_job(task_id, filename, video_path):
     conn.commit()
     conn.close()
 
-def get_job(task_id):
+# JSON-encoded job columns, with the value used when a row has none (or it doesn't parse)
+JSON_COLUMN_DEFAULTS = {
+    'points': [],
+    'color': [5, 189, 251],
+    'zones': [],
+    'tracker_config': {  # ByteTrack settings
+        'track_high_thresh': 0.45,
+        'track_low_thresh': 0.1,
+        'match_thresh': 0.8,
+        'track_buffer': 30
+    },
+    'motion_gate': None,  # None = gate disabled
+    'roi_config': None,  # None = full-frame inference
+    'time_ranges': None,  # None = the whole video is analyzed
+    'pipeline_stats': {},  # e.g. motion gate skip ratio
+    # Analytics blobs (large for long videos)
+    'detection_data': [],
+    'dwell_data': [],
+    'line_crossing_data': {},
+    'heatmap_data': None,  # 2D array for activity visualization
+    'preview_data': None,  # Approximate results of the preview pass, None if none ran
+}
+
+# Analytics columns stored in the binary format of app/services/blob_codec.py
+# (rows written by older versions hold JSON text until init_db migrates them)
+BLOB_COLUMNS = ('detection_data', 'dwell_data', 'line_crossing_data', 'heatmap_data')
+
+# Defaults for plain columns that rows from older versions may have as NULL
+COLUMN_DEFAULTS = {
+    'target_class': 19,
+    'confidence': 35,
+    'model': 'yolo11n.pt',
+    'source_type': 'file',
+}
+
+# Columns run_processing_pipeline() reads from its job
+PIPELINE_COLUMNS = ('id', 'source_type', 'video_path', 'frame_width', 'frame_height', 'content_hash',
+                    'pipeline_stats')
+
+
+def _decode_column(column, value):
+    if column in JSON_COLUMN_DEFAULTS:
+        if value:
+            try:
+                if blob_codec.is_blob(value):
+                    return blob_codec.decode(value)
+                return json.loads(value)
+            except (ValueError, TypeError):
+                pass
+        return copy.deepcopy(JSON_COLUMN_DEFAULTS[column])
+    if value is None:
+        return COLUMN_DEFAULTS.get(column)
+    return value
+
+
+class JobRecord:
+    """
+    Read-only view of the selected columns of a job row.
+
+    Columns are decoded on first access, so a caller that only reads the status
+    never parses the analytics blobs that came with the row. Supports
+    job['column'], job.get('column', default), 'column' in job and to_dict().
+    """
+
+    __slots__ = ('_raw', '_decoded')
+
+    def __init__(self, row):
+        self._raw = dict(row)
+        self._decoded = {}
+
+    def __getitem__(self, column):
+        try:
+            return self._decoded[column]
+        except KeyError:
+            value = self._decoded[column] = _decode_column(column, self._raw[column])
+            return value
+
+    def get(self, column, default=None):
+        return self[column] if column in self._raw else default
+
+    def __contains__(self, column):
+        return column in self._raw
+
+    def keys(self):
+        return self._raw.keys()
+
+    def to_dict(self):
+        """All selected columns, decoded."""
+        return {column: self[column] for column in self._raw}
+
+
+def get_job_fields(task_id, columns=None):
+    """
+    Fetch only the given columns of a job (all of them when None).
+
+    Returns:
+        JobRecord, or None if the job doesn't exist
+    """
+    selected = _select_list(columns)
     conn = get_db()
-    job = conn.execute('SELECT * FROM jobs WHERE id = ?', (task_id,)).fetchone()
+    row = conn.execute(f'SELECT {selected} FROM jobs WHERE id = ?', (task_id,)).fetchone()
     conn.close()
-    if job:
-        # Convert Row to dict for easier manipulation if needed, handling JSON fields
-        job_dict = dict(job)
-        try:
-            job_dict['points'] = json.loads(job_dict['points'])
-        except (ValueError, TypeError):
-            job_dict['points'] = []
-             
-        try:
-             job_dict['color'] = json.loads(job_dict['color'])
-        except (ValueError, TypeError):
-             job_dict['color'] = [5, 189, 251]
-             
-        try:
-             job_dict['detection_data'] = json.loads(job_dict['detection_data']) if job_dict['detection_data'] else []
-        except (ValueError, TypeError):
-             job_dict['detection_data'] = []
+    return JobRecord(row) if row else None
 
-        try:
-            job_dict['zones'] = json.loads(job_dict['zones']) if job_dict.get('zones') else []
-        except (ValueError, TypeError):
-            job_dict['zones'] = []
-        
-        # Parse dwell_data JSON
-        try:
-            job_dict['dwell_data'] = json.loads(job_dict['dwell_data']) if job_dict.get('dwell_data') else []
-        except (ValueError, TypeError):
-            job_dict['dwell_data'] = []
-        
-        # Parse line_crossing_data JSON
-        try:
-            job_dict['line_crossing_data'] = json.loads(job_dict['line_crossing_data']) if job_dict.get('line_crossing_data') else {}
-        except (ValueError, TypeError):
-            job_dict['line_crossing_data'] = {}
-        
-        # Parse heatmap_data JSON (2D array for activity visualization)
-        try:
-            job_dict['heatmap_data'] = json.loads(job_dict['heatmap_data']) if job_dict.get('heatmap_data') else None
-        except (ValueError, TypeError):
-            job_dict['heatmap_data'] = None
-             
-        # Ensure target_class is present (for old records)
-        if 'target_class' not in job_dict or job_dict['target_class'] is None:
-            job_dict['target_class'] = 19
-            
-        if 'confidence' not in job_dict or job_dict['confidence'] is None:
-            job_dict['confidence'] = 35
-
-        if 'model' not in job_dict or job_dict['model'] is None:
-            job_dict['model'] = 'yolo11n.pt'
-
-        # Parse tracker_config JSON (ByteTrack settings)
-        default_tracker_config = {
-            'track_high_thresh': 0.45,
-            'track_low_thresh': 0.1,
-            'match_thresh': 0.8,
-            'track_buffer': 30
-        }
-        try:
-            job_dict['tracker_config'] = json.loads(job_dict['tracker_config']) if job_dict.get('tracker_config') else default_tracker_config
-        except (ValueError, TypeError):
-            job_dict['tracker_config'] = default_tracker_config
-
-        # Ensure source_type is present (for old records)
-        if 'source_type' not in job_dict or job_dict['source_type'] is None:
-            job_dict['source_type'] = 'file'
-             
-        return job_dict
-    return None
-
-def get_all_jobs(status=None):
+def get_job(task_id):
+    """Fetch a job with every column decoded."""
+    job = get_job_fields(task_id)
+    return job.to_dict() if job else None
+
+def job_exists(task_id):
+    return get_job_fields(task_id, ('id',)) is not None
+
+def get_job_progress(task_id):
+    """Fetch only progress/status (avoids loading and parsing the analytics blobs)."""
+    job = get_job_fields(task_id, ('progress', 'status'))
+    return job.to_dict() if job else None
+
+def get_job_video_path(task_id):
+    """Fetch only the source video path (None for unknown jobs and live sources)."""
+    job = get_job_fields(task_id, ('video_path',))
+    return job['video_path'] if job else None
+
+def _select_list(columns):
+    if columns is None:
+        return '*'
+    if not all(column.isidentifier() for column in columns):
+        raise ValueError(f"Invalid job columns: {columns}")
+    return ', '.join(columns)
+
+def get_all_jobs(status=None, columns=None):
+    """All jobs, newest first, with the given columns (all of them when None)."""
+    selected = _select_list(columns)
     conn = get_db()
     if status:
-        jobs = conn.execute('SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC', (status,)).fetchall()
+        jobs = conn.execute(f'SELECT {selected} FROM jobs WHERE status = ? ORDER BY created_at DESC',
+                            (status,)).fetchall()
     else:
-        jobs = conn.execute('SELECT * FROM jobs ORDER BY created_at DESC').fetchall()
+        jobs = conn.execute(f'SELECT {selected} FROM jobs ORDER BY created_at DESC').fetchall()
     conn.close()
-    return [dict(job) for job in jobs]
+    jobs = [dict(job) for job in jobs]
+    for job in jobs:
+        # The list has always returned analytics columns as JSON text
+        for column in BLOB_COLUMNS:
+            if blob_codec.is_blob(job.get(column)):
+                job[column] = json.dumps(_decode_column(column, job[column]))
+    return jobs
 
 def delete_job(task_id):
     conn = get_db()
     conn.execute('DELETE FROM jobs WHERE id = ?', (task_id,))
+    conn.execute('DELETE FROM job_queue WHERE task_id = ?', (task_id,))
     conn.commit()
     conn.close()
 
@@ -163,10 +291,45 @@ def clear_all_jobs():
     """Delete all jobs from the database."""
     conn = get_db()
     conn.execute('DELETE FROM jobs')
+    conn.execute('DELETE FROM job_queue')
+    conn.commit()
+    conn.close()
+
+def get_ingested_paths():
+    """Paths of all files the watch-folder ingester has registered."""
+    conn = get_db()
+    rows = conn.execute('SELECT path FROM ingested_files').fetchall()
+    conn.close()
+    return {row['path'] for row in rows}
+
+def record_ingested_file(path, size, mtime, task_id):
+    conn = get_db()
+    conn.execute(
+        'INSERT OR REPLACE INTO ingested_files (path, size, mtime, task_id, ingested_at) VALUES (?, ?, ?, ?, ?)',
+        (path, size, mtime, task_id, time.time())
+    )
     conn.commit()
     conn.close()
 
+def get_job_stats(since):
+    """
+    Job counts per status, and jobs finished since a timestamp with their total processing time.
+    """
+    conn = get_db()
+    counts = conn.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+    finished = conn.execute(
+        'SELECT status, COUNT(*) AS n, SUM(process_time) AS process_time FROM jobs '
+        'WHERE finished_at >= ? GROUP BY status',
+        (since,)
+    ).fetchall()
+    conn.close()
+    return (
+        {row['status']: row['n'] for row in counts},
+        {row['status']: {'count': row['n'], 'processTime': row['process_time'] or 0.0} for row in finished},
+    )
+
 def update_job(task_id, **kwargs):
+    start = time.perf_counter()
     conn = get_db()
     
     # Pre-process JSON fields
@@ -175,23 +338,35 @@ def update_job(task_id, **kwargs):
     if 'color' in kwargs:
         kwargs['color'] = json.dumps(kwargs['color'])
     if 'detection_data' in kwargs:
-        kwargs['detection_data'] = json.dumps(kwargs['detection_data'])
+        kwargs['detection_data'] = blob_codec.encode(kwargs['detection_data'])
     if 'zones' in kwargs:
         kwargs['zones'] = json.dumps(kwargs['zones'])
     if 'tracker_config' in kwargs:
         kwargs['tracker_config'] = json.dumps(kwargs['tracker_config'])
     if 'dwell_data' in kwargs:
-        kwargs['dwell_data'] = json.dumps(kwargs['dwell_data'])
+        kwargs['dwell_data'] = blob_codec.encode(kwargs['dwell_data'])
     if 'line_crossing_data' in kwargs:
-        kwargs['line_crossing_data'] = json.dumps(kwargs['line_crossing_data'])
+        kwargs['line_crossing_data'] = blob_codec.encode(kwargs['line_crossing_data'])
     if 'heatmap_data' in kwargs:
-        kwargs['heatmap_data'] = json.dumps(kwargs['heatmap_data'])
+        kwargs['heatmap_data'] = blob_codec.encode(kwargs['heatmap_data'])
+    if 'motion_gate' in kwargs:
+        kwargs['motion_gate'] = json.dumps(kwargs['motion_gate'])
+    if 'roi_config' in kwargs:
+        kwargs['roi_config'] = json.dumps(kwargs['roi_config'])
+    if 'pipeline_stats' in kwargs:
+        kwargs['pipeline_stats'] = json.dumps(kwargs['pipeline_stats'])
+    if 'preview_data' in kwargs:
+        kwargs['preview_data'] = json.dumps(kwargs['preview_data'])
+    if 'time_ranges' in kwargs:
+        kwargs['time_ranges'] = json.dumps(kwargs['time_ranges'])
 
     columns = ', '.join(f"{key} = ?" for key in kwargs.keys())
     values = list(kwargs.values())
     values.append(task_id)
     
-    conn.execute(f'UPDATE jobs SET {columns} WHERE id = ?', values)
+    # Every write bumps the revision that job responses' ETags are derived from
+    conn.execute(f'UPDATE jobs SET {columns}, revision = revision + 1 WHERE id = ?', values)
     conn.commit()
     conn.close()
+    metrics.observe_db_write(time.perf_counter() - start)
 
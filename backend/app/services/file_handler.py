@@ -3,28 +3,58 @@ File Handler Utilities for Video/Image Processing
 """
 import os
 import uuid
+import hashlib
 import shutil
 import cv2
 from werkzeug.utils import secure_filename
 from app.core.vision_utils import extract_frame
+from app.services import camera_probe, frame_server
 from app.services.db import create_job, update_job
+from app.services.uploads import complete_upload
+
+COPY_BUFFER_SIZE = 1024 * 1024
 
 
 def handle_upload_file(file, upload_folder):
     """
     Handles video file upload from FastAPI UploadFile object.
+    Blocking (file copy + frame extraction); call from a worker thread.
     """
     taskID = str(uuid.uuid4())
     original_filename = secure_filename(file.filename) if file.filename else "video.mp4"
     filename = taskID + "_" + original_filename
     filepath = os.path.join(upload_folder, filename)
     
-    # Save the uploaded file
+    # Save the uploaded file, hashing it on the way through
+    hasher = hashlib.sha256()
     with open(filepath, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        for block in iter(lambda: file.file.read(COPY_BUFFER_SIZE), b""):
+            hasher.update(block)
+            buffer.write(block)
     
+    register_video(taskID, original_filename, filepath, hasher.hexdigest())
+    return taskID
+
+
+def handle_chunked_upload(upload_id, upload_folder):
+    """
+    Turns a completed resumable upload into a job.
+    Blocking (file move + frame extraction); call from a worker thread.
+    """
+    taskID = str(uuid.uuid4())
+    filepath, original_filename, content_hash = complete_upload(upload_id, upload_folder, taskID)
+    register_video(taskID, original_filename, filepath, content_hash)
+    return taskID
+
+
+def register_video(taskID, original_filename, filepath, content_hash=None):
+    """
+    Creates the job for an uploaded video and extracts its first frame for zone setup.
+    """
     # Init Job in DB
     create_job(taskID, original_filename, filepath)
+    if content_hash:
+        update_job(taskID, content_hash=content_hash)
     
     # Ensure frame directory exists
     frame_dir = "uploads/frames"
@@ -38,7 +68,12 @@ def handle_upload_file(file, upload_folder):
          frame_size = first_frame.shape[1], first_frame.shape[0]  # width, height
          update_job(taskID, frame_path=frame_path, frame_width=frame_size[0], frame_height=frame_size[1])
     
-    return taskID
+    # Timestamp/keyframe index for random-access frame requests
+    try:
+        frame_server.index_video(taskID, filepath)
+    except Exception as e:
+        # Built lazily on the first frame request instead
+        print(f"Failed to index video {filepath}: {e}")
 
 
 def handle_rtsp_source(stream_url, source_type='rtsp'):
@@ -57,22 +92,8 @@ def handle_rtsp_source(stream_url, source_type='rtsp'):
     """
     taskID = str(uuid.uuid4())
     
-    # Connect to stream - webcam uses integer index
-    if source_type == 'webcam':
-        cap = cv2.VideoCapture(int(stream_url))
-    else:
-        cap = cv2.VideoCapture(stream_url)
-    
-    # Try to grab a frame (with timeout-like attempt)
-    success = False
-    for _ in range(30):  # Try for ~1 second
-        success, frame = cap.read()
-        if success:
-            break
-    
-    if not success:
-        cap.release()
-        raise ValueError(f"Could not connect to stream: {stream_url}")
+    # Connect to the stream and grab a frame (reused if the URL was just tested)
+    frame = camera_probe.probe(stream_url, source_type)
     
     # Get frame dimensions
     height, width = frame.shape[:2]
@@ -85,8 +106,6 @@ def handle_rtsp_source(stream_url, source_type='rtsp'):
     frame_path = os.path.join(frame_dir, f"frame_{taskID}.jpg")
     cv2.imwrite(frame_path, frame)
     
-    cap.release()
-    
     # Create job with stream info (no video_path for live sources)
     create_job(taskID, "Live Stream", None)
     update_job(taskID, 
@@ -110,6 +129,14 @@ def safe_remove_file(file_path):
             pass
 
 
+def safe_remove_dir(dir_path):
+    """
+    Safely removes a directory tree if it exists, ignoring errors.
+    """
+    if dir_path and os.path.isdir(dir_path):
+        shutil.rmtree(dir_path, ignore_errors=True)
+
+
 def clear_all_uploads():
     """
     Removes all files in the frames folder (keeps videos).
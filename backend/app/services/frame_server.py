@@ -0,0 +1,274 @@
+"""
+Random-access frame server for uploaded videos.
+
+Seeking with CAP_PROP_POS_FRAMES on a fresh cv2.VideoCapture for every request
+is slow on long H.264 files, and t * fps is wrong for variable frame rate video.
+Instead, at upload time the container is demuxed once without decoding
+(CAP_PROP_FORMAT = -1) to record every frame's timestamp and which frames are
+keyframes. A request for time t then maps to an exact frame index, and the
+frame is decoded from the nearest keyframe at or before it, or read forward
+from an already-open capture when that is closer (sequential scrubbing).
+Decoded frames are kept in a byte-bounded LRU.
+
+Everything here blocks; call it from a worker thread.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from app.services import metrics
+
+INDEX_DIR = 'instance/frame_index'
+
+# Decoded frames kept in memory (a 1080p BGR frame is ~6 MB)
+FRAME_CACHE_BYTES = 256 * 1024 * 1024
+
+# Open VideoCaptures kept for sequential reads
+MAX_OPEN_READERS = 4
+
+JPEG_QUALITY = 85
+
+
+class FrameIndex:
+    """Per-frame presentation timestamps (seconds) and keyframe positions."""
+
+    def __init__(self, timestamps, keyframes):
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        keyframes = np.asarray(keyframes, dtype=np.int64)
+        # Decoding can always start at frame 0
+        self.keyframes = keyframes if len(keyframes) and keyframes[0] == 0 else np.r_[0, keyframes].astype(np.int64)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def frame_at(self, t):
+        """Index of the frame on screen at time t (clamped to the video)."""
+        idx = int(np.searchsorted(self.timestamps, t, side='right')) - 1
+        return min(max(idx, 0), len(self.timestamps) - 1)
+
+    def keyframe_before(self, idx):
+        return int(self.keyframes[np.searchsorted(self.keyframes, idx, side='right') - 1])
+
+
+def build_index(video_path):
+    """
+    Demux a video (no decoding) and record frame timestamps and keyframes
+    (both in display order).
+    """
+    timestamps = []
+    keyframes = []
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    try:
+        if cap.isOpened():
+            idx = 0
+            while cap.grab():
+                timestamps.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+                if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframes.append(idx)
+                idx += 1
+    finally:
+        cap.release()
+
+    if timestamps:
+        # Packets come in decode order; with B-frames that differs from display order
+        timestamps = np.asarray(timestamps)
+        display = np.sort(timestamps)
+        keyframes = np.searchsorted(display, timestamps[keyframes]) if keyframes else [0]
+        return FrameIndex(display, np.unique(keyframes))
+
+    # Backend could not demux: assume a constant frame rate
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return FrameIndex(np.arange(max(count, 1)) / fps, [0])
+
+
+def _index_path(task_id):
+    return os.path.join(INDEX_DIR, f'{task_id}.npz')
+
+
+def save_index(task_id, index):
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    tmp = _index_path(task_id) + '.tmp.npz'
+    np.savez(tmp, timestamps=index.timestamps, keyframes=index.keyframes)
+    os.replace(tmp, _index_path(task_id))
+
+
+def index_video(task_id, video_path):
+    """Build and persist the frame index for a job (run at upload time)."""
+    index = build_index(video_path)
+    save_index(task_id, index)
+    return index
+
+
+def delete_index(task_id):
+    with _lock:
+        reader = _readers.pop(task_id, None)
+        for key in [k for k in _frames if k[0] == task_id]:
+            _drop_frame(key)
+    if reader is not None:
+        reader.close()
+    try:
+        os.remove(_index_path(task_id))
+    except OSError:
+        pass
+
+
+class _VideoReader:
+    """An open capture plus the index of the frame its next read() returns."""
+
+    def __init__(self, video_path, index):
+        self.video_path = video_path
+        self.index = index
+        self.lock = threading.Lock()
+        self.cap = cv2.VideoCapture(video_path)
+        self.next_frame = 0
+        self.seeks = 0
+
+    def read(self, idx):
+        with self.lock:
+            keyframe = self.index.keyframe_before(idx)
+            # Reading forward is cheaper than seeking unless a keyframe lies in between
+            if not (keyframe <= self.next_frame <= idx):
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+                self.next_frame = keyframe
+                self.seeks += 1
+            while self.next_frame < idx:
+                if not self.cap.grab():
+                    return None
+                self.next_frame += 1
+            success, frame = self.cap.read()
+            if not success:
+                return None
+            self.next_frame += 1
+            return frame
+
+    def close(self):
+        with self.lock:
+            self.cap.release()
+
+
+_lock = threading.Lock()
+_readers = OrderedDict()  # task_id -> _VideoReader (LRU)
+_frames = OrderedDict()  # (task_id, frame_idx) -> ndarray (LRU)
+_frame_bytes = 0
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _drop_frame(key):
+    global _frame_bytes
+    frame = _frames.pop(key)
+    _frame_bytes -= frame.nbytes
+
+
+def _get_reader(task_id, video_path):
+    with _lock:
+        reader = _readers.get(task_id)
+        if reader is not None:
+            _readers.move_to_end(task_id)
+            return reader
+
+    index = None
+    if os.path.exists(_index_path(task_id)):
+        try:
+            data = np.load(_index_path(task_id))
+            index = FrameIndex(data['timestamps'], data['keyframes'])
+        except (OSError, ValueError, KeyError):
+            index = None
+    if index is None:
+        # Jobs uploaded before the index existed
+        index = index_video(task_id, video_path)
+
+    reader = _VideoReader(video_path, index)
+    evicted = []
+    with _lock:
+        existing = _readers.get(task_id)
+        if existing is not None:
+            evicted.append(reader)
+            reader = existing
+        else:
+            _readers[task_id] = reader
+            while len(_readers) > MAX_OPEN_READERS:
+                evicted.append(_readers.popitem(last=False)[1])
+    for old in evicted:
+        old.close()
+    return reader
+
+
+def get_frame(task_id, video_path, t):
+    """
+    Decoded frame shown at time t (seconds).
+
+    Returns:
+        (frame, frame_idx, frame_time) or (None, None, None) if the video can't be read
+    """
+    global _frame_bytes
+    reader = _get_reader(task_id, video_path)
+    idx = reader.index.frame_at(t)
+    key = (task_id, idx)
+
+    with _lock:
+        frame = _frames.get(key)
+        if frame is not None:
+            _frames.move_to_end(key)
+            _stats['hits'] += 1
+    if frame is None:
+        _stats['misses'] += 1
+        frame = reader.read(idx)
+        if frame is None:
+            return None, None, None
+        with _lock:
+            if key not in _frames:
+                _frames[key] = frame
+                _frame_bytes += frame.nbytes
+            while _frame_bytes > FRAME_CACHE_BYTES and len(_frames) > 1:
+                _drop_frame(next(iter(_frames)))
+
+    return frame, idx, float(reader.index.timestamps[idx])
+
+
+def get_frame_jpeg(task_id, video_path, t, width=None, quality=JPEG_QUALITY):
+    """
+    JPEG-encoded frame at time t, optionally downscaled to `width` pixels.
+
+    Returns:
+        (jpeg_bytes, frame_idx, frame_time) or (None, None, None)
+    """
+    frame, idx, frame_time = get_frame(task_id, video_path, t)
+    if frame is None:
+        return None, None, None
+    if width and 0 < width < frame.shape[1]:
+        height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not success:
+        return None, None, None
+    return buffer.tobytes(), idx, frame_time
+
+
+def frame_time_for(task_id, video_path, t):
+    """Frame index and timestamp for time t without decoding (for conditional requests)."""
+    reader = _get_reader(task_id, video_path)
+    idx = reader.index.frame_at(t)
+    return idx, float(reader.index.timestamps[idx])
+
+
+def get_cache_stats():
+    with _lock:
+        return {
+            'frames': len(_frames),
+            'bytes': _frame_bytes,
+            'readers': len(_readers),
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+        }
+
+
+metrics.register_gauge(
+    'locus_frame_cache_bytes', 'Decoded frames held by the frame server',
+    lambda: get_cache_stats()['bytes']
+)
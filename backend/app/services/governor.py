@@ -0,0 +1,191 @@
+"""
+CPU thread governor for concurrent pipelines.
+
+By default every job and live stream uses torch's and OpenCV's full-size thread
+pools, so a few concurrent pipelines oversubscribe the machine with hundreds of
+threads. The governor splits a CPU budget between the running pipelines: each
+gets a thread count (and, optionally, a set of CPUs it is pinned to), applied
+in the pipeline's own thread. Budgets are rebalanced as pipelines start and
+stop; a running pipeline picks up its new budget on its next refresh.
+
+Achieved fps is recorded per allocation (since its budget last changed) so the
+split can be tuned; see get_stats() and the /api/governor endpoint.
+
+Notes:
+- torch.set_num_threads() configures the calling thread's OpenMP team size,
+  which is what a pipeline's inference runs on.
+- cv2.setNumThreads() is process-wide; it is set to the largest current budget.
+- CPU pinning (Linux only) applies to the calling thread and threads it creates
+  afterwards. It is off unless PIN_CPUS is enabled (LOCUS_PIN_CPUS=1).
+- With detection worker processes (see app.services.workers) the API process
+  owns the split: it registers each worker with apply=False and sends the
+  worker its share, which the worker applies through set_budget().
+"""
+import os
+import threading
+import time
+
+from app.services import metrics
+
+# CPUs left for the API, uploads, DB and encoding subprocesses
+RESERVED_CPUS = 1
+
+# Pin each pipeline thread to its own CPUs (Linux only)
+PIN_CPUS = os.environ.get('LOCUS_PIN_CPUS', '0') == '1'
+
+# How often a running pipeline re-checks its budget (frames)
+REFRESH_FRAMES = 30
+
+
+def _available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class Allocation:
+    """A pipeline's share of the CPU budget. Only touched from that pipeline's thread, except by rebalance."""
+
+    def __init__(self, kind, task_id):
+        self.kind = kind
+        self.task_id = task_id
+        self.threads = 1
+        self.cpus = []
+        self.version = 0  # Bumped by the governor when the budget changes
+        self._applied = -1
+        self._frames = 0
+        self._since = time.monotonic()
+        self.avg_fps = 0.0
+
+    def apply(self):
+        """Configure thread pools (and affinity) for the calling thread if the budget changed."""
+        if self._applied == self.version:
+            return
+        import torch
+
+        torch.set_num_threads(self.threads)
+        _set_cv2_threads()
+        if PIN_CPUS and self.cpus and hasattr(os, 'sched_setaffinity'):
+            try:
+                os.sched_setaffinity(0, self.cpus)
+            except OSError as e:
+                print(f"Failed to pin {self.kind} pipeline {self.task_id} to CPUs {self.cpus}: {e}")
+        self._applied = self.version
+        self._frames = 0
+        self._since = time.monotonic()
+
+    def frame(self):
+        """Count a processed frame; re-applies the budget every REFRESH_FRAMES frames."""
+        self._frames += 1
+        elapsed = time.monotonic() - self._since
+        if elapsed > 0:
+            self.avg_fps = self._frames / elapsed
+        if self._frames % REFRESH_FRAMES == 0:
+            self.apply()
+
+
+_lock = threading.Lock()
+_allocations = {}  # (kind, task_id) -> Allocation
+_budget_override = None  # Threads granted to this process by its parent (worker processes)
+
+
+def _budget(cpus):
+    if _budget_override is not None:
+        return _budget_override
+    return max(1, len(cpus) - RESERVED_CPUS)
+
+
+def _rebalance():
+    """Split the budget evenly between the current allocations (caller holds _lock)."""
+    cpus = _available_cpus()
+    budget = _budget(cpus)
+    active = list(_allocations.values())
+    if not active:
+        return
+    share, extra = divmod(budget, len(active))
+    offset = 0
+    for i, allocation in enumerate(active):
+        threads = max(1, share + (1 if i < extra else 0))
+        if PIN_CPUS:
+            assigned = [cpus[(offset + j) % len(cpus)] for j in range(threads)]
+        else:
+            assigned = []
+        offset += threads
+        if threads != allocation.threads or assigned != allocation.cpus:
+            allocation.threads = threads
+            allocation.cpus = assigned
+            allocation.version += 1
+
+
+def _set_cv2_threads():
+    import cv2
+
+    with _lock:
+        threads = max((a.threads for a in _allocations.values()), default=0)
+    if threads:
+        cv2.setNumThreads(threads)
+
+
+def acquire(kind, task_id, apply=True):
+    """
+    Register a pipeline ('offline' or 'live') and apply its budget in the calling thread.
+    With apply=False the budget is only tracked (a pipeline running in a worker process).
+
+    Returns:
+        Allocation; call allocation.frame() per processed frame and release() when done
+    """
+    allocation = Allocation(kind, task_id)
+    with _lock:
+        _allocations[(kind, task_id)] = allocation
+        _rebalance()
+    if apply:
+        allocation.apply()
+    return allocation
+
+
+def release(allocation):
+    with _lock:
+        if _allocations.get((allocation.kind, allocation.task_id)) is allocation:
+            del _allocations[(allocation.kind, allocation.task_id)]
+        _rebalance()
+
+
+def set_budget(threads):
+    """Cap this process's budget (a worker process, given its share by the API process)."""
+    global _budget_override
+    with _lock:
+        _budget_override = max(1, int(threads))
+        _rebalance()
+
+
+def get_stats():
+    """Current allocations with their budgets and achieved fps."""
+    cpus = _available_cpus()
+    with _lock:
+        allocations = list(_allocations.values())
+    return {
+        'cpus': len(cpus),
+        'budget': _budget(cpus),
+        'pinning': PIN_CPUS,
+        'allocations': [
+            {
+                'kind': a.kind,
+                'taskId': a.task_id,
+                'threads': a.threads,
+                'cpus': a.cpus,
+                'fps': metrics.get_pipeline_fps(a.kind, a.task_id),
+                'avgFps': round(a.avg_fps, 2),  # Since the budget last changed
+            }
+            for a in allocations
+        ],
+    }
+
+
+metrics.register_gauge(
+    'locus_governor_threads', 'Threads allocated to each running pipeline',
+    lambda: {(('pipeline', a['kind']), ('task_id', a['taskId'])): a['threads'] for a in get_stats()['allocations']}
+)
+metrics.register_gauge(
+    'locus_governor_fps', 'Average fps of each pipeline since its thread budget last changed',
+    lambda: {(('pipeline', a['kind']), ('task_id', a['taskId'])): a['avgFps'] for a in get_stats()['allocations']}
+)
@@ -3,9 +3,9 @@ GPU Acceleration Utility Module
 
 Provides functions to detect and select the best available compute device
 (CUDA, MPS, or CPU) for PyTorch/Ultralytics inference.
-"""
 
-import torch
+torch is imported on first use so that importing the API doesn't pay for it.
+"""
 
 
 def get_device() -> str:
@@ -20,6 +20,8 @@ def get_device() -> str:
     Returns:
         str: Device string ('cuda', 'mps', or 'cpu')
     """
+    import torch
+
     if torch.cuda.is_available():
         return 'cuda'
     elif torch.backends.mps.is_available() and torch.backends.mps.is_built():
@@ -39,6 +41,8 @@ def get_gpu_info() -> dict:
             - available: Whether GPU acceleration is available
             - memory: GPU memory info (CUDA only)
     """
+    import torch
+
     device = get_device()
     
     info = {
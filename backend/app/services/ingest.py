@@ -0,0 +1,155 @@
+"""
+Watch-folder ingest.
+
+Set LOCUS_WATCH_DIR to a folder (e.g. where an NVR exports its clips) and
+LOCUS_WATCH_CONFIG to a JSON file with the processing configuration (the body
+of POST /api/jobs/{id}/process). New video files are registered as jobs in
+place - they are not copied into uploads/videos, and deleting such a job leaves
+the file alone - and submitted like a batch (see app.services.batch).
+
+A file is picked up once its size and modification time are unchanged between
+two scans, so clips that are still being written are left until they are
+complete. Run the ingester on one API node only.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+from app.models import ProcessRequest
+from app.services import batch
+from app.services.db import get_ingested_paths, get_job_fields, record_ingested_file, update_job
+from app.services.file_handler import register_video
+from app.services.uploads import hash_file
+
+# Folder to watch (unset disables the ingester) and the processing configuration to apply
+WATCH_DIR = os.environ.get('LOCUS_WATCH_DIR')
+WATCH_CONFIG = os.environ.get('LOCUS_WATCH_CONFIG')
+
+# How often the folder is scanned (seconds)
+SCAN_INTERVAL = 10
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.ts')
+
+
+class WatchFolder:
+    """Scans a folder for new, completely written videos and submits them for processing."""
+
+    def __init__(self, folder, request, interval=SCAN_INTERVAL):
+        self.folder = os.path.abspath(folder)
+        self.request = request
+        self.interval = interval
+        self._ingested = get_ingested_paths()
+        self._candidates = {}  # path -> (size, mtime) at the previous scan
+        self._stop = threading.Event()
+        self._thread = None
+        self.files_ingested = 0
+        self.errors = 0
+        self.last_scan = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='watch-folder', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except OSError as e:
+                print(f"Failed to scan watch folder {self.folder}: {e}")
+            self._stop.wait(self.interval)
+
+    def scan(self):
+        """Ingest files that haven't changed since the previous scan."""
+        seen = {}
+        for root, _, files in os.walk(self.folder):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if not name.lower().endswith(VIDEO_EXTENSIONS) or path in self._ingested:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # Removed or renamed mid-scan
+                seen[path] = (st.st_size, st.st_mtime)
+                if st.st_size > 0 and self._candidates.get(path) == seen[path]:
+                    self.ingest(path, st.st_size, st.st_mtime)
+                    if self._stop.is_set():
+                        return
+        self._candidates = {path: key for path, key in seen.items() if path not in self._ingested}
+        self.last_scan = time.time()
+
+    def ingest(self, path, size, mtime):
+        """Register a video in place and submit it with the folder's configuration."""
+        task_id = str(uuid.uuid4())
+        try:
+            register_video(task_id, os.path.basename(path), path, hash_file(path))
+            update_job(task_id, external_video=1)
+            if not get_job_fields(task_id, ('frame_width',))['frame_width']:
+                # Not a readable video: keep the job so the failure is visible
+                update_job(task_id, status='error', finished_at=time.time())
+                self.errors += 1
+                print(f"Watch folder: could not read {path}")
+            else:
+                args = batch.job_args(self.request)
+                batch.mark_processing(task_id, args)
+                batch.submit(task_id, args)
+                print(f"Watch folder: queued {path} as job {task_id}")
+        except Exception as e:
+            self.errors += 1
+            print(f"Watch folder: failed to ingest {path}: {e}")
+        # Recorded even after a failure, so a broken file isn't retried on every scan
+        record_ingested_file(path, size, mtime, task_id)
+        self._ingested.add(path)
+        self.files_ingested += 1
+
+    def get_stats(self):
+        return {
+            'enabled': True,
+            'folder': self.folder,
+            'filesIngested': self.files_ingested,
+            'errors': self.errors,
+            'waiting': len(self._candidates),  # Seen once, or still being written
+            'lastScan': self.last_scan,
+        }
+
+
+_watcher = None
+
+
+def start():
+    """Start the ingester if LOCUS_WATCH_DIR is set."""
+    global _watcher
+    if not WATCH_DIR:
+        return
+    if not WATCH_CONFIG:
+        print("LOCUS_WATCH_DIR is set without LOCUS_WATCH_CONFIG; watch folder disabled")
+        return
+    try:
+        with open(WATCH_CONFIG) as f:
+            request = ProcessRequest(**json.load(f))
+        batch.job_args(request)  # Validate before anything is ingested
+    except (OSError, ValueError) as e:
+        print(f"Invalid watch folder configuration {WATCH_CONFIG}: {e}")
+        return
+    os.makedirs(WATCH_DIR, exist_ok=True)
+    _watcher = WatchFolder(WATCH_DIR, request)
+    _watcher.start()
+    print(f"Watching {_watcher.folder} for new videos")
+
+
+def stop():
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
+
+
+def get_stats():
+    return _watcher.get_stats() if _watcher is not None else {'enabled': False}
@@ -0,0 +1,199 @@
+"""
+Shared queue of offline jobs for multi-node processing.
+
+With the queue enabled, API nodes only enqueue jobs; standalone workers
+(python -m app.worker, see app/worker.py) lease them, process them and write
+results to the shared database and volume. A lease has to be renewed by
+heartbeats; if a worker dies its lease expires and the job is handed to the
+next worker that asks, up to MAX_ATTEMPTS times.
+
+Brokers are pluggable: the default stores the queue in the jobs database
+(job_queue table). Other brokers implement the Broker interface and are
+registered with register_broker().
+"""
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import time
+
+from app.services.db import get_db, update_job
+
+# Enqueue jobs for worker nodes instead of processing them in the API process
+QUEUE_ENABLED = os.environ.get('LOCUS_JOB_QUEUE', '0') == '1'
+
+# Broker used by API nodes and workers
+BROKER = os.environ.get('LOCUS_JOB_BROKER', 'sqlite')
+
+# A lease is lost unless renewed within this many seconds
+LEASE_SECONDS = 60
+
+# Jobs whose worker died this many times are marked as failed instead of requeued
+MAX_ATTEMPTS = 3
+
+
+class Broker(ABC):
+    """Interface of a job queue backend. Payloads are JSON-serializable dicts."""
+
+    @abstractmethod
+    def enqueue(self, task_id, payload):
+        """Queue a job (replacing any earlier queue entry for the same task)."""
+
+    @abstractmethod
+    def lease(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """
+        Take the oldest queued job, or one whose lease expired.
+
+        Returns:
+            (task_id, payload, attempt) or None if nothing is waiting
+        """
+
+    @abstractmethod
+    def heartbeat(self, task_id, worker_id, lease_seconds=LEASE_SECONDS):
+        """Extend a lease. Returns False if the worker no longer holds it."""
+
+    @abstractmethod
+    def complete(self, task_id, worker_id, error=None):
+        """Mark a leased job as done (or failed with error)."""
+
+    @abstractmethod
+    def stats(self):
+        """Queue depth per status and the workers currently holding leases."""
+
+
+class SQLiteBroker(Broker):
+    """Queue stored in the jobs database; workers need the database on a shared volume."""
+
+    def enqueue(self, task_id, payload):
+        conn = get_db()
+        conn.execute(
+            'INSERT OR REPLACE INTO job_queue (task_id, payload, status, attempts, enqueued_at) '
+            'VALUES (?, ?, ?, 0, ?)',
+            (task_id, json.dumps(payload), 'queued', time.time())
+        )
+        conn.commit()
+        conn.close()
+
+    def lease(self, worker_id, lease_seconds=LEASE_SECONDS):
+        conn = get_db()
+        try:
+            # Take the write lock up front so two workers can't lease the same row
+            conn.execute('BEGIN IMMEDIATE')
+            while True:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT task_id, payload, status, attempts, worker_id FROM job_queue "
+                    "WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) "
+                    "ORDER BY enqueued_at LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    conn.commit()
+                    return None
+                if row['status'] == 'leased' and row['attempts'] >= MAX_ATTEMPTS:
+                    # Its workers keep dying: give up instead of taking down the next one
+                    error = f"Worker {row['worker_id']} stopped responding ({row['attempts']} attempts)"
+                    conn.execute(
+                        "UPDATE job_queue SET status = 'failed', finished_at = ?, error = ? WHERE task_id = ?",
+                        (now, error, row['task_id'])
+                    )
+                    conn.execute("UPDATE jobs SET status = 'error', finished_at = ?, revision = revision + 1 WHERE id = ?", (now, row['task_id']))
+                    print(f"Job {row['task_id']} failed: {error}")
+                    continue
+                if row['status'] == 'leased':
+                    print(f"Lease of job {row['task_id']} by worker {row['worker_id']} expired, requeueing")
+                conn.execute(
+                    "UPDATE job_queue SET status = 'leased', worker_id = ?, attempts = attempts + 1, "
+                    "leased_at = ?, heartbeat_at = ?, lease_expires = ? WHERE task_id = ?",
+                    (worker_id, now, now, now + lease_seconds, row['task_id'])
+                )
+                conn.commit()
+                return row['task_id'], json.loads(row['payload']), row['attempts'] + 1
+        except sqlite3.OperationalError as e:
+            # Database busy (another node holds the lock): try again on the next poll
+            print(f"Failed to lease a job: {e}")
+            conn.rollback()
+            return None
+        finally:
+            conn.close()
+
+    def heartbeat(self, task_id, worker_id, lease_seconds=LEASE_SECONDS):
+        now = time.time()
+        conn = get_db()
+        cursor = conn.execute(
+            "UPDATE job_queue SET heartbeat_at = ?, lease_expires = ? "
+            "WHERE task_id = ? AND worker_id = ? AND status = 'leased'",
+            (now, now + lease_seconds, task_id, worker_id)
+        )
+        conn.commit()
+        conn.close()
+        return cursor.rowcount == 1
+
+    def complete(self, task_id, worker_id, error=None):
+        conn = get_db()
+        conn.execute(
+            "UPDATE job_queue SET status = ?, finished_at = ?, error = ? "
+            "WHERE task_id = ? AND worker_id = ? AND status = 'leased'",
+            ('failed' if error else 'done', time.time(), error, task_id, worker_id)
+        )
+        conn.commit()
+        conn.close()
+
+    def stats(self):
+        now = time.time()
+        conn = get_db()
+        counts = conn.execute('SELECT status, COUNT(*) AS n FROM job_queue GROUP BY status').fetchall()
+        leases = conn.execute(
+            "SELECT task_id, worker_id, attempts, leased_at, heartbeat_at, lease_expires FROM job_queue "
+            "WHERE status = 'leased' ORDER BY leased_at"
+        ).fetchall()
+        conn.close()
+        return {
+            'counts': {row['status']: row['n'] for row in counts},
+            'leases': [
+                {
+                    'taskId': row['task_id'],
+                    'workerId': row['worker_id'],
+                    'attempt': row['attempts'],
+                    'runningFor': round(now - row['leased_at'], 1),
+                    'lastHeartbeat': round(now - row['heartbeat_at'], 1),
+                    'expired': row['lease_expires'] < now,
+                }
+                for row in leases
+            ],
+        }
+
+
+_brokers = {'sqlite': SQLiteBroker}
+_instances = {}
+
+
+def register_broker(name, factory):
+    """Make a Broker implementation available as BROKER = name."""
+    _brokers[name] = factory
+
+
+def get_broker(name=None):
+    name = name or BROKER
+    if name not in _instances:
+        if name not in _brokers:
+            raise ValueError(f"Unknown job broker: {name}")
+        _instances[name] = _brokers[name]()
+    return _instances[name]
+
+
+def enqueue_job(task_id, zones, confidence, model, tracker_config=None, motion_gate_config=None,
+                roi_config=None, render_video=True, preview=False, time_ranges=None):
+    """Queue an offline job for the workers (arguments of run_processing_pipeline)."""
+    get_broker().enqueue(task_id, {
+        'zones': zones,
+        'confidence': confidence,
+        'model': model,
+        'tracker_config': tracker_config,
+        'motion_gate_config': motion_gate_config,
+        'roi_config': roi_config,
+        'render_video': render_video,
+        'preview': preview,
+        'time_ranges': time_ranges,
+    })
+    update_job(task_id, progress=0)
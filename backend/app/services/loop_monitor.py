@@ -0,0 +1,125 @@
+"""
+Event loop lag monitor.
+
+A task on the event loop sleeps for INTERVAL and measures how late it wakes
+up: that lateness is how long every request, SSE stream and WebSocket on the
+loop waited. A watchdog thread notices while the loop is stuck and captures the
+loop thread's stack, so each stall longer than STALL_THRESHOLD is logged with
+the code that caused it. Lag and stalls are exported on /metrics and /health.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+
+from app.services import metrics
+
+# How often the loop is sampled (seconds)
+INTERVAL = 0.25
+
+# Lag above which a stall is logged (seconds)
+STALL_THRESHOLD = 0.25
+
+# Frames of the stalled stack included in the log
+STACK_DEPTH = 8
+
+
+class LoopMonitor:
+    def __init__(self, interval=INTERVAL, threshold=STALL_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.last_stall = None  # {'at', 'seconds', 'stack'}
+        self._last_tick = time.monotonic()
+        self._stack = None  # Captured by the watchdog during the current stall
+        self._task = None
+        self._loop_thread_id = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def start(self):
+        """Start monitoring the running event loop (call from a coroutine)."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join()
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.lag = max(0.0, now - expected)
+            self.max_lag = max(self.max_lag, self.lag)
+            self._last_tick = now
+            if self.lag >= self.threshold:
+                self._record_stall(self.lag)
+
+    def _record_stall(self, seconds):
+        stack, self._stack = self._stack, None
+        self.stalls += 1
+        self.last_stall = {'at': time.time(), 'seconds': round(seconds, 3), 'stack': stack}
+        metrics.inc_counter('locus_event_loop_stalls_total', 'Event loop stalls longer than the threshold')
+        where = f":\n{''.join(stack)}" if stack else ""
+        print(f"Event loop stalled for {seconds * 1000:.0f} ms{where}")
+
+    def _watch(self):
+        """Watchdog thread: capture the loop thread's stack while it is stuck."""
+        captured_for = None
+        while not self._stop.wait(self.interval):
+            tick = self._last_tick
+            if time.monotonic() - tick < self.interval + self.threshold or captured_for == tick:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._stack = traceback.format_stack(frame)[-STACK_DEPTH:]
+                captured_for = tick
+
+    def get_stats(self):
+        return {
+            'lagMs': round(self.lag * 1000, 1),
+            'maxLagMs': round(self.max_lag * 1000, 1),
+            'stalls': self.stalls,
+            'lastStall': self.last_stall,
+        }
+
+
+_monitor = None
+
+
+def start():
+    global _monitor
+    _monitor = LoopMonitor()
+    _monitor.start()
+
+
+async def stop():
+    global _monitor
+    if _monitor is not None:
+        await _monitor.stop()
+        _monitor = None
+
+
+def get_stats():
+    return _monitor.get_stats() if _monitor is not None else None
+
+
+metrics.register_gauge(
+    'locus_event_loop_lag_seconds', 'How late the event loop ran its last scheduled check',
+    lambda: _monitor.lag if _monitor is not None else 0.0
+)
@@ -0,0 +1,318 @@
+"""
+Lightweight Prometheus-style metrics.
+
+Stage histograms are only recorded while something is scraping /metrics (a
+scrape within the last SCRAPE_IDLE_TIMEOUT seconds), so an unscraped server pays
+one time comparison per observation. Frame counters and fps estimates are a
+couple of float operations per frame and are always kept.
+
+Detection worker processes (app.services.workers) record into their own copy
+of this module: the API process tells them whether to record histograms
+(set_recording) and merges what they send back (take_deltas / merge_deltas).
+"""
+import bisect
+import threading
+import time
+
+# Histogram buckets in seconds (sub-millisecond up to slow model inference)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Stop recording histograms if nobody has scraped for this long
+SCRAPE_IDLE_TIMEOUT = 300
+
+_lock = threading.Lock()
+_last_scrape = None
+_recording = False  # Set in worker processes while the API process is being scraped
+
+_stage_histograms = {}  # (pipeline, stage) -> Histogram
+_db_write_histogram = None
+_pipelines = {}  # (pipeline, task_id) -> PipelineStats
+_frames_total = {}  # pipeline -> count
+_dropped_frames = {}  # (pipeline, reason) -> count
+_queues = {}  # token -> (queue_name, task_id, size_fn)
+_gauges = {}  # name -> (help, fn)
+_counters = {}  # name -> (help, value)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts, total, count):
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sum += total
+        self.count += count
+
+
+class PipelineStats:
+    __slots__ = ('started', 'frames', 'last_frame', 'fps')
+
+    def __init__(self):
+        self.started = time.time()
+        self.frames = 0
+        self.last_frame = None
+        self.fps = 0.0
+
+
+def is_recording():
+    """True while /metrics is being scraped."""
+    if _recording:
+        return True
+    return _last_scrape is not None and time.monotonic() - _last_scrape < SCRAPE_IDLE_TIMEOUT
+
+
+def set_recording(enabled):
+    """Record histograms regardless of local scrapes (worker processes, as told by the API process)."""
+    global _recording
+    _recording = bool(enabled)
+
+
+def take_deltas():
+    """
+    Histograms, dropped frames and counters recorded since the last call, and reset them.
+    Worker processes send these to the API process with their status.
+    """
+    global _stage_histograms, _db_write_histogram, _dropped_frames
+    stages, _stage_histograms = _stage_histograms, {}
+    db_write, _db_write_histogram = _db_write_histogram, None
+    dropped, _dropped_frames = _dropped_frames, {}
+    with _lock:
+        counters = dict(_counters)
+        _counters.clear()
+    return {
+        'stages': {key: (h.counts, h.sum, h.count) for key, h in stages.items()},
+        'db_write': (db_write.counts, db_write.sum, db_write.count) if db_write is not None else None,
+        'dropped': dropped,
+        'counters': counters,
+    }
+
+
+def merge_deltas(deltas):
+    """Add the deltas a worker process sent (see take_deltas)."""
+    global _db_write_histogram
+    for key, data in deltas['stages'].items():
+        _stage_histograms.setdefault(key, Histogram()).merge(*data)
+    if deltas['db_write'] is not None:
+        if _db_write_histogram is None:
+            _db_write_histogram = Histogram()
+        _db_write_histogram.merge(*deltas['db_write'])
+    for key, count in deltas['dropped'].items():
+        _dropped_frames[key] = _dropped_frames.get(key, 0) + count
+    for name, (help_text, value) in deltas['counters'].items():
+        inc_counter(name, help_text, value)
+
+
+def observe_stage(pipeline, stage, seconds):
+    """Record time spent in a pipeline stage (decode, inference, tracking, zones, render, encode)."""
+    if not is_recording():
+        return
+    key = (pipeline, stage)
+    hist = _stage_histograms.get(key)
+    if hist is None:
+        hist = _stage_histograms.setdefault(key, Histogram())
+    hist.observe(seconds)
+
+
+def observe_inference(pipeline, results, seconds):
+    """
+    Split a model.track() call into inference and tracking time.
+    ultralytics reports preprocess/inference/postprocess in results[0].speed (ms);
+    the rest of the call is ByteTrack.
+    """
+    if not is_recording():
+        return
+    speed = getattr(results[0], 'speed', None) or {}
+    model_ms = sum(v for v in speed.values() if v)
+    inference = min(seconds, model_ms / 1000.0) if model_ms else seconds
+    observe_stage(pipeline, 'inference', inference)
+    observe_stage(pipeline, 'tracking', seconds - inference)
+
+
+def observe_db_write(seconds):
+    """Record the duration of a job write to SQLite."""
+    global _db_write_histogram
+    if not is_recording():
+        return
+    if _db_write_histogram is None:
+        _db_write_histogram = Histogram()
+    _db_write_histogram.observe(seconds)
+
+
+def pipeline_started(pipeline, task_id):
+    """Register a running offline job ('offline') or live stream ('live')."""
+    with _lock:
+        _pipelines[(pipeline, task_id)] = PipelineStats()
+
+
+def pipeline_finished(pipeline, task_id):
+    with _lock:
+        _pipelines.pop((pipeline, task_id), None)
+
+
+def pipeline_frame(pipeline, task_id):
+    """Count a processed frame and update the job's smoothed fps."""
+    _frames_total[pipeline] = _frames_total.get(pipeline, 0) + 1
+    stats = _pipelines.get((pipeline, task_id))
+    if stats is None:
+        return
+    now = time.monotonic()
+    if stats.last_frame is not None:
+        dt = now - stats.last_frame
+        if dt > 0:
+            stats.fps = 1.0 / dt if stats.fps == 0.0 else 0.9 * stats.fps + 0.1 / dt
+    stats.last_frame = now
+    stats.frames += 1
+
+
+def pipeline_report(pipeline, task_id, frames, fps):
+    """Update a job's stats from the totals reported by the worker process running it."""
+    stats = _pipelines.get((pipeline, task_id))
+    if stats is None:
+        return
+    _frames_total[pipeline] = _frames_total.get(pipeline, 0) + max(0, frames - stats.frames)
+    stats.frames = frames
+    stats.fps = fps or 0.0
+    stats.last_frame = time.monotonic()
+
+
+def get_pipeline_fps(pipeline, task_id):
+    stats = _pipelines.get((pipeline, task_id))
+    return round(stats.fps, 2) if stats else None
+
+
+def frame_dropped(pipeline, reason):
+    # Not labelled by task: the label set would grow with every job and stream ever run
+    key = (pipeline, reason)
+    _dropped_frames[key] = _dropped_frames.get(key, 0) + 1
+
+
+def register_queue(token, queue_name, task_id, size_fn):
+    """Expose the depth of a queue (size_fn is called at scrape time)."""
+    with _lock:
+        _queues[token] = (queue_name, task_id, size_fn)
+
+
+def unregister_queue(token):
+    with _lock:
+        _queues.pop(token, None)
+
+
+def register_gauge(name, help_text, fn):
+    """
+    Register a gauge evaluated at scrape time.
+    fn returns a number, or a dict of {label_dict_items_tuple: value}.
+    """
+    _gauges[name] = (help_text, fn)
+
+
+def inc_counter(name, help_text, amount=1):
+    with _lock:
+        _, value = _counters.get(name, (help_text, 0))
+        _counters[name] = (help_text, value + amount)
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _render_histogram(lines, name, hist, **labels):
+    cumulative = 0
+    for bound, count in zip(hist.buckets, hist.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+    cumulative += hist.counts[-1]
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {cumulative}')
+    lines.append(f'{name}_sum{_labels(**labels)} {hist.sum:.6f}')
+    lines.append(f'{name}_count{_labels(**labels)} {hist.count}')
+
+
+def render():
+    """Render all metrics in the Prometheus text exposition format and mark a scrape."""
+    global _last_scrape
+    _last_scrape = time.monotonic()
+
+    lines = []
+
+    lines.append('# HELP locus_stage_seconds Time spent per pipeline stage')
+    lines.append('# TYPE locus_stage_seconds histogram')
+    for (pipeline, stage), hist in sorted(_stage_histograms.items()):
+        _render_histogram(lines, 'locus_stage_seconds', hist, pipeline=pipeline, stage=stage)
+
+    lines.append('# HELP locus_db_write_seconds Time spent writing job updates to SQLite')
+    lines.append('# TYPE locus_db_write_seconds histogram')
+    if _db_write_histogram is not None:
+        _render_histogram(lines, 'locus_db_write_seconds', _db_write_histogram)
+
+    lines.append('# HELP locus_frames_total Frames processed')
+    lines.append('# TYPE locus_frames_total counter')
+    for pipeline, count in sorted(_frames_total.items()):
+        lines.append(f'locus_frames_total{_labels(pipeline=pipeline)} {count}')
+
+    with _lock:
+        pipelines = list(_pipelines.items())
+        queues = list(_queues.values())
+        counters = list(_counters.items())
+
+    lines.append('# HELP locus_pipeline_fps Smoothed processing rate per job/stream')
+    lines.append('# TYPE locus_pipeline_fps gauge')
+    for (pipeline, task_id), stats in pipelines:
+        lines.append(f'locus_pipeline_fps{_labels(pipeline=pipeline, task_id=task_id)} {stats.fps:.2f}')
+
+    lines.append('# HELP locus_active_jobs Offline jobs currently processing')
+    lines.append('# TYPE locus_active_jobs gauge')
+    lines.append(f'locus_active_jobs {sum(1 for (p, _), _s in pipelines if p == "offline")}')
+    lines.append('# HELP locus_active_streams Live streams currently running')
+    lines.append('# TYPE locus_active_streams gauge')
+    lines.append(f'locus_active_streams {sum(1 for (p, _), _s in pipelines if p == "live")}')
+
+    lines.append('# HELP locus_dropped_frames_total Frames read but not processed or delivered')
+    lines.append('# TYPE locus_dropped_frames_total counter')
+    for (pipeline, reason), count in sorted(_dropped_frames.items()):
+        lines.append(f'locus_dropped_frames_total{_labels(pipeline=pipeline, reason=reason)} {count}')
+
+    lines.append('# HELP locus_queue_depth Items waiting in internal queues')
+    lines.append('# TYPE locus_queue_depth gauge')
+    depths = {}
+    for queue_name, task_id, size_fn in queues:
+        try:
+            depths[(queue_name, task_id)] = depths.get((queue_name, task_id), 0) + size_fn()
+        except Exception:
+            continue
+    for (queue_name, task_id), depth in sorted(depths.items()):
+        lines.append(f'locus_queue_depth{_labels(queue=queue_name, task_id=task_id)} {depth}')
+
+    for name, (help_text, value) in sorted(counters):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {value}')
+
+    for name, (help_text, fn) in sorted(_gauges.items()):
+        try:
+            value = fn()
+        except Exception:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        if isinstance(value, dict):
+            for label_items, v in sorted(value.items()):
+                lines.append(f'{name}{_labels(**dict(label_items))} {v}')
+        else:
+            lines.append(f'{name} {value}')
+
+    return '\n'.join(lines) + '\n'
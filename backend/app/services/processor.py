@@ -1,9 +1,26 @@
+import os
 import time
-from app.core.detector import detection
+
+import numpy as np
+
+from app.core import heatmap, overlay, track_cache
+from app.core.detector import detection, render_cached_tracks
+from app.services import progress as job_progress
 from app.services.db import update_job
 from app.services.file_handler import clear_all_uploads
+from app.services.uploads import hash_file
+
+# Progress is pushed to clients from memory every frame; SQLite only gets
+# coarse checkpoints so a restart still shows roughly where a job was.
+DB_PROGRESS_CHECKPOINT = 25
+
+# Preview pass: sampled frames per second and model input size
+PREVIEW_FPS = 2
+PREVIEW_IMGSZ = 320
 
-def run_processing_pipeline(taskID, job, zones, confidence, model='yolo11n.pt', tracker_config=None):
+def run_processing_pipeline(taskID, job, zones, confidence, model='yolo11n.pt', tracker_config=None,
+                            motion_gate_config=None, roi_config=None, render_video=True, preview=False,
+                            time_ranges=None):
     """
     Run video processing pipeline with multiple zones.
     
@@ -14,6 +31,13 @@ def run_processing_pipeline(taskID, job, zones, confidence, model='yolo11n.pt',
         confidence: Detection confidence threshold (1-100)
         model: YOLO model name
         tracker_config: ByteTrack configuration dict
+        motion_gate_config: Motion gate configuration dict (None disables the gate)
+        roi_config: ROI cropping/tiling configuration dict (None runs on the full frame)
+        render_video: Encode an annotated output video; when False only overlay data is written
+        preview: Run a fast low-resolution pass first and store its approximate results
+            (preview_data, result_quality='preview') until the full pass replaces them
+        time_ranges: Only analyze these parts of the video ([{start, end}, ...] in seconds);
+            progress covers the selected ranges, event times stay on the video's timeline
     """
     # Default tracker config if not provided
     if tracker_config is None:
@@ -25,37 +49,180 @@ def run_processing_pipeline(taskID, job, zones, confidence, model='yolo11n.pt',
         }
     
     start_time = time.time()
+    job_progress.start(taskID)
     
-    last_progress = 0
+    # Tracks don't depend on zone geometry: if this video was already tracked with the
+    # same settings, recompute the analytics from the track cache instead (a rendered
+    # video is redrawn from the cached boxes, without inference).
+    content_hash = job.get('content_hash')
+    if not content_hash and job.get('video_path') and os.path.exists(job['video_path']):
+        content_hash = hash_file(job['video_path'])
+        update_job(taskID, content_hash=content_hash)
+    cache_key = track_cache.cache_key(content_hash, model, confidence, tracker_config, zones,
+                                      roi_config, motion_gate_config, time_ranges)
+    if track_cache.exists(cache_key):
+        try:
+            _run_from_track_cache(taskID, job, cache_key, zones, tracker_config, render_video, time_ranges, start_time)
+            return
+        except Exception as e:
+            print(f"Track cache replay failed, reprocessing video: {e}")
+    
+    if preview:
+        try:
+            _run_preview(taskID, job, zones, confidence, model, tracker_config, motion_gate_config, time_ranges)
+        except Exception as e:
+            # The full pass still runs; it is what the job's results come from
+            print(f"Preview pass failed for {taskID}: {e}")
+        job_progress.set_phase(taskID, 'final')
+    
+    last_checkpoint = 0
     final_detection_events = []
     final_dwell_events = []
     final_line_crossing_counts = {}
-    final_heatmap_data = None
+    final_heatmap = None
+    pipeline_stats = {}
     
-    for frame, progress, detection_events, dwell_events, line_crossing_counts, heatmap_data in detection(
-        job['video_path'], 
-        zones,
-        (job['frame_width'], job['frame_height']), 
-        taskID, 
-        confidence,
-        model,
-        tracker_config
-    ):
-        final_detection_events = detection_events
-        final_dwell_events = dwell_events
-        final_line_crossing_counts = line_crossing_counts
-        final_heatmap_data = heatmap_data
-        # Update progress in DB every 5% to avoid too many writes
-        if progress >= last_progress + 5 or progress == 100:
-            update_job(taskID, progress=progress)
-            last_progress = progress
+    try:
+        for frame, progress, detection_events, dwell_events, line_crossing_counts, heatmap_acc in detection(
+            job['video_path'], 
+            zones,
+            (job['frame_width'], job['frame_height']), 
+            taskID, 
+            confidence,
+            model,
+            tracker_config,
+            motion_gate_config,
+            pipeline_stats,
+            roi_config,
+            track_cache_key=cache_key,
+            render_video=render_video,
+            time_ranges=time_ranges
+        ):
+            final_detection_events = detection_events
+            final_dwell_events = dwell_events
+            final_line_crossing_counts = line_crossing_counts
+            final_heatmap = heatmap_acc
+            job_progress.update(taskID, progress)
+            if progress >= last_checkpoint + DB_PROGRESS_CHECKPOINT and progress < 100:
+                update_job(taskID, progress=progress)
+                last_checkpoint = progress
+    except Exception as e:
+        job_progress.finish(taskID, status='error', error=str(e))
+        update_job(taskID, status='error', finished_at=time.time())
+        raise
         
     end_time = time.time()
     process_time = round(end_time - start_time, 2)
+    if cache_key:
+        pipeline_stats['track_cache'] = {'hit': False}
+    final_heatmap_data = final_heatmap.grid(heatmap.LEGACY_RESOLUTION).tolist() if final_heatmap is not None else None
     
-    update_job(taskID, process_time=process_time, status='completed', 
+    update_job(taskID, process_time=process_time, status='completed', progress=100,
                detection_data=final_detection_events, dwell_data=final_dwell_events,
-               line_crossing_data=final_line_crossing_counts, heatmap_data=final_heatmap_data)
+               line_crossing_data=final_line_crossing_counts, heatmap_data=final_heatmap_data,
+               pipeline_stats=pipeline_stats, result_quality='final', finished_at=time.time())
+    job_progress.finish(taskID)
     
     # clear_all_uploads()  # Commented out to prevent deleting frames needed by the frontend for results/editing
 
+
+def _run_from_track_cache(taskID, job, cache_key, zones, tracker_config, render_video, time_ranges, start_time):
+    """
+    Recompute zone analytics from cached tracks (no inference). Rendered jobs have their
+    output video redrawn, which decodes the video; overlay-only jobs don't decode at all.
+    """
+    records, meta = track_cache.load(cache_key)
+    detection_events, dwell_events, line_crossing_counts, heatmap_data, states = track_cache.recompute_analytics(
+        records, meta, zones, ttl=int(tracker_config.get('track_buffer', 30)), return_states=True
+    )
+    if render_video:
+        # The frontend only draws the overlay over unrendered jobs; don't keep a stale one
+        overlay.delete(taskID)
+        for frame, progress in render_cached_tracks(job['video_path'], zones, (job['frame_width'], job['frame_height']),
+                                                    taskID, records, meta, states, detection_events,
+                                                    time_ranges=time_ranges):
+            job_progress.update(taskID, progress)
+    else:
+        _rewrite_overlay(taskID, records, meta, states)
+    if not heatmap.exists(taskID):
+        # Jobs processed before per-class heatmaps were stored (tracks don't depend on zones)
+        heatmap.build(np.round(records['source'] / meta['fps'], 2), records['x'], records['y'], records['cls'],
+                      meta['frame_size']).save(taskID)
+    process_time = round(time.time() - start_time, 2)
+    
+    # Keep the stats of the run that produced the tracks (motion gate, ROI, ...)
+    pipeline_stats = dict(job.get('pipeline_stats') or {})
+    pipeline_stats['track_cache'] = {'hit': True, 'rows': int(meta['rows']), 'frames': int(meta['frames']),
+                                     'rendered': render_video}
+    
+    update_job(taskID, process_time=process_time, status='completed', progress=100,
+               detection_data=detection_events, dwell_data=dwell_events,
+               line_crossing_data=line_crossing_counts, heatmap_data=heatmap_data,
+               pipeline_stats=pipeline_stats, result_quality='final', finished_at=time.time())
+    job_progress.finish(taskID)
+
+
+def _run_preview(taskID, job, zones, confidence, model, tracker_config, motion_gate_config, time_ranges=None):
+    """
+    Approximate analytics from PREVIEW_FPS sampled frames at PREVIEW_IMGSZ input size.
+    Nothing is rendered or cached and the job's overlay/heatmap files are left alone;
+    the results go to preview_data, tagged with the settings that produced them.
+    """
+    job_progress.set_phase(taskID, 'preview')
+    start_time = time.time()
+    result = None
+    for frame, progress, detection_events, dwell_events, line_crossing_counts, heatmap_acc in detection(
+        job['video_path'],
+        zones,
+        (job['frame_width'], job['frame_height']),
+        taskID,
+        confidence,
+        model,
+        tracker_config,
+        motion_gate_config,
+        render_video=False,
+        target_fps=PREVIEW_FPS,
+        imgsz=PREVIEW_IMGSZ,
+        save_artifacts=False,
+        time_ranges=time_ranges
+    ):
+        result = (detection_events, dwell_events, line_crossing_counts, heatmap_acc)
+        job_progress.update(taskID, progress)
+    if result is None:
+        return
+    
+    detection_events, dwell_events, line_crossing_counts, heatmap_acc = result
+    update_job(taskID, result_quality='preview', preview_data={
+        'quality': 'preview',
+        'sampleFps': PREVIEW_FPS,
+        'imgsz': PREVIEW_IMGSZ,
+        'processTime': round(time.time() - start_time, 2),
+        'detectionData': detection_events,
+        'dwellData': dwell_events,
+        'lineCrossingData': line_crossing_counts,
+        'heatmapData': heatmap_acc.grid(heatmap.LEGACY_RESOLUTION).tolist(),
+    })
+
+
+def _rewrite_overlay(taskID, records, meta, states):
+    """Update the overlay's dot states for new zones (boxes and track IDs are unchanged)."""
+    if overlay.exists(taskID):
+        times, rows, overlay_meta = overlay.load(taskID)
+        if len(rows) == len(records):
+            # Same rows in the same order as the cache that produced them
+            rows = np.array(rows)
+            rows['state'] = states
+            overlay.write(taskID, np.array(times), rows, overlay_meta['fps'], overlay_meta['frame_size'])
+            return
+
+    # No overlay from the original run: rebuild it from the cached tracks. Processed
+    # frames without any tracks were not cached, so they are missing from the overlay.
+    sources, frame_idx = np.unique(records['source'], return_inverse=True)
+    rows = np.empty(len(records), dtype=overlay.ROW_DTYPE)
+    rows['frame'] = frame_idx
+    rows['track_id'] = records['track_id']
+    rows['cls'] = records['cls']
+    rows['state'] = states
+    for field in ('x', 'y', 'w', 'h'):
+        rows[field] = records[field]
+    overlay.write(taskID, (sources - 1) / meta['fps'], rows, meta['fps'], meta['frame_size'])
@@ -0,0 +1,144 @@
+"""
+In-process progress/status registry for running jobs.
+
+The processing pipeline updates this on every frame without touching SQLite;
+the progress endpoint and the Server-Sent Events stream read from it. The
+database only receives coarse checkpoints (see run_processing_pipeline).
+"""
+import threading
+import time
+
+# Keep finished entries around briefly so late watchers still see the final state
+FINISHED_TTL = 60
+
+# Publish fps/ETA changes at least this often between whole-percent steps (seconds)
+REFRESH_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_jobs = {}
+
+
+class JobProgress:
+    __slots__ = ('status', 'progress', 'frames', 'fps', 'started', 'updated', 'finished', 'version', 'error',
+                 'phase', 'published')
+
+    def __init__(self):
+        now = time.time()
+        self.status = 'processing'
+        self.progress = 0
+        self.frames = 0
+        self.fps = 0.0
+        self.started = now
+        self.updated = now
+        self.finished = None
+        self.version = 0
+        self.published = now  # When version last changed
+        self.error = None
+        self.phase = 'final'  # 'preview' while a preview pass runs before the full analysis
+
+    def snapshot(self):
+        elapsed = self.updated - self.started
+        eta = None
+        if self.status == 'processing' and 0 < self.progress < 100 and elapsed > 0:
+            eta = round(elapsed * (100 - self.progress) / self.progress, 1)
+        return {
+            'status': self.status,
+            'progress': self.progress,
+            'frames': self.frames,
+            'fps': round(self.fps, 2),
+            'elapsed': round(elapsed, 1),
+            'eta': eta,
+            'error': self.error,
+            'phase': self.phase,
+            'version': self.version
+        }
+
+    def bump(self, now=None):
+        """Mark the snapshot as changed, so watchers (the SSE stream) send it again."""
+        self.version += 1
+        self.published = now or time.time()
+
+
+def start(task_id):
+    """Register a job that is starting to process."""
+    with _lock:
+        _jobs[task_id] = JobProgress()
+
+
+def update(task_id, progress):
+    """Record one processed frame and the current progress percentage."""
+    job = _jobs.get(task_id)
+    if job is None:
+        return
+    now = time.time()
+    dt = now - job.updated
+    if job.frames and dt > 0:
+        job.fps = 1.0 / dt if job.fps == 0.0 else 0.9 * job.fps + 0.1 / dt
+    job.updated = now
+    job.frames += 1
+    if progress != job.progress or now - job.published >= REFRESH_INTERVAL:
+        job.progress = progress
+        job.bump(now)
+
+
+def set_phase(task_id, phase):
+    """Switch a job to another pass ('preview' or 'final'); progress restarts from 0."""
+    job = _jobs.get(task_id)
+    if job is None:
+        return
+    job.phase = phase
+    job.progress = 0
+    job.frames = 0
+    job.fps = 0.0
+    job.started = job.updated = time.time()
+    job.bump()
+
+
+def finish(task_id, status='completed', error=None):
+    """Mark a job as finished ('completed' or 'error')."""
+    job = _jobs.get(task_id)
+    if job is None:
+        return
+    job.status = status
+    job.error = error
+    if status == 'completed':
+        job.progress = 100
+    job.updated = job.finished = time.time()
+    job.bump()
+
+
+def apply(task_id, snapshot):
+    """Mirror a snapshot reported by the worker process running the job."""
+    job = _jobs.get(task_id)
+    if job is None or snapshot is None:
+        return
+    now = time.time()
+    changed = (snapshot['status'] != job.status or snapshot['progress'] != job.progress
+               or snapshot['phase'] != job.phase)
+    job.status = snapshot['status']
+    job.progress = snapshot['progress']
+    job.frames = snapshot['frames']
+    job.fps = snapshot['fps']
+    job.error = snapshot['error']
+    job.phase = snapshot['phase']
+    job.started = now - snapshot['elapsed']
+    job.updated = now
+    if job.status != 'processing':
+        job.finished = job.finished or now
+    if changed or now - job.published >= REFRESH_INTERVAL:
+        job.bump(now)
+
+
+def get(task_id):
+    """Snapshot of a job's progress, or None if it is not (or no longer) tracked."""
+    _prune()
+    job = _jobs.get(task_id)
+    return job.snapshot() if job else None
+
+
+def _prune():
+    cutoff = time.time() - FINISHED_TTL
+    with _lock:
+        expired = [tid for tid, job in _jobs.items() if job.finished and job.finished < cutoff]
+        for tid in expired:
+            del _jobs[tid]
@@ -0,0 +1,90 @@
+"""
+Server-side cache of serialized job responses.
+
+Every write to a job bumps its revision (see update_job), so a response body
+is keyed by (task_id, kind) and stored with the ETag it was built for; a hit
+requires the ETag to match, and a stale entry is simply replaced. Only
+completed jobs are cached - their payloads are the large ones and they change
+only when a job is renamed, rezoned or reprocessed.
+"""
+import threading
+from collections import OrderedDict
+
+from app.services import metrics
+
+# Serialized bodies kept in memory (a job with 100k detection events is ~10 MB of JSON)
+RESPONSE_CACHE_BYTES = 64 * 1024 * 1024
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # (task_id, kind) -> (etag, body, headers) (LRU)
+_bytes = 0
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _drop(key):
+    global _bytes
+    _, body, _ = _entries.pop(key)
+    _bytes -= len(body)
+
+
+def get(task_id, kind, etag):
+    """
+    Cached response for a job at the given ETag.
+
+    Returns:
+        (body, headers) or None
+    """
+    key = (task_id, kind)
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or entry[0] != etag:
+            _stats['misses'] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats['hits'] += 1
+        return entry[1], entry[2]
+
+
+def put(task_id, kind, etag, body, headers=None):
+    """Store a serialized response body (bytes) and any extra headers it needs."""
+    global _bytes
+    if len(body) > RESPONSE_CACHE_BYTES:
+        return
+    key = (task_id, kind)
+    with _lock:
+        if key in _entries:
+            _drop(key)
+        _entries[key] = (etag, body, headers or {})
+        _bytes += len(body)
+        while _bytes > RESPONSE_CACHE_BYTES:
+            _drop(next(iter(_entries)))
+
+
+def discard(task_id):
+    """Forget every cached response for a job (e.g. when it is deleted)."""
+    with _lock:
+        for key in [key for key in _entries if key[0] == task_id]:
+            _drop(key)
+
+
+def clear():
+    global _bytes
+    with _lock:
+        _entries.clear()
+        _bytes = 0
+
+
+def get_cache_stats():
+    with _lock:
+        return {
+            'entries': len(_entries),
+            'bytes': _bytes,
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+        }
+
+
+metrics.register_gauge(
+    'locus_response_cache_bytes', 'Serialized job responses held in memory',
+    lambda: get_cache_stats()['bytes']
+)
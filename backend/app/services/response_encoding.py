@@ -0,0 +1,130 @@
+"""
+Serialization and compression of large API responses (job details, exports,
+overlays, heatmaps).
+
+Bodies are serialized with orjson when it is installed (several times faster
+than the standard library on event lists), or as MessagePack for clients that
+send `Accept: application/msgpack`. Bodies above COMPRESS_MIN_BYTES are
+compressed with the best encoding the client accepts: zstd, brotli or gzip.
+orjson, msgpack, brotli and zstandard are optional (`uv sync --extra speedups`);
+without them responses are plain JSON, gzipped.
+"""
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_MEDIA_TYPE = 'application/json'
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+# Smaller bodies aren't worth compressing
+COMPRESS_MIN_BYTES = 1024
+
+# Speed over ratio: bodies are compressed on request (completed jobs once, see response_cache)
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+def _available_encodings():
+    """Content encodings this server can produce, in order of preference."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+ENCODINGS = _available_encodings()
+
+
+def _parse_accept(header):
+    """{token: q} for an Accept or Accept-Encoding header."""
+    offered = {}
+    for part in (header or '').split(','):
+        token, _, params = part.partition(';')
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        offered[token] = q
+    return offered
+
+
+def negotiate_encoding(accept_encoding):
+    """Content encoding to use for an Accept-Encoding header, or None for identity."""
+    offered = _parse_accept(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = offered.get(encoding, offered.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def negotiate_media_type(accept):
+    """MSGPACK_MEDIA_TYPE if the client asks for MessagePack (and msgpack is installed), else JSON."""
+    if msgpack is None:
+        return JSON_MEDIA_TYPE
+    offered = _parse_accept(accept)
+    if max(offered.get(MSGPACK_MEDIA_TYPE, 0.0), offered.get('application/x-msgpack', 0.0)) > 0:
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def serialize(content, media_type=JSON_MEDIA_TYPE):
+    """Serialize plain Python data (dicts, lists, numbers, strings) to bytes."""
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(content, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def compress(body, encoding):
+    """
+    Compress a body with a negotiated encoding.
+
+    Returns:
+        (body, applied encoding or None when left uncompressed)
+    """
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body), encoding
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY), encoding
+    return gzip.compress(body, compresslevel=GZIP_LEVEL), encoding
+
+
+def representation(media_type, encoding):
+    """Short tag for a (media type, encoding) pair, for ETags and cache keys."""
+    tag = 'msgpack' if media_type == MSGPACK_MEDIA_TYPE else 'json'
+    return f'{tag}.{encoding}' if encoding else tag
@@ -0,0 +1,224 @@
+"""
+Resumable chunked uploads.
+
+Protocol (see app/api/routes/uploads.py):
+    1. POST   /api/uploads                    {filename, size} -> {uploadId, offset}
+    2. PUT    /api/uploads/{id}?offset=N      raw bytes, appended at offset N
+    3. GET    /api/uploads/{id}               -> current offset (to resume after a dropped connection)
+    4. POST   /api/uploads/{id}/complete      -> {taskId}
+
+Chunks must arrive in order (offset == bytes received so far), which lets the
+SHA-256 of the video be computed while it streams in. The partial file and a
+small JSON sidecar live in uploads/incoming, so an upload can be resumed even
+after a server restart (the hash is then recomputed on completion).
+
+All functions here do blocking file I/O and are meant to be called from a
+worker thread, not the event loop.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+UPLOAD_DIR = 'uploads/incoming'
+
+# Suggested chunk size for clients; individual PUTs may be smaller or larger
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Partial uploads untouched for this long are removed
+UPLOAD_EXPIRY = 24 * 3600
+
+_lock = threading.Lock()
+_hashers = {}  # upload_id -> (hashlib object, bytes hashed)
+_writing = set()  # upload_ids with a chunk currently being written
+
+
+class UploadError(Exception):
+    """Raised for invalid upload requests (unknown id, wrong offset, size mismatch)."""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+def _part_path(upload_id):
+    return os.path.join(UPLOAD_DIR, f'{upload_id}.part')
+
+
+def _meta_path(upload_id):
+    return os.path.join(UPLOAD_DIR, f'{upload_id}.json')
+
+
+def _load_meta(upload_id):
+    # upload_id is used in a file path; only accept our own uuid4 hex ids
+    if not upload_id or len(upload_id) != 32 or not all(c in '0123456789abcdef' for c in upload_id):
+        raise UploadError('Upload not found', status_code=404)
+    try:
+        with open(_meta_path(upload_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise UploadError('Upload not found', status_code=404)
+
+
+def create_upload(filename, size):
+    """
+    Start a new upload session.
+
+    Args:
+        filename: Original file name (sanitized before use)
+        size: Total size in bytes
+
+    Returns:
+        Upload status dict ({uploadId, offset, size, chunkSize})
+    """
+    if size is None or size <= 0:
+        raise UploadError('File size must be positive')
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    cleanup_expired()
+
+    upload_id = uuid.uuid4().hex
+    meta = {
+        'filename': secure_filename(filename) if filename else 'video.mp4',
+        'size': int(size),
+        'created': time.time()
+    }
+    with open(_meta_path(upload_id), 'w') as f:
+        json.dump(meta, f)
+    open(_part_path(upload_id), 'wb').close()
+
+    with _lock:
+        _hashers[upload_id] = (hashlib.sha256(), 0)
+
+    return get_upload(upload_id)
+
+
+def get_upload(upload_id):
+    """Current state of an upload; offset is where the next chunk must start."""
+    meta = _load_meta(upload_id)
+    try:
+        offset = os.path.getsize(_part_path(upload_id))
+    except OSError:
+        offset = 0
+    return {
+        'uploadId': upload_id,
+        'filename': meta['filename'],
+        'offset': offset,
+        'size': meta['size'],
+        'chunkSize': CHUNK_SIZE
+    }
+
+
+def open_chunk(upload_id, offset):
+    """
+    Validate a chunk's offset and open the partial file for appending.
+
+    Returns:
+        (file object, total size). Write data with write_chunk(), then call close_chunk().
+    """
+    meta = _load_meta(upload_id)
+    with _lock:
+        if upload_id in _writing:
+            raise UploadError('Another chunk is being written', status_code=409)
+        current = os.path.getsize(_part_path(upload_id))
+        if offset != current:
+            raise UploadError(f'Expected offset {current}', status_code=409, offset=current)
+        _writing.add(upload_id)
+    return open(_part_path(upload_id), 'ab'), meta['size']
+
+
+def close_chunk(upload_id, f):
+    f.close()
+    with _lock:
+        _writing.discard(upload_id)
+
+
+def write_chunk(upload_id, f, data):
+    """Append bytes to an open partial file and feed them to the running hash."""
+    f.write(data)
+    with _lock:
+        entry = _hashers.get(upload_id)
+        if entry is not None:
+            hasher, hashed = entry
+            hasher.update(data)
+            _hashers[upload_id] = (hasher, hashed + len(data))
+
+
+def hash_file(path):
+    """SHA-256 hex digest of a file."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def complete_upload(upload_id, dest_folder, task_id):
+    """
+    Verify an upload is complete and move it into place as <task_id>_<filename>.
+
+    Returns:
+        (final path, original filename, sha256 hex digest)
+    """
+    meta = _load_meta(upload_id)
+    part = _part_path(upload_id)
+    received = os.path.getsize(part)
+    if received != meta['size']:
+        raise UploadError(f"Upload incomplete: {received} of {meta['size']} bytes",
+                          status_code=409, offset=received)
+
+    with _lock:
+        entry = _hashers.pop(upload_id, None)
+    if entry is not None and entry[1] == received:
+        content_hash = entry[0].hexdigest()
+    else:
+        # Hash state was lost (e.g. server restart mid-upload)
+        content_hash = hash_file(part)
+
+    os.makedirs(dest_folder, exist_ok=True)
+    dest = os.path.join(dest_folder, f"{task_id}_{meta['filename']}")
+    os.replace(part, dest)
+    _remove(_meta_path(upload_id))
+    return dest, meta['filename'], content_hash
+
+
+def abort_upload(upload_id):
+    """Discard a partial upload."""
+    _load_meta(upload_id)
+    with _lock:
+        _hashers.pop(upload_id, None)
+    _remove(_part_path(upload_id))
+    _remove(_meta_path(upload_id))
+
+
+def cleanup_expired():
+    """Remove partial uploads that have not been written to for UPLOAD_EXPIRY seconds."""
+    if not os.path.isdir(UPLOAD_DIR):
+        return
+    cutoff = time.time() - UPLOAD_EXPIRY
+    for name in os.listdir(UPLOAD_DIR):
+        if not name.endswith('.json'):
+            continue
+        upload_id = name[:-len('.json')]
+        try:
+            last_write = max(os.path.getmtime(_meta_path(upload_id)),
+                             os.path.getmtime(_part_path(upload_id)) if os.path.exists(_part_path(upload_id)) else 0)
+        except OSError:
+            continue
+        if last_write < cutoff:
+            with _lock:
+                _hashers.pop(upload_id, None)
+            _remove(_part_path(upload_id))
+            _remove(_meta_path(upload_id))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
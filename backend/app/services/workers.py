@@ -0,0 +1,606 @@
+"""
+Detection worker processes.
+
+Offline jobs and live streams run in worker processes instead of threads of
+the API process, so inference and drawing never compete with request handling
+for the API's GIL, and a worker that crashes (or is killed by the OOM killer)
+only fails its own job.
+
+Worker processes are long-lived: a worker runs one job or stream at a time and
+goes back to an idle pool when it finishes, keeping torch imported and its
+loaded models in its own model cache (app.core.model_loader). start_warmup()
+starts the first worker with the API and warms the default model inside it,
+which is what the readiness endpoint reports in process mode.
+
+- Live frames: the worker writes each encoded JPEG into a shared-memory ring
+  buffer (FrameRing) and only sends its slot and sequence number over the
+  worker's pipe; frame bytes are never pickled.
+- Control and analytics go over the same pipe as small tuples: per-frame zone
+  counts, periodic status (progress, fps, metrics recorded since the last
+  status) from the worker; stop, thread budget (see app.services.governor) and
+  whether /metrics is being scraped from the API process.
+
+Progress, metrics and live stream state are mirrored into the API process's
+own registries, so the progress, metrics and camera endpoints work unchanged.
+Set DETECTION_WORKERS = 'thread' to run pipelines inside the API process again.
+"""
+import itertools
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.core import live_detector, model_loader
+from app.services import governor, metrics
+from app.services import progress as job_progress
+from app.services.db import update_job
+
+# 'process' (pooled worker processes, one job/stream each at a time) or 'thread' (inside the API process)
+DETECTION_WORKERS = 'process'
+
+# Idle worker processes kept for the next job or stream; more are started on demand
+IDLE_WORKERS = 2
+
+# How long a job waits for the warming worker before starting a cold one (seconds)
+WARMUP_WAIT = 120
+
+# Live frames in flight between a worker and the API process
+RING_SLOTS = 4
+
+# Slot size per frame pixel; JPEGs at quality 80 are far below 1 byte/pixel
+RING_BYTES_PER_PIXEL = 1
+
+# How often workers report status and the API side checks for stop/budget changes (seconds)
+STATUS_INTERVAL = 0.25
+
+# Grace period for a stopped worker before it is terminated (seconds)
+STOP_TIMEOUT = 10
+
+# Workers import torch/CUDA: never fork the API process
+_context = multiprocessing.get_context('spawn')
+
+
+class FrameRing:
+    """
+    Single-producer/single-consumer ring of variable-size frames in shared memory.
+
+    Each slot has a (sequence, length) header followed by the payload. The writer
+    clears the sequence while it fills a slot; the reader checks it before and
+    after copying, so a frame overwritten mid-read is detected and dropped.
+    """
+
+    HEADER_BYTES = 16
+
+    def __init__(self, name=None, slots=RING_SLOTS, slot_bytes=0):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.stride = self.HEADER_BYTES + slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * self.stride)
+        else:
+            # Spawned workers share the API process's resource tracker, which unlinks
+            # the segment if the API process dies without closing it
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self._headers = [
+            np.ndarray(2, dtype=np.int64, buffer=self.shm.buf, offset=i * self.stride)
+            for i in range(slots)
+        ]
+        self._seq = 0
+
+    def write(self, payload):
+        """
+        Returns:
+            (seq, slot), or None if the payload doesn't fit in a slot
+        """
+        size = len(payload)
+        if size > self.slot_bytes:
+            return None
+        self._seq += 1
+        slot = self._seq % self.slots
+        header = self._headers[slot]
+        start = slot * self.stride + self.HEADER_BYTES
+        header[0] = 0
+        self.shm.buf[start:start + size] = payload
+        header[1] = size
+        header[0] = self._seq
+        return self._seq, slot
+
+    def read(self, seq, slot):
+        """Copy a frame out of the ring, or None if it has already been overwritten."""
+        header = self._headers[slot]
+        if header[0] != seq:
+            return None
+        start = slot * self.stride + self.HEADER_BYTES
+        data = bytes(self.shm.buf[start:start + int(header[1])])
+        if header[0] != seq:
+            return None
+        return data
+
+    def close(self):
+        self._headers = []
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class _Channel:
+    """A worker's end of the pipe; sends come from the pipeline and reporter threads."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        with self._lock:
+            try:
+                self.conn.send(message)
+            except (OSError, ValueError):
+                pass  # API process gone or pipe closed
+
+
+class _Control:
+    """Worker side: routes 'stop' to the run it was sent for."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._run_id = None
+        self._last_run_id = 0
+        self._on_stop = None
+        self._stopped = set()  # Stops that arrived before their run started
+
+    def begin(self, run_id, on_stop):
+        with self._lock:
+            self._run_id = self._last_run_id = run_id
+            self._on_stop = on_stop
+            early = run_id in self._stopped
+            self._stopped.discard(run_id)
+        if early:
+            on_stop()
+
+    def end(self):
+        with self._lock:
+            self._run_id = None
+            self._on_stop = None
+
+    def stop(self, run_id=None):
+        """Stop run_id (None: whatever is running)."""
+        with self._lock:
+            on_stop = None
+            if run_id is None or run_id == self._run_id:
+                on_stop = self._on_stop
+            elif run_id > self._last_run_id:
+                self._stopped.add(run_id)
+        if on_stop is not None:
+            on_stop()
+
+
+def _listen(conn, runs, control):
+    """Worker side: apply control messages from the API process until the pipe closes."""
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            # API process gone
+            control.stop()
+            runs.put(None)
+            return
+        if message[0] == 'run':
+            runs.put(message[1:])
+        elif message[0] == 'stop':
+            control.stop(message[1])
+        elif message[0] == 'budget':
+            governor.set_budget(message[1])
+        elif message[0] == 'recording':
+            metrics.set_recording(message[1])
+        elif message[0] == 'exit':
+            runs.put(None)
+            return
+
+
+def _report(channel, kind, task_id, done):
+    """Worker side: send progress and fps to the API process every STATUS_INTERVAL."""
+    while not done.wait(STATUS_INTERVAL):
+        channel.send(('status', _status(kind, task_id)))
+
+
+def _status(kind, task_id):
+    avg_fps = next((a['avgFps'] for a in governor.get_stats()['allocations']
+                    if a['kind'] == kind and a['taskId'] == task_id), 0.0)
+    return {'progress': job_progress.get(task_id), 'fps': metrics.get_pipeline_fps(kind, task_id),
+            'avgFps': avg_fps, 'metrics': metrics.take_deltas()}
+
+
+def _terminated(signum, frame):
+    raise SystemExit(1)
+
+
+def _worker_main(conn, warmup):
+    """Worker process entry point: run jobs and streams sent by the API process until told to exit."""
+    # Ctrl+C reaches the whole process group: let the parent decide when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # terminate() (unresponsive worker, abandoned job): unwind the run so the pipeline's
+    # cleanup stops ffmpeg and drops partial files before the process exits
+    signal.signal(signal.SIGTERM, _terminated)
+    channel = _Channel(conn)
+    runs = queue.Queue()
+    control = _Control()
+    threading.Thread(target=_listen, args=(conn, runs, control), daemon=True).start()
+    if warmup:
+        model_loader.warmup_model()
+        channel.send(('warmup', model_loader.get_warmup_status(), metrics.take_deltas()))
+
+    while True:
+        run = runs.get()
+        if run is None:
+            return
+        run_id, kind, task_id, args = run
+        target = _run_job if kind == 'offline' else _run_live
+        # Each run ends with a final status and 'done' or 'error', after which the
+        # worker sends nothing until its next run
+        done = threading.Event()
+        reporter = threading.Thread(target=_report, args=(channel, kind, task_id, done), daemon=True)
+        reporter.start()
+        try:
+            message = target(control, run_id, channel, task_id, args)
+        finally:
+            control.end()
+            done.set()
+            reporter.join()
+        channel.send(('status', _status(kind, task_id)))
+        channel.send(message)
+
+
+def _run_job(control, run_id, channel, task_id, args):
+    """Run an offline job in a worker process."""
+    from app.services.processor import run_processing_pipeline
+
+    # Offline jobs have no stop control; a job is only stopped by terminating its worker
+    control.begin(run_id, on_stop=lambda: None)
+    try:
+        run_processing_pipeline(task_id, *args)
+        return 'done', None
+    except Exception as e:
+        # The pipeline has already marked the job as failed
+        return 'error', str(e)
+
+
+def _run_live(control, run_id, channel, task_id, args):
+    """Run a live stream in a worker process, passing frames through the ring."""
+    ring_name, slot_bytes, kwargs = args
+    ring = FrameRing(ring_name, RING_SLOTS, slot_bytes)
+    stopped = threading.Event()
+
+    def stop():
+        stopped.set()
+        live_detector.stop_live_stream(task_id)
+
+    control.begin(run_id, on_stop=stop)
+    try:
+        for jpeg_bytes, counts in live_detector.live_detection(task_id=task_id, **kwargs):
+            if stopped.is_set():
+                # Stopped before the stream state existed (e.g. while loading the model)
+                break
+            written = ring.write(jpeg_bytes)
+            if written is None:
+                metrics.frame_dropped('live', 'oversized')
+                continue
+            seq, slot = written
+            channel.send(('frame', seq, slot, counts, live_detector.get_skip_ratio(task_id)))
+        return 'done', None
+    except Exception as e:
+        print(f"Live worker error for {task_id}: {e}")
+        return 'error', str(e)
+    finally:
+        ring.close()
+
+
+class _Process:
+    """API side of a worker process: the process and the API's end of its pipe."""
+
+    def __init__(self, warmup=False):
+        self.conn, child_conn = _context.Pipe()
+        self.process = _context.Process(target=_worker_main, args=(child_conn, warmup), daemon=True,
+                                        name='locus-detection-worker')
+        self.process.start()
+        child_conn.close()
+
+    def send(self, message):
+        try:
+            self.conn.send(message)
+        except (OSError, ValueError):
+            pass
+
+    def exit(self):
+        """Ask an idle worker to exit."""
+        self.send(('exit',))
+        self.conn.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+
+class _Pool:
+    """Idle worker processes, and the warmup of the first one."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._idle = []
+        self._starting = 0
+        self._closed = False
+        self._warmup = {'state': 'pending', 'model': None, 'error': None, 'seconds': None}
+
+    def prestart(self):
+        """Start a worker that warms up the default model, in the background."""
+        with self._cond:
+            self._starting += 1
+            self._warmup.update(state='warming', model=model_loader.WARMUP_MODEL)
+        threading.Thread(target=self._start_warm, name='worker-warmup', daemon=True).start()
+
+    def _start_warm(self):
+        start = time.perf_counter()
+        process = _Process(warmup=True)
+        status = None
+        try:
+            while status is None and (process.process.is_alive() or process.conn.poll()):
+                if process.conn.poll(STATUS_INTERVAL):
+                    message = process.conn.recv()
+                    if message[0] == 'warmup':
+                        status = message[1]
+                        metrics.merge_deltas(message[2])
+        except (EOFError, OSError):
+            pass
+        seconds = round(time.perf_counter() - start, 2)
+        with self._cond:
+            self._starting -= 1
+            if status is None:
+                print("Detection worker exited during warmup")
+                self._warmup.update(state='failed', error='Detection worker exited during warmup', seconds=seconds)
+            else:
+                print(f"Detection worker started and warmed up in {seconds}s")
+                # Includes the process start and imports, not only the model warmup
+                self._warmup.update(status, seconds=seconds)
+                self._idle.append(process)
+            self._cond.notify_all()
+        if status is None:
+            process.kill()
+
+    def acquire(self):
+        """An idle worker (waiting up to WARMUP_WAIT for one that is warming up), or a new one."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._idle or not self._starting, timeout=WARMUP_WAIT)
+            while self._idle:
+                process = self._idle.pop()
+                if process.process.is_alive():
+                    return process
+                process.kill()
+        return _Process()
+
+    def release(self, process):
+        """Keep a worker that finished its run for the next one (up to IDLE_WORKERS)."""
+        with self._cond:
+            if not self._closed and len(self._idle) < IDLE_WORKERS:
+                self._idle.append(process)
+                self._cond.notify_all()
+                return
+        process.exit()
+
+    def warmup_status(self):
+        with self._cond:
+            return dict(self._warmup)
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for process in idle:
+            process.exit()
+
+
+_pool = _Pool()
+_run_ids = itertools.count(1)
+
+
+def start_warmup():
+    """Warm up the default model in the background: in the API process, or in the first worker process."""
+    if DETECTION_WORKERS != 'process':
+        model_loader.start_warmup()
+        return
+    _pool.prestart()
+
+
+def get_warmup_status():
+    """
+    Returns:
+        dict with state ('pending', 'warming', 'ready' or 'failed'), model, error and seconds
+    """
+    if DETECTION_WORKERS != 'process':
+        return model_loader.get_warmup_status()
+    return _pool.warmup_status()
+
+
+def shutdown():
+    """Let idle worker processes exit."""
+    _pool.shutdown()
+
+
+class _Worker:
+    """API side of one job or stream running in a pooled worker process: its messages, thread budget and shutdown."""
+
+    def __init__(self, kind, task_id, args):
+        self.kind = kind
+        self.task_id = task_id
+        self.run_id = next(_run_ids)
+        self.process = _pool.acquire()
+        self.process.send(('run', self.run_id, kind, task_id, args))
+        self.allocation = governor.acquire(kind, task_id, apply=False)
+        self.finished = False
+        self._budget_version = None
+        self._recording = None
+
+    @property
+    def exitcode(self):
+        return self.process.process.exitcode
+
+    def messages(self, should_stop=None):
+        """
+        Yield messages from the worker until its run finishes or the worker exits.
+        Sends budget and metrics recording changes (and 'stop' once should_stop() is
+        true) while waiting, and merges the metrics the worker reports.
+        """
+        stopping = False
+        while True:
+            if self.allocation.version != self._budget_version:
+                self._budget_version = self.allocation.version
+                self.process.send(('budget', self.allocation.threads))
+            if metrics.is_recording() != self._recording:
+                self._recording = metrics.is_recording()
+                self.process.send(('recording', self._recording))
+            if not stopping and should_stop is not None and should_stop():
+                stopping = True
+                self.process.send(('stop', self.run_id))
+            message = self._receive(STATUS_INTERVAL)
+            if message is None:
+                if not self.process.process.is_alive():
+                    return
+                continue
+            if message is False:
+                return
+            yield message
+            if self.finished:
+                return
+
+    def _receive(self, timeout):
+        """The next message (None on timeout, False if the pipe closed)."""
+        try:
+            if not self.process.conn.poll(timeout):
+                return None
+            message = self.process.conn.recv()
+        except (EOFError, OSError):
+            return False
+        if message[0] == 'status':
+            self.allocation.avg_fps = message[1]['avgFps']
+            metrics.merge_deltas(message[1]['metrics'])
+        elif message[0] in ('done', 'error'):
+            self.finished = True
+        return message
+
+    def close(self, terminate=False):
+        """
+        Stop the run if it is still going (terminating the worker after STOP_TIMEOUT,
+        or right away with terminate=True), return the worker to the pool and release
+        its budget.
+        """
+        if not self.finished and not terminate and self.process.process.is_alive():
+            self.process.send(('stop', self.run_id))
+            deadline = time.monotonic() + STOP_TIMEOUT
+            while not self.finished:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._receive(remaining) is False:
+                    break
+        if self.finished:
+            _pool.release(self.process)
+        else:
+            if self.process.process.is_alive() and not terminate:
+                print(f"Terminating unresponsive {self.kind} worker for {self.task_id}")
+            self.process.kill()
+        governor.release(self.allocation)
+
+
+def run_job(task_id, *args, should_stop=None):
+    """
+    Run an offline job (arguments of run_processing_pipeline) and wait for it.
+    Runs in a worker process unless DETECTION_WORKERS is 'thread'.
+
+    Offline pipelines have no stop control: once should_stop() returns true the
+    worker is terminated and the job abandoned as it is, without updating it
+    (someone else owns it now). should_stop is ignored in thread mode.
+
+    Returns:
+        False if the job was abandoned, else True
+    """
+    if DETECTION_WORKERS != 'process':
+        from app.services.processor import run_processing_pipeline
+
+        run_processing_pipeline(task_id, *args)
+        return True
+
+    job_progress.start(task_id)
+    metrics.pipeline_started('offline', task_id)
+    worker = None
+    finished = False
+    abandoned = False
+    try:
+        worker = _Worker('offline', task_id, args)
+        for message in worker.messages():
+            if message[0] == 'status':
+                snapshot = message[1]['progress']
+                job_progress.apply(task_id, snapshot)
+                if snapshot:
+                    metrics.pipeline_report('offline', task_id, snapshot['frames'], message[1]['fps'])
+            if not worker.finished and should_stop is not None and should_stop():
+                abandoned = True
+                break
+        finished = worker.finished
+    finally:
+        metrics.pipeline_finished('offline', task_id)
+        if worker is not None:
+            worker.close(terminate=abandoned)
+
+    if abandoned:
+        print(f"Job {task_id}: abandoned, detection worker terminated")
+        job_progress.finish(task_id, status='error', error='Abandoned')
+        return False
+
+    if not finished:
+        exitcode = worker.exitcode if worker is not None else None
+        error = f"Detection worker exited unexpectedly (exit code {exitcode})"
+        print(f"Job {task_id}: {error}")
+        job_progress.finish(task_id, status='error', error=error)
+        update_job(task_id, status='error', finished_at=time.time())
+    return True
+
+
+def live_frames(task_id, **kwargs):
+    """
+    Generator yielding (jpeg_bytes, counts) for a live stream (arguments of live_detection).
+    Runs the pipeline in a worker process unless DETECTION_WORKERS is 'thread'; closing
+    the generator (or stop_live_stream) stops the stream and frees its worker.
+    """
+    if DETECTION_WORKERS != 'process':
+        yield from live_detector.live_detection(task_id=task_id, **kwargs)
+        return
+
+    width, height = kwargs['frame_size']
+    ring = FrameRing(slots=RING_SLOTS, slot_bytes=max(width * height * RING_BYTES_PER_PIXEL, 1 << 16))
+    live_detector.open_stream(task_id)
+    metrics.pipeline_started('live', task_id)
+    worker = None
+    try:
+        worker = _Worker('live', task_id, (ring.name, ring.slot_bytes, kwargs))
+        for message in worker.messages(should_stop=lambda: not live_detector.is_stream_running(task_id)):
+            if message[0] != 'frame':
+                continue
+            _, seq, slot, counts, skip_ratio = message
+            jpeg_bytes = ring.read(seq, slot)
+            if jpeg_bytes is None:
+                metrics.frame_dropped('live', 'overwritten')
+                continue
+            if not live_detector.record_counts(task_id, counts, skip_ratio):
+                break
+            metrics.pipeline_frame('live', task_id)
+            yield jpeg_bytes, counts
+    finally:
+        if worker is not None:
+            worker.close()
+        ring.close()
+        metrics.pipeline_finished('live', task_id)
+        live_detector.close_stream(task_id)
@@ -0,0 +1,140 @@
+"""
+Locus processing worker - leases offline jobs from the shared queue.
+
+Usage (from the backend directory, sharing uploads/, weights/ and instance/
+with the API nodes):
+
+    python -m app.worker [--id NAME] [--concurrency N]
+
+Each leased job runs in a detection worker process (app.services.workers);
+this process renews the lease and mirrors progress into the database while
+it runs. On SIGTERM/SIGINT the worker stops leasing and finishes the jobs it
+holds; if it is killed instead, its leases expire and the jobs are requeued.
+A worker that finds it has lost a lease (e.g. it stalled for longer than the
+lease) terminates that job's detection worker and leaves the job alone.
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+
+from app.services import job_queue
+from app.services import progress as job_progress
+from app.services.db import PIPELINE_COLUMNS, get_job_fields, get_job_progress, init_db, update_job
+from app.services import workers
+
+# How often an idle worker asks for a job (seconds)
+POLL_INTERVAL = 2.0
+
+# How often a lease is renewed and progress written to the database (seconds)
+HEARTBEAT_INTERVAL = 10.0
+
+
+def _heartbeat(broker, task_id, worker_id, finished, lost):
+    """Renew the lease and checkpoint progress until the job finishes or the lease is lost."""
+    last_progress = None
+    while not finished.wait(HEARTBEAT_INTERVAL):
+        if not broker.heartbeat(task_id, worker_id):
+            # The lease expired and the job may already run on another worker
+            print(f"Worker {worker_id} lost the lease on job {task_id}, abandoning it")
+            lost.set()
+            return
+        snapshot = job_progress.get(task_id)
+        if snapshot and snapshot['status'] == 'processing' and snapshot['progress'] != last_progress:
+            last_progress = snapshot['progress']
+            update_job(task_id, progress=last_progress)
+
+
+def process_leased_job(broker, task_id, payload, worker_id):
+    """Run one leased job to completion and report the outcome to the broker."""
+    job = get_job_fields(task_id, PIPELINE_COLUMNS)
+    if not job:
+        broker.complete(task_id, worker_id, error='Job not found')
+        return
+
+    finished = threading.Event()
+    lost = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(broker, task_id, worker_id, finished, lost), daemon=True)
+    heartbeat.start()
+    error = None
+    try:
+        update_job(task_id, status='processing')
+        completed = workers.run_job(task_id, job.to_dict(), payload['zones'], payload['confidence'], payload['model'],
+                                    payload.get('tracker_config'), payload.get('motion_gate_config'),
+                                    payload.get('roi_config'), payload.get('render_video', True),
+                                    payload.get('preview', False), payload.get('time_ranges'),
+                                    should_stop=lost.is_set)
+        if not completed:
+            return  # Lease lost: the job belongs to whichever worker leased it next
+        status = (get_job_progress(task_id) or {}).get('status')
+        if status == 'error':
+            error = (job_progress.get(task_id) or {}).get('error') or 'Processing failed'
+    except Exception as e:
+        error = str(e)
+        print(f"Job {task_id} failed on worker {worker_id}: {e}")
+    finally:
+        finished.set()
+        heartbeat.join()
+    broker.complete(task_id, worker_id, error=error)
+
+
+def run_worker(worker_id, concurrency=1, broker_name=None):
+    """Lease and process jobs until SIGTERM/SIGINT."""
+    broker = job_queue.get_broker(broker_name)
+    stopping = threading.Event()
+    slots = threading.Semaphore(concurrency)
+    running = []
+
+    def request_stop(signum, frame):
+        print(f"Worker {worker_id} stopping after its current jobs")
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    def run(task_id, payload):
+        try:
+            process_leased_job(broker, task_id, payload, worker_id)
+        finally:
+            slots.release()
+
+    print(f"Worker {worker_id} started ({concurrency} concurrent jobs, broker {broker_name or job_queue.BROKER})")
+    # Warm the first detection worker process while waiting for jobs
+    workers.start_warmup()
+    while not stopping.is_set():
+        if not slots.acquire(timeout=POLL_INTERVAL):
+            continue
+        leased = broker.lease(worker_id)
+        if leased is None:
+            slots.release()
+            stopping.wait(POLL_INTERVAL)
+            continue
+        task_id, payload, attempt = leased
+        print(f"Worker {worker_id} leased job {task_id} (attempt {attempt})")
+        thread = threading.Thread(target=run, args=(task_id, payload), name=f'job-{task_id}')
+        thread.start()
+        running.append(thread)
+        running = [t for t in running if t.is_alive()]
+
+    for thread in running:
+        thread.join()
+    workers.shutdown()
+    print(f"Worker {worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Locus processing worker')
+    parser.add_argument('--id', default=f'{socket.gethostname()}-{os.getpid()}', help='Worker name shown in queue stats')
+    parser.add_argument('--concurrency', type=int, default=1, help='Jobs processed at the same time')
+    parser.add_argument('--broker', default=None, help=f'Job broker (default: {job_queue.BROKER})')
+    args = parser.parse_args()
+
+    init_db()
+    for path in ('uploads/outputs', 'weights', 'instance'):
+        os.makedirs(path, exist_ok=True)
+    run_worker(args.id, max(1, args.concurrency), args.broker)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+"""
+Model-free pipeline benchmarks.
+
+Synthetic videos with scripted objects are run through the real offline and
+live pipelines with a stub model in place of YOLO, so throughput can be compared
+between commits without weights or a GPU.
+"""
@@ -0,0 +1,154 @@
+"""
+Benchmark job reads from the jobs database.
+
+Creates a job with a large analytics payload (100k detection events by default,
+plus dwell events and a heatmap) in a temporary database and times the
+accessors the hot paths use (progress, zones, WebSocket handshake, pipeline
+start) against a full get_job() decode, and compares the binary analytics
+blob format (app/services/blob_codec.py) with the JSON text it replaced: size,
+encode and decode time per column.
+
+Usage (from backend/):
+    python -m benchmarks.db_bench
+    python -m benchmarks.db_bench --events 100000 --repeat 50 --out db_bench.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+from app.services import blob_codec, db
+
+# Column sets read by the hot paths (see app/api/routes)
+READS = {
+    'progress': ('progress', 'status'),
+    'zones': ('zones',),
+    'exists': ('id',),
+    'ws_handshake': ('source_type', 'stream_url', 'zones', 'frame_width', 'frame_height', 'confidence',
+                     'model', 'tracker_config', 'motion_gate', 'roi_config'),
+    'pipeline': db.PIPELINE_COLUMNS,
+}
+
+
+def make_job(events, zones=4, seed=0):
+    """Insert a completed job with `events` detection events; returns its ID."""
+    rng = random.Random(seed)
+    zone_ids = [f'zone_{i}' for i in range(zones)]
+    detection_data = []
+    counts = dict.fromkeys(zone_ids, 0)
+    for i in range(events):
+        zone_id = rng.choice(zone_ids)
+        counts[zone_id] += 1
+        detection_data.append({
+            'time': round(i * 0.25, 2),
+            'zone_id': zone_id,
+            'class_id': 0,
+            'class_counts': {0: counts[zone_id]},
+            'count': counts[zone_id],
+        })
+    dwell_data = [
+        {'zone_id': rng.choice(zone_ids), 'track_id': i, 'entry_time': i * 0.5, 'exit_time': i * 0.5 + 3.0,
+         'duration': 3.0}
+        for i in range(events // 4)
+    ]
+    task_id = str(uuid.uuid4())
+    db.create_job(task_id, 'bench.mp4', 'uploads/videos/bench.mp4')
+    db.update_job(
+        task_id,
+        status='completed',
+        progress=100,
+        zones=[{'id': z, 'points': [{'x': 0, 'y': 0}, {'x': 10, 'y': 0}, {'x': 10, 'y': 10}],
+                'classIds': [0], 'color': [255, 0, 0], 'label': z} for z in zone_ids],
+        detection_data=detection_data,
+        dwell_data=dwell_data,
+        line_crossing_data={},
+        heatmap_data=[[rng.random() for _ in range(50)] for _ in range(50)],
+        frame_width=1920,
+        frame_height=1080,
+    )
+    return task_id
+
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': round(statistics.median(samples), 3), 'min_ms': round(min(samples), 3)}
+
+
+def compare_formats(task_id, repeat):
+    """Size and encode/decode time of each analytics column as JSON text and as a binary blob."""
+    job = db.get_job(task_id)
+    results = {}
+    for column in db.BLOB_COLUMNS:
+        value = job[column]
+        text, blob = json.dumps(value), blob_codec.encode(value)
+        results[column] = {
+            'json_bytes': len(text),
+            'binary_bytes': len(blob),
+            'json_encode_ms': _time(lambda: json.dumps(value), repeat)['median_ms'],
+            'binary_encode_ms': _time(lambda: blob_codec.encode(value), repeat)['median_ms'],
+            'json_decode_ms': _time(lambda: json.loads(text), repeat)['median_ms'],
+            'binary_decode_ms': _time(lambda: blob_codec.decode(blob), repeat)['median_ms'],
+        }
+    return results
+
+
+def run(task_id, repeat):
+    results = {'full_get_job': _time(lambda: db.get_job(task_id), repeat)}
+    for name, columns in READS.items():
+        def read(columns=columns):
+            job = db.get_job_fields(task_id, columns)
+            for column in columns:
+                job[column]
+        results[name] = _time(read, repeat)
+    # The details endpoint selects every column but only decodes what it returns
+    results['lazy_all_columns_status_only'] = _time(lambda: db.get_job_fields(task_id)['status'], repeat)
+    full = results['full_get_job']['median_ms']
+    for name, result in results.items():
+        result['speedup'] = round(full / result['median_ms'], 1) if result['median_ms'] else None
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job database read benchmark")
+    parser.add_argument('--events', type=int, default=100_000, help="Detection events stored on the job")
+    parser.add_argument('--repeat', type=int, default=30, help="Timed reads per accessor")
+    parser.add_argument('--out', help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'bench.db')
+        db.init_db()
+        task_id = make_job(args.events)
+        results = run(task_id, args.repeat)
+        formats = compare_formats(task_id, args.repeat)
+        size = os.path.getsize(db.DB_PATH)
+
+    print(f"Job with {args.events} detection events ({size / 1e6:.1f} MB database)")
+    print(f"{'read':<30}{'median ms':>12}{'min ms':>10}{'speedup':>10}")
+    for name, result in results.items():
+        print(f"{name:<30}{result['median_ms']:>12.3f}{result['min_ms']:>10.3f}{result['speedup']:>9}x")
+
+    print()
+    print(f"{'column':<20}{'JSON KB':>10}{'binary KB':>11}{'ratio':>8}"
+          f"{'encode ms':>16}{'decode ms':>16}   (JSON / binary)")
+    for column, r in formats.items():
+        print(f"{column:<20}{r['json_bytes'] / 1e3:>10.1f}{r['binary_bytes'] / 1e3:>11.1f}"
+              f"{r['binary_bytes'] / r['json_bytes']:>8.1%}"
+              f"{r['json_encode_ms']:>8.1f} / {r['binary_encode_ms']:<5.1f}{r['json_decode_ms']:>8.1f} / "
+              f"{r['binary_decode_ms']:<5.1f}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'events': args.events, 'repeat': args.repeat, 'results': results, 'formats': formats},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
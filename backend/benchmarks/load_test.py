@@ -0,0 +1,731 @@
+"""
+Load test: concurrent live viewers, uploads and processing jobs on one node.
+
+Starts the API with the stub model (see benchmarks/stub_server.py) in a scratch
+directory, or targets a running server with --url, and for --duration seconds
+runs all of these at once:
+
+- N live viewers: one camera job per viewer whose stream URL is a local video
+  file, watched over /ws/live/{id}. Records frame delivery latency (from the
+  "ts" the server stamps on each frame), fps and the longest gap between frames.
+  The WebSocket endpoint runs a detection worker per connection, so every
+  viewer gets its own stream.
+- M uploaders, each uploading a video to POST /api/jobs back to back.
+- K processing jobs, uploaded beforehand, started together and polled until
+  they finish.
+- API clients polling /health, the job list, job details, progress and live
+  counts, for p50/p95/p99 latency per endpoint.
+
+CPU and RSS of the server (the API process plus its detection workers) are
+sampled with psutil, and the event loop lag from /health is included. Sources
+are synthetic videos (or --video files); everything runs locally with the
+standard library, including a minimal WebSocket client, so no external
+services or extra packages are needed. Jobs and streams the test creates are
+deleted at the end.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --viewers 4 --uploads 2 --jobs 2 --duration 30 --out load.json
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --server-pid 1234 --video clip.mp4 --viewers 8
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import http.client
+import json
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import cv2
+import psutil
+
+from benchmarks.synthetic import make_script, make_zones, write_video
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Synthetic source video (also the script the stub server replays)
+VIDEO_WIDTH = 640
+VIDEO_HEIGHT = 360
+VIDEO_FPS = 24
+VIDEO_OBJECTS = 10
+VIDEO_ZONES = 4
+
+# How long a started server gets to become ready (seconds)
+SERVER_START_TIMEOUT = 120
+
+# Pause between requests of one API client, and between progress polls of a job (seconds)
+API_INTERVAL = 0.05
+JOB_POLL_INTERVAL = 0.5
+
+# Server CPU/RSS sampling interval (seconds)
+SAMPLE_INTERVAL = 0.5
+
+# Timeout for a single HTTP request or WebSocket handshake (seconds)
+REQUEST_TIMEOUT = 60
+
+# Magic value from RFC 6455 for the Sec-WebSocket-Accept check
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def percentiles(samples):
+    """count, p50, p95, p99 and max of a list of millisecond samples (None if empty)."""
+    if not samples:
+        return None
+    data = sorted(samples)
+
+    def pick(q):
+        return round(data[min(len(data) - 1, int(q * len(data)))], 1)
+
+    return {'count': len(data), 'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'max': round(data[-1], 1)}
+
+
+class LatencyLog:
+    """API latencies (ms) and errors per endpoint."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def add(self, endpoint, seconds, ok=True):
+        self.samples.setdefault(endpoint, []).append(seconds * 1000)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def error(self, endpoint):
+        self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self):
+        endpoints = sorted(set(self.samples) | set(self.errors))
+        report = {e: {**(percentiles(self.samples.get(e)) or {'count': 0}), 'errors': self.errors.get(e, 0)}
+                  for e in endpoints}
+        everything = [s for samples in self.samples.values() for s in samples]
+        report['all'] = {**(percentiles(everything) or {'count': 0}), 'errors': sum(self.errors.values())}
+        return report
+
+
+class HttpClient:
+    """One simulated client's keep-alive connection. Blocking: call it through asyncio.to_thread."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Returns:
+            (status, body bytes, seconds)
+        """
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=REQUEST_TIMEOUT)
+            start = time.perf_counter()
+            try:
+                self.conn.request(method, path, body=body, headers=headers or {})
+                response = self.conn.getresponse()
+                data = response.read()
+                return response.status, data, time.perf_counter() - start
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # The server closed an idle keep-alive connection
+                self.close()
+                if attempt:
+                    raise
+            except Exception:
+                self.close()
+                raise
+
+    def json(self, method, path, payload=None):
+        """Send an optional JSON body; returns (status, decoded body or None, seconds)."""
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        status, data, seconds = self.request(method, path, body, headers)
+        try:
+            decoded = json.loads(data) if data else None
+        except ValueError:
+            decoded = None
+        return status, decoded, seconds
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class WebSocketClient:
+    """Minimal RFC 6455 client: text/binary messages, ping/pong and close (enough for /ws/live)."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, url, timeout=REQUEST_TIMEOUT):
+        """
+        Raises:
+            ConnectionError: If the server doesn't accept the upgrade
+        """
+        parts = urlsplit(url)
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(parts.hostname, parts.port or 80), timeout)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((
+            f"GET {parts.path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode())
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+        status_line, *lines = head.decode('latin-1').split('\r\n')
+        status = int(status_line.split()[1])
+        headers = {name.strip().lower(): value.strip() for name, _, value in (l.partition(':') for l in lines if l)}
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        if status != 101 or headers.get('sec-websocket-accept') != accept:
+            writer.close()
+            raise ConnectionError(f"WebSocket handshake failed: HTTP {status}")
+        return cls(reader, writer)
+
+    async def recv(self):
+        """Next message (str for text, bytes for binary), or None once the server closes."""
+        parts, opcode = [], None
+        while True:
+            head = await self.reader.readexactly(2)
+            fin, frame_opcode = head[0] & 0x80, head[0] & 0x0F
+            length = head[1] & 0x7F
+            if head[1] & 0x80:
+                raise ConnectionError("Server sent a masked frame")
+            if length == 126:
+                (length,) = struct.unpack('!H', await self.reader.readexactly(2))
+            elif length == 127:
+                (length,) = struct.unpack('!Q', await self.reader.readexactly(8))
+            payload = await self.reader.readexactly(length)
+
+            if frame_opcode == 0x8:
+                await self._send(0x8, payload[:2])
+                return None
+            if frame_opcode == 0x9:
+                await self._send(0xA, payload)
+                continue
+            if frame_opcode == 0xA:
+                continue
+            if frame_opcode != 0x0:
+                opcode = frame_opcode
+            parts.append(payload)
+            if fin:
+                data = b''.join(parts)
+                return data.decode() if opcode == 0x1 else data
+
+    async def _send(self, opcode, payload=b''):
+        # Client frames must be masked
+        mask = os.urandom(4)
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, 0x80 | length)
+        elif length < 1 << 16:
+            header = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, length)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.writer.write(header + mask + masked)
+        await self.writer.drain()
+
+    async def close(self):
+        try:
+            await self._send(0x8, struct.pack('!H', 1000))
+        except (ConnectionError, RuntimeError):
+            pass
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, RuntimeError):
+            pass
+
+
+class ResourceSampler:
+    """CPU and RSS of a server process and its children (detection workers)."""
+
+    def __init__(self, pid):
+        self.process = psutil.Process(pid)
+        self._tracked = {}  # cpu_percent() measures since the previous call on the same object
+        self.samples = []
+
+    def sample(self):
+        try:
+            processes = [self.process] + self.process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return
+        cpu, rss, api_cpu = 0.0, 0, 0.0
+        for process in processes:
+            tracked = self._tracked.setdefault(process.pid, process)
+            try:
+                process_cpu = tracked.cpu_percent(None)
+                rss += tracked.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            cpu += process_cpu
+            if process.pid == self.process.pid:
+                api_cpu = process_cpu
+        self.samples.append({
+            't': round(time.time(), 2),
+            'cpu_percent': round(cpu, 1),
+            'api_cpu_percent': round(api_cpu, 1),
+            'rss_mb': round(rss / 1e6, 1),
+            'processes': len(processes),
+        })
+
+    def report(self):
+        if not self.samples:
+            return None
+
+        def summary(key):
+            values = [s[key] for s in self.samples]
+            return {'mean': round(sum(values) / len(values), 1), 'max': max(values)}
+
+        return {
+            'cpu_percent': summary('cpu_percent'),
+            'api_cpu_percent': summary('api_cpu_percent'),
+            'rss_mb': summary('rss_mb'),
+            'max_processes': max(s['processes'] for s in self.samples),
+            'cores': psutil.cpu_count(),
+            'samples': self.samples,
+        }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workdir, script_spec):
+    """Start benchmarks.stub_server in workdir; returns (process, base URL, log path)."""
+    port = _free_port()
+    log_path = os.path.join(workdir, 'server.log')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get('PYTHONPATH')])))
+    if script_spec:
+        env['LOCUS_STUB_SCRIPT'] = script_spec
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen([sys.executable, '-m', 'benchmarks.stub_server', '--port', str(port)],
+                                   cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, f'http://127.0.0.1:{port}', log_path
+
+
+def wait_ready(base_url, process=None, timeout=SERVER_START_TIMEOUT):
+    client = HttpClient(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            status, _, _ = client.request('GET', '/health/ready')
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server not ready after {timeout}s")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def make_videos(workdir, seconds, seed):
+    """Render the synthetic source video; returns ([path], stub script spec)."""
+    frames = int(seconds * VIDEO_FPS)
+    script = make_script(VIDEO_WIDTH, VIDEO_HEIGHT, frames, VIDEO_OBJECTS, seed=seed)
+    path = os.path.join(workdir, 'load-source.mp4')
+    write_video(path, script, VIDEO_WIDTH, VIDEO_HEIGHT, fps=VIDEO_FPS)
+    return [path], f'{VIDEO_WIDTH},{VIDEO_HEIGHT},{frames},{VIDEO_OBJECTS},{seed}'
+
+
+def _video_size(path):
+    cap = cv2.VideoCapture(path)
+    try:
+        width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+    if not width or not height:
+        raise ValueError(f"Could not read video: {path}")
+    return width, height
+
+
+def _multipart(path):
+    """multipart/form-data body for POST /api/jobs; returns (body, headers)."""
+    boundary = f'locus-load-{os.urandom(8).hex()}'
+    with open(path, 'rb') as f:
+        data = f.read()
+    body = b''.join([
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+        f'filename="{os.path.basename(path)}"\r\nContent-Type: video/mp4\r\n\r\n'.encode(),
+        data,
+        f'\r\n--{boundary}--\r\n'.encode(),
+    ])
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+class LoadTest:
+    """One run: setup, the measured window and cleanup against a server at base_url."""
+
+    def __init__(self, base_url, videos, args):
+        self.base_url = base_url
+        self.videos = videos
+        self.args = args
+        self.latency = LatencyLog()
+        self.uploads = []  # {'ms', 'bytes', 'ok'}
+        self.viewers = []
+        self.jobs = []
+        self.created = []  # Job ids to delete afterwards
+        self.live = []  # (camera job id, video)
+        self.job_ids = []  # (uploaded job id, video)
+        self.bodies = {path: _multipart(path) for path in videos}
+        self.payloads = {}
+        for path in videos:
+            width, height = _video_size(path)
+            self.payloads[path] = {'zones': make_zones(width, height, VIDEO_ZONES), 'renderVideo': args.render}
+
+    async def call(self, client, endpoint, method, path, payload=None, expect=200):
+        """JSON request through client, recorded under endpoint; returns the decoded body or None."""
+        try:
+            status, body, seconds = await asyncio.to_thread(client.json, method, path, payload)
+        except OSError:
+            self.latency.error(endpoint)
+            return None
+        self.latency.add(endpoint, seconds, ok=status == expect)
+        return body if status == expect else None
+
+    async def upload(self, client, path):
+        body, headers = self.bodies[path]
+        try:
+            status, data, seconds = await asyncio.to_thread(client.request, 'POST', '/api/jobs', body, headers)
+        except OSError:
+            self.latency.error('POST /api/jobs')
+            self.uploads.append({'ms': None, 'bytes': len(body), 'ok': False})
+            return None
+        ok = status == 200
+        self.latency.add('POST /api/jobs', seconds, ok)
+        self.uploads.append({'ms': round(seconds * 1000, 1), 'bytes': len(body), 'ok': ok})
+        if not ok:
+            return None
+        task_id = json.loads(data)['taskId']
+        self.created.append(task_id)
+        return task_id
+
+    def _video(self, i):
+        return self.videos[i % len(self.videos)]
+
+    async def setup(self):
+        """Create the camera jobs and upload the jobs to process (not part of the measurements)."""
+        client = HttpClient(self.base_url)
+        for i in range(self.args.viewers):
+            path = self._video(i)
+            body = await self.call(client, 'POST /api/camera', 'POST', '/api/camera',
+                                   {'stream_url': os.path.abspath(path), 'source_type': 'rtsp'})
+            if body is None:
+                raise RuntimeError("Could not create a camera job")
+            self.created.append(body['taskId'])
+            await self.call(client, 'POST /api/jobs/{id}/process', 'POST',
+                            f"/api/jobs/{body['taskId']}/process", self.payloads[path])
+            self.live.append((body['taskId'], path))
+
+        # At least one uploaded job, so the API clients have job details to read
+        for i in range(max(1, self.args.jobs)):
+            task_id = await self.upload(client, self._video(i))
+            if task_id is None:
+                raise RuntimeError("Could not upload a video")
+            self.job_ids.append((task_id, self._video(i)))
+        self.uploads.clear()
+        self.latency = LatencyLog()
+        client.close()
+
+    async def viewer(self, task_id, deadline):
+        stats = {'taskId': task_id, 'frames': 0, 'bytes': 0, 'error': None}
+        latencies, gaps = [], []
+        start = time.perf_counter()
+        ws = None
+        try:
+            url = self.base_url.replace('http', 'ws', 1) + f'/ws/live/{task_id}'
+            ws = await WebSocketClient.connect(url)
+            stats['connect_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            first = last = None
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    message = await asyncio.wait_for(ws.recv(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if message is None:
+                    stats['error'] = "Closed by the server"
+                    break
+                received = time.time()
+                data = json.loads(message)
+                if data.get('error'):
+                    stats['error'] = data['error']
+                    break
+                if data.get('type') != 'frame':
+                    continue
+                now = time.perf_counter()
+                if first is None:
+                    first = now
+                    stats['first_frame_ms'] = round((now - start) * 1000, 1)
+                else:
+                    gaps.append((now - last) * 1000)
+                last = now
+                stats['frames'] += 1
+                stats['bytes'] += len(message)
+                if 'ts' in data:
+                    latencies.append((received - data['ts']) * 1000)
+            if first is not None and last > first:
+                stats['fps'] = round((stats['frames'] - 1) / (last - first), 2)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            stats['error'] = str(e) or type(e).__name__
+        finally:
+            if ws is not None:
+                await ws.close()
+        stats['latency_ms'] = percentiles(latencies)
+        stats['max_gap_ms'] = round(max(gaps), 1) if gaps else None
+        stats['_latencies'] = latencies
+        self.viewers.append(stats)
+
+    async def uploader(self, index, deadline):
+        client = HttpClient(self.base_url)
+        i = index
+        while time.monotonic() < deadline:
+            await self.upload(client, self._video(i))
+            i += 1
+        client.close()
+
+    async def job(self, task_id, path, deadline):
+        client = HttpClient(self.base_url)
+        stats = {'taskId': task_id, 'status': None, 'progress': 0, 'fps': None}
+        started = time.perf_counter()
+        body = await self.call(client, 'POST /api/jobs/{id}/process', 'POST',
+                               f'/api/jobs/{task_id}/process', self.payloads[path])
+        if body is None:
+            stats['status'] = 'not started'
+        while body is not None and time.monotonic() < deadline:
+            progress = await self.call(client, 'GET /api/jobs/{id}/progress', 'GET', f'/api/jobs/{task_id}/progress')
+            if progress is not None:
+                stats.update(status=progress['status'], progress=progress['progress'])
+                if progress.get('fps'):
+                    stats['fps'] = progress['fps']
+                if progress['status'] in ('completed', 'error'):
+                    stats['seconds'] = round(time.perf_counter() - started, 2)
+                    break
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+        client.close()
+        self.jobs.append(stats)
+
+    async def api_client(self, index, deadline):
+        task_id = self.job_ids[index % len(self.job_ids)][0]
+        targets = [
+            ('GET /health', '/health'),
+            ('GET /api/jobs', '/api/jobs'),
+            ('GET /api/jobs/{id}', f'/api/jobs/{task_id}'),
+            ('GET /api/jobs/{id}/progress', f'/api/jobs/{task_id}/progress'),
+        ]
+        if self.live:
+            live_id = self.live[index % len(self.live)][0]
+            targets.append(('GET /api/live/{id}/counts', f'/api/live/{live_id}/counts'))
+        client = HttpClient(self.base_url)
+        i = index
+        while time.monotonic() < deadline:
+            endpoint, path = targets[i % len(targets)]
+            await self.call(client, endpoint, 'GET', path)
+            i += 1
+            await asyncio.sleep(API_INTERVAL)
+        client.close()
+
+    async def sample(self, sampler, deadline):
+        while time.monotonic() < deadline:
+            await asyncio.to_thread(sampler.sample)
+            await asyncio.sleep(SAMPLE_INTERVAL)
+
+    async def run(self, sampler=None):
+        workers = self.args.viewers + self.args.uploads + self.args.jobs + self.args.api_clients + 4
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers))
+
+        await self.setup()
+        started = time.time()
+        deadline = time.monotonic() + self.args.duration
+        tasks = [self.viewer(task_id, deadline) for task_id, _ in self.live]
+        tasks += [self.uploader(i, deadline) for i in range(self.args.uploads)]
+        tasks += [self.job(task_id, path, deadline) for task_id, path in self.job_ids[:self.args.jobs]]
+        tasks += [self.api_client(i, deadline) for i in range(self.args.api_clients)]
+        if sampler is not None:
+            tasks.append(self.sample(sampler, deadline))
+        await asyncio.gather(*tasks)
+        elapsed = time.time() - started
+
+        client = HttpClient(self.base_url)
+        _, health, _ = await asyncio.to_thread(client.json, 'GET', '/health')
+        await self.cleanup(client)
+        client.close()
+        return self.report(elapsed, health or {}, sampler)
+
+    async def cleanup(self, client):
+        requests = [('POST', f'/api/live/{task_id}/stop') for task_id, _ in self.live]
+        requests += [('DELETE', f'/api/jobs/{task_id}') for task_id in self.created]
+        for method, path in requests:
+            try:
+                await asyncio.to_thread(client.request, method, path)
+            except OSError:
+                pass
+
+    def report(self, elapsed, health, sampler):
+        args = self.args
+        viewers = sorted(self.viewers, key=lambda v: v['taskId'])
+        latencies = [s for v in viewers for s in v.pop('_latencies')]
+        fps = [v['fps'] for v in viewers if v.get('fps')]
+        uploaded = [u for u in self.uploads if u['ok']]
+        jobs = self.jobs
+        return {
+            'config': {
+                'viewers': args.viewers, 'uploads': args.uploads, 'jobs': args.jobs,
+                'api_clients': args.api_clients, 'duration_s': args.duration, 'render': args.render,
+                'videos': [os.path.basename(v) for v in self.videos],
+                'server': 'stub' if args.url is None else args.url,
+            },
+            'elapsed_s': round(elapsed, 2),
+            'viewers': {
+                'streaming': len(fps),
+                'errors': [v['error'] for v in viewers if v['error']],
+                'fps': {'mean': round(sum(fps) / len(fps), 2), 'min': min(fps)} if fps else None,
+                'latency_ms': percentiles(latencies),
+                'first_frame_ms': percentiles([v['first_frame_ms'] for v in viewers if 'first_frame_ms' in v]),
+                'max_gap_ms': max((v['max_gap_ms'] for v in viewers if v['max_gap_ms']), default=None),
+                'per_viewer': viewers,
+            },
+            'uploads': {
+                'completed': len(uploaded),
+                'failed': len(self.uploads) - len(uploaded),
+                'latency_ms': percentiles([u['ms'] for u in uploaded]),
+                'mb_per_s': round(sum(u['bytes'] for u in uploaded) / 1e6 / elapsed, 2) if elapsed else None,
+            },
+            'jobs': {
+                'completed': sum(j['status'] == 'completed' for j in jobs),
+                'failed': sum(j['status'] in ('error', 'not started') for j in jobs),
+                'per_job': jobs,
+            },
+            'api': self.latency.report(),
+            'resources': sampler.report() if sampler is not None else None,
+            'loop': health.get('loop'),
+            'pools': health.get('pools'),
+        }
+
+
+def print_report(report):
+    config = report['config']
+    print(f"{config['viewers']} viewers, {config['uploads']} uploaders, {config['jobs']} jobs, "
+          f"{config['api_clients']} API clients for {report['elapsed_s']}s ({config['server']} server)")
+
+    viewers = report['viewers']
+    if config['viewers']:
+        latency, fps = viewers['latency_ms'], viewers['fps']
+        print(f"viewers:   {viewers['streaming']}/{config['viewers']} streaming"
+              + (f", fps mean {fps['mean']} min {fps['min']}" if fps else "")
+              + (f", frame latency p50 {latency['p50']} p95 {latency['p95']} p99 {latency['p99']} ms"
+                 if latency else "")
+              + (f", longest gap {viewers['max_gap_ms']} ms" if viewers['max_gap_ms'] else ""))
+        for error in sorted(set(viewers['errors'])):
+            print(f"           error: {error}")
+        if any('HTTP 404' in error for error in viewers['errors']):
+            print("           (uvicorn serves WebSockets only with the websockets or wsproto package installed)")
+    uploads = report['uploads']
+    if config['uploads']:
+        latency = uploads['latency_ms']
+        print(f"uploads:   {uploads['completed']} done, {uploads['failed']} failed, {uploads['mb_per_s']} MB/s"
+              + (f", p50 {latency['p50']} p95 {latency['p95']} ms" if latency else ""))
+    if config['jobs']:
+        jobs = report['jobs']
+        print(f"jobs:      {jobs['completed']}/{config['jobs']} completed, {jobs['failed']} failed")
+        for job in jobs['per_job']:
+            print(f"           {job['taskId'][:8]} {job['status']} {job['progress']}%"
+                  + (f" in {job['seconds']}s" if 'seconds' in job else "")
+                  + (f" at {job['fps']} fps" if job['fps'] else ""))
+
+    print(f"{'endpoint':<32}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for endpoint, stats in report['api'].items():
+        if not stats['count']:
+            print(f"{endpoint:<32}{0:>9}{stats['errors']:>8}")
+            continue
+        print(f"{endpoint:<32}{stats['count']:>9}{stats['errors']:>8}{stats['p50']:>9.1f}{stats['p95']:>9.1f}"
+              f"{stats['p99']:>9.1f}{stats['max']:>9.1f}")
+
+    resources = report['resources']
+    if resources:
+        print(f"server:    CPU mean {resources['cpu_percent']['mean']}% max {resources['cpu_percent']['max']}% "
+              f"of {resources['cores']} cores (API process max {resources['api_cpu_percent']['max']}%), "
+              f"RSS max {resources['rss_mb']['max']} MB, up to {resources['max_processes']} processes")
+    if report['loop']:
+        print(f"loop:      max lag {report['loop']['maxLagMs']} ms, {report['loop']['stalls']} stalls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent viewers/uploads/jobs load test")
+    parser.add_argument('--viewers', type=int, default=2, help="Live streams, each watched over a WebSocket")
+    parser.add_argument('--uploads', type=int, default=1, help="Clients uploading videos back to back")
+    parser.add_argument('--jobs', type=int, default=1, help="Processing jobs started at the beginning")
+    parser.add_argument('--api-clients', type=int, default=2, help="Clients polling the read endpoints")
+    parser.add_argument('--duration', type=float, default=30, help="Length of the measured window (seconds)")
+    parser.add_argument('--video', action='append',
+                        help="Local video used as stream, upload and job source (repeatable; default: synthetic)")
+    parser.add_argument('--seconds', type=float, default=30, help="Length of the synthetic video")
+    parser.add_argument('--no-render', dest='render', action='store_false',
+                        help="Process jobs with renderVideo off")
+    parser.add_argument('--url', help="Test a running server instead of starting one with the stub model")
+    parser.add_argument('--server-pid', type=int, help="PID of the --url server, for CPU/RSS sampling")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='locus-load-') as workdir:
+        if args.video:
+            videos, script_spec = args.video, None
+        else:
+            print("Rendering the synthetic source video...")
+            videos, script_spec = make_videos(workdir, args.seconds, args.seed)
+
+        process = None
+        if args.url:
+            base_url, pid = args.url.rstrip('/'), args.server_pid
+        else:
+            process, base_url, log_path = start_server(workdir, script_spec)
+            pid = process.pid
+        try:
+            if process is not None:
+                print(f"Starting the stub server at {base_url}...")
+                try:
+                    wait_ready(base_url, process)
+                except RuntimeError:
+                    with open(log_path) as f:
+                        print(f.read()[-4000:])
+                    raise
+            sampler = ResourceSampler(pid) if pid else None
+            report = asyncio.run(LoadTest(base_url, videos, args).run(sampler))
+        finally:
+            if process is not None:
+                stop_server(process)
+
+    print_report(report)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+Benchmark the offline and live pipelines without a YOLO model.
+
+Runs detector.detection() and live_detector.live_detection() on synthetic videos
+with a stub model across resolutions, zone counts and object densities, and
+writes frames/sec, per-stage time and peak memory to JSON.
+
+Usage (from backend/):
+    python -m benchmarks.pipeline_bench --out bench.json
+    python -m benchmarks.pipeline_bench --quick --out after.json --compare bench.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.synthetic import make_script, make_zones, write_video
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VIDEO_FPS = 24
+
+DEFAULT_MATRIX = {
+    'pipelines': ['offline', 'live'],
+    'resolutions': ['640x360', '1280x720', '1920x1080'],
+    'zones': [1, 4, 8],
+    'objects': [5, 25],
+    'seconds': 4,
+}
+
+QUICK_MATRIX = {
+    'pipelines': ['offline', 'live'],
+    'resolutions': ['640x360', '1280x720'],
+    'zones': [1, 4],
+    'objects': [5],
+    'seconds': 2,
+}
+
+# Stages timed by the benchmark; anything not covered ends up in 'other'
+# (zone evaluation, heatmap, dot/zone drawing and general bookkeeping).
+STAGES = ['decode', 'inference', 'render', 'encode']
+
+
+class StageTimings:
+    """Accumulated wall time per pipeline stage."""
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def add(self, stage, seconds):
+        self.totals[stage] += seconds
+        self.calls[stage] += 1
+
+
+def _install_cv2_timers(timings):
+    """Wrap the OpenCV calls the pipelines use so decode/encode time is attributed."""
+    import cv2
+
+    video_capture = cv2.VideoCapture
+    video_writer = cv2.VideoWriter
+    imencode = cv2.imencode
+
+    class TimedVideoCapture:
+        def __init__(self, *args, **kwargs):
+            self._cap = video_capture(*args, **kwargs)
+
+        def read(self, *args):
+            start = time.perf_counter()
+            result = self._cap.read(*args)
+            timings.add('decode', time.perf_counter() - start)
+            return result
+
+        def grab(self):
+            start = time.perf_counter()
+            result = self._cap.grab()
+            timings.add('decode', time.perf_counter() - start)
+            return result
+
+        def __getattr__(self, name):
+            return getattr(self._cap, name)
+
+    class TimedVideoWriter:
+        def __init__(self, *args, **kwargs):
+            self._writer = video_writer(*args, **kwargs)
+
+        def write(self, frame):
+            start = time.perf_counter()
+            self._writer.write(frame)
+            timings.add('encode', time.perf_counter() - start)
+
+        def __getattr__(self, name):
+            return getattr(self._writer, name)
+
+    def timed_imencode(*args, **kwargs):
+        start = time.perf_counter()
+        result = imencode(*args, **kwargs)
+        timings.add('encode', time.perf_counter() - start)
+        return result
+
+    cv2.VideoCapture = TimedVideoCapture
+    cv2.VideoWriter = TimedVideoWriter
+    cv2.imencode = timed_imencode
+
+
+def _rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_scenario(scenario, video_path, workdir, queue):
+    """Child process: run one pipeline over one synthetic video and report results."""
+    try:
+        if BACKEND_DIR not in sys.path:
+            sys.path.insert(0, BACKEND_DIR)
+        os.chdir(workdir)
+        os.makedirs('uploads/outputs', exist_ok=True)
+
+        from benchmarks.stub_model import StubModel
+        from app.core import detector, live_detector
+
+        width, height = scenario['width'], scenario['height']
+        num_frames = scenario['frames']
+        script = make_script(width, height, num_frames, scenario['objects'], seed=scenario['seed'])
+        zones = make_zones(width, height, scenario['zones'])
+
+        timings = StageTimings()
+        _install_cv2_timers(timings)
+        model = StubModel(script, timings)
+
+        rss_before = _rss_mb()
+        frames = 0
+        start = time.perf_counter()
+
+        if scenario['pipeline'] == 'offline':
+            for _ in detector.detection(video_path, zones, (width, height), f"bench-{os.getpid()}",
+                                        conf=40, model=model):
+                frames += 1
+        else:
+            # Remove the streaming frame-rate cap so the benchmark measures throughput
+            live_detector.TARGET_FPS = 1_000_000
+            # Stop before the end of the file: at EOF the live pipeline waits to reconnect
+            budget = max(1, num_frames - 2)
+            stream = live_detector.live_detection(video_path, zones, (width, height), f"bench-{os.getpid()}",
+                                                  conf=40, model=model, source_type='rtsp')
+            for _ in stream:
+                frames += 1
+                if frames >= budget:
+                    break
+            stream.close()
+
+        elapsed = time.perf_counter() - start
+
+        stages = {}
+        accounted = 0.0
+        for stage in STAGES:
+            total = timings.totals.get(stage, 0.0)
+            accounted += total
+            stages[stage] = {
+                'total_s': round(total, 4),
+                'per_frame_ms': round(total / frames * 1000, 3) if frames else 0.0,
+            }
+        other = max(0.0, elapsed - accounted)
+        stages['other'] = {
+            'total_s': round(other, 4),
+            'per_frame_ms': round(other / frames * 1000, 3) if frames else 0.0,
+        }
+
+        queue.put({
+            **scenario,
+            'frames_processed': frames,
+            'elapsed_s': round(elapsed, 4),
+            'fps': round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+            'stages': stages,
+            'peak_rss_mb': round(_rss_mb(), 1),
+            'pipeline_rss_growth_mb': round(_rss_mb() - rss_before, 1),
+        })
+    except Exception as e:
+        queue.put({**scenario, 'error': repr(e)})
+
+
+def scenario_key(result):
+    """Identify a scenario independently of when it was run."""
+    return (f"{result['pipeline']}/{result['width']}x{result['height']}"
+            f"/z{result['zones']}/o{result['objects']}")
+
+
+def run_benchmarks(matrix, seed=0):
+    """Run every scenario in the matrix, each in a fresh process for clean memory numbers."""
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix='locus-bench-') as tmp:
+        videos = {}
+        for resolution in matrix['resolutions']:
+            width, height = (int(v) for v in resolution.lower().split('x'))
+            num_frames = int(matrix['seconds'] * VIDEO_FPS)
+            for objects in matrix['objects']:
+                path = os.path.join(tmp, f"synthetic_{width}x{height}_{objects}.mp4")
+                write_video(path, make_script(width, height, num_frames, objects, seed=seed),
+                            width, height, VIDEO_FPS)
+                videos[(width, height, objects)] = (path, num_frames)
+
+        for pipeline in matrix['pipelines']:
+            for (width, height, objects), (path, num_frames) in videos.items():
+                for zones in matrix['zones']:
+                    scenario = {
+                        'pipeline': pipeline,
+                        'width': width,
+                        'height': height,
+                        'zones': zones,
+                        'objects': objects,
+                        'frames': num_frames,
+                        'seed': seed,
+                    }
+                    queue = ctx.Queue()
+                    proc = ctx.Process(target=_run_scenario, args=(scenario, path, tmp, queue))
+                    proc.start()
+                    result = queue.get()
+                    proc.join()
+                    results.append(result)
+                    if 'error' in result:
+                        print(f"{scenario_key(result):<32} ERROR {result['error']}")
+                    else:
+                        print(f"{scenario_key(result):<32} {result['fps']:>8.1f} fps  "
+                              f"peak {result['peak_rss_mb']:.0f} MB")
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current):
+    """Print the fps change per scenario between two result files."""
+    old = {scenario_key(r): r for r in baseline['results'] if 'error' not in r}
+    print(f"\n{'scenario':<32} {'before':>9} {'after':>9} {'change':>8}")
+    for result in current['results']:
+        if 'error' in result:
+            continue
+        key = scenario_key(result)
+        if key not in old:
+            continue
+        before, after = old[key]['fps'], result['fps']
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{key:<32} {before:>9.1f} {after:>9.1f} {change:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model-free pipeline benchmark")
+    parser.add_argument('--out', default='bench_results.json', help="Where to write the JSON report")
+    parser.add_argument('--quick', action='store_true', help="Run a small matrix")
+    parser.add_argument('--pipelines', help="Comma-separated: offline,live")
+    parser.add_argument('--resolutions', help="Comma-separated, e.g. 640x360,1920x1080")
+    parser.add_argument('--zones', help="Comma-separated zone counts, e.g. 1,4,8")
+    parser.add_argument('--objects', help="Comma-separated object counts, e.g. 5,25")
+    parser.add_argument('--seconds', type=float, help="Length of each synthetic video")
+    parser.add_argument('--compare', help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    matrix = dict(QUICK_MATRIX if args.quick else DEFAULT_MATRIX)
+    if args.pipelines:
+        matrix['pipelines'] = args.pipelines.split(',')
+    if args.resolutions:
+        matrix['resolutions'] = args.resolutions.split(',')
+    if args.zones:
+        matrix['zones'] = [int(v) for v in args.zones.split(',')]
+    if args.objects:
+        matrix['objects'] = [int(v) for v in args.objects.split(',')]
+    if args.seconds:
+        matrix['seconds'] = args.seconds
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'matrix': matrix,
+        'results': run_benchmarks(matrix),
+    }
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
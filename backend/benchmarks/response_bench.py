@@ -0,0 +1,97 @@
+"""
+Benchmark serialization and compression of the job details response.
+
+Builds the GET /api/jobs/{id} payload for a job with a large analytics payload
+(see db_bench.make_job) and reports, per serializer and content encoding, the
+time to produce the body and its size on the wire. "stdlib json" is what the
+API sent before app/services/response_encoding.py. Serializers and encodings
+whose optional packages aren't installed are skipped.
+
+Usage (from backend/):
+    python -m benchmarks.response_bench
+    python -m benchmarks.response_bench --events 100000 --repeat 10 --out response_bench.json
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from app.services import db, response_encoding
+from benchmarks.db_bench import make_job
+
+
+def _serializers():
+    serializers = {'stdlib json': lambda content: json.dumps(content).encode()}
+    if response_encoding.orjson is not None:
+        serializers['orjson'] = lambda content: response_encoding.serialize(content)
+    if response_encoding.msgpack is not None:
+        serializers['msgpack'] = lambda content: response_encoding.serialize(
+            content, response_encoding.MSGPACK_MEDIA_TYPE)
+    return serializers
+
+
+def _time(fn, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def run(events, repeat):
+    task_id = make_job(events)
+    job = db.get_job(task_id)
+    content = {
+        'id': task_id,
+        'zones': job['zones'],
+        'detectionData': job['detection_data'],
+        'dwellData': job['dwell_data'],
+        'lineCrossingData': job['line_crossing_data'],
+        'heatmapData': job['heatmap_data'],
+    }
+
+    results = []
+    for name, serialize in _serializers().items():
+        serialize_ms, body = _time(lambda: serialize(content), repeat)
+        for encoding in [None] + response_encoding.ENCODINGS:
+            compress_ms, (compressed, _) = _time(lambda: response_encoding.compress(body, encoding), repeat)
+            results.append({
+                'serializer': name,
+                'encoding': encoding or 'identity',
+                'serialize_ms': round(serialize_ms, 1),
+                'compress_ms': round(compress_ms, 1) if encoding else 0.0,
+                'total_ms': round(serialize_ms + (compress_ms if encoding else 0.0), 1),
+                'bytes': len(compressed),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Job response serialization benchmark")
+    parser.add_argument('--events', type=int, default=100_000, help="Detection events stored on the job")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per serializer and encoding")
+    parser.add_argument('--out', help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, 'bench.db')
+        db.init_db()
+        results = run(args.events, args.repeat)
+
+    baseline = next(r for r in results if r['serializer'] == 'stdlib json' and r['encoding'] == 'identity')
+    print(f"Job details with {args.events} detection events")
+    print(f"{'serializer':<14}{'encoding':<10}{'serialize ms':>14}{'compress ms':>13}{'total ms':>10}"
+          f"{'MB':>8}{'of baseline':>13}")
+    for r in results:
+        print(f"{r['serializer']:<14}{r['encoding']:<10}{r['serialize_ms']:>14.1f}{r['compress_ms']:>13.1f}"
+              f"{r['total_ms']:>10.1f}{r['bytes'] / 1e6:>8.2f}{r['bytes'] / baseline['bytes']:>12.1%}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'events': args.events, 'repeat': args.repeat, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Stub detector/tracker that replays scripted boxes instead of running YOLO.
+
+It implements the small part of the ultralytics model API the pipelines use
+(track() and names) and returns real ultralytics Results objects, so plotting
+and box handling downstream cost the same as with a real model.
+"""
+import time
+import torch
+from ultralytics.engine.results import Results
+
+from benchmarks.synthetic import decode_frame_index
+from app.services.coco_classes import COCO_CLASSES
+
+
+class StubModel:
+    """Replays a script produced by benchmarks.synthetic.make_script."""
+
+    def __init__(self, script, timings=None):
+        """
+        Args:
+            script: Per-frame lists of (track_id, class_id, cx, cy, w, h)
+            timings: Optional StageTimings that receives 'inference' and 'render' times
+        """
+        self.script = script
+        self.timings = timings
+        self.names = dict(COCO_CLASSES)
+
+    def track(self, frame, classes=None, conf=0.25, **kwargs):
+        start = time.perf_counter()
+        index = min(decode_frame_index(frame), len(self.script) - 1)
+        rows = [
+            [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2, track_id, 0.9, class_id]
+            for track_id, class_id, cx, cy, w, h in self.script[index]
+            if classes is None or class_id in classes
+        ]
+        boxes = torch.tensor(rows, dtype=torch.float32) if rows else torch.zeros((0, 7))
+        result = _TimedResults(frame, path='', names=self.names, boxes=boxes)
+        result.timings = self.timings
+        if self.timings is not None:
+            self.timings.add('inference', time.perf_counter() - start)
+        return [result]
+
+    def predict(self, frame, **kwargs):
+        # Used by the model warmup
+        return self.track(frame, **kwargs)
+
+
+class _TimedResults(Results):
+    """Results whose plot() time is attributed to the 'render' stage."""
+
+    timings = None
+
+    def plot(self, *args, **kwargs):
+        start = time.perf_counter()
+        image = super().plot(*args, **kwargs)
+        if self.timings is not None:
+            self.timings.add('render', time.perf_counter() - start)
+        return image
@@ -0,0 +1,57 @@
+"""
+Run the API with the stub model instead of YOLO, for load tests without weights.
+
+Every model the server loads, including in its detection worker processes, is a
+StubModel replaying the script described by LOCUS_STUB_SCRIPT
+("width,height,frames,objects,seed", the arguments of
+benchmarks.synthetic.make_script), so synthetic videos rendered from the same
+script get their scripted boxes. Worker processes are spawned and re-import
+this module as their main module, which is what carries the patch into them.
+
+The server writes uploads/ and instance/ to the working directory; start it
+from a scratch directory. benchmarks/load_test.py does all of this for you.
+
+Usage:
+    cd /tmp/scratch
+    LOCUS_STUB_SCRIPT=640,360,480,10,0 PYTHONPATH=/path/to/backend python -m benchmarks.stub_server --port 8765
+"""
+import argparse
+import os
+
+import app.services  # noqa: F401 (imports model_loader's dependents first, avoiding a circular import)
+from app.core import model_loader
+
+# Script used when LOCUS_STUB_SCRIPT isn't set
+DEFAULT_SCRIPT = '640,360,480,10,0'
+
+_script = None
+
+
+def _load_stub_model(model_name='yolo11n.pt'):
+    global _script
+    from benchmarks.stub_model import StubModel
+    from benchmarks.synthetic import make_script
+
+    if _script is None:
+        width, height, frames, objects, seed = map(int, os.environ.get('LOCUS_STUB_SCRIPT', DEFAULT_SCRIPT).split(','))
+        _script = make_script(width, height, frames, objects, seed=seed)
+    return StubModel(_script)
+
+
+model_loader.load_model = _load_stub_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Locus API with the stub model")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    import uvicorn
+    from app.main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Synthetic test videos with scripted moving objects.
+
+Every frame carries its own index as a row of black/white blocks in the top-left
+corner, so the stub model can look up the scripted boxes for whatever frame the
+pipeline hands it, even when frames are skipped or dropped.
+"""
+import cv2
+import numpy as np
+
+INDEX_BITS = 20
+INDEX_BLOCK = 16  # Block size in pixels; large enough to survive lossy encoding
+
+# COCO classes used for synthetic objects (person, car)
+OBJECT_CLASSES = [0, 2]
+
+
+def encode_frame_index(frame, index):
+    """Draw the frame index into the top-left corner as INDEX_BITS blocks."""
+    for bit in range(INDEX_BITS):
+        value = 255 if (index >> bit) & 1 else 0
+        x0 = bit * INDEX_BLOCK
+        frame[0:INDEX_BLOCK, x0:x0 + INDEX_BLOCK] = value
+
+
+def decode_frame_index(frame):
+    """Read back the frame index drawn by encode_frame_index."""
+    center = INDEX_BLOCK // 2
+    row = frame[center, center:INDEX_BITS * INDEX_BLOCK:INDEX_BLOCK]
+    bits = row.mean(axis=-1) > 127 if row.ndim == 2 else row > 127
+    return int(sum(1 << i for i, b in enumerate(bits) if b))
+
+
+def make_script(width, height, num_frames, num_objects, seed=0):
+    """
+    Script object trajectories.
+
+    Objects bounce around the frame at constant speed and each keeps its track id
+    for the whole video.
+
+    Returns:
+        List (one entry per frame) of lists of (track_id, class_id, cx, cy, w, h)
+    """
+    rng = np.random.default_rng(seed)
+    size = max(8, min(width, height) // 12)
+    top = INDEX_BLOCK * 2  # Keep objects clear of the frame index blocks
+
+    objects = []
+    for obj_id in range(num_objects):
+        w = int(size * rng.uniform(0.6, 1.0))
+        h = int(size * rng.uniform(1.0, 1.6))
+        objects.append({
+            'id': obj_id + 1,
+            'cls': OBJECT_CLASSES[obj_id % len(OBJECT_CLASSES)],
+            'w': w,
+            'h': h,
+            'x': rng.uniform(w, width - w),
+            'y': rng.uniform(top + h, height - h),
+            'vx': rng.uniform(-1, 1) * width / 200,
+            'vy': rng.uniform(-1, 1) * height / 200,
+        })
+
+    script = []
+    for _ in range(num_frames):
+        boxes = []
+        for o in objects:
+            o['x'] += o['vx']
+            o['y'] += o['vy']
+            if not o['w'] / 2 <= o['x'] <= width - o['w'] / 2:
+                o['vx'] = -o['vx']
+                o['x'] = min(max(o['x'], o['w'] / 2), width - o['w'] / 2)
+            if not top + o['h'] / 2 <= o['y'] <= height - o['h'] / 2:
+                o['vy'] = -o['vy']
+                o['y'] = min(max(o['y'], top + o['h'] / 2), height - o['h'] / 2)
+            boxes.append((o['id'], o['cls'], o['x'], o['y'], o['w'], o['h']))
+        script.append(boxes)
+    return script
+
+
+def write_video(path, script, width, height, fps=24):
+    """Render a script to an mp4 file (objects drawn as filled rectangles)."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+
+    background = np.full((height, width, 3), 90, dtype=np.uint8)
+    for index, boxes in enumerate(script):
+        frame = background.copy()
+        for track_id, class_id, cx, cy, w, h in boxes:
+            color = (40 + (track_id * 53) % 200, 200 - class_id * 40, 220)
+            cv2.rectangle(frame, (int(cx - w / 2), int(cy - h / 2)),
+                          (int(cx + w / 2), int(cy + h / 2)), color, -1)
+        encode_frame_index(frame, index)
+        writer.write(frame)
+    writer.release()
+
+
+def make_zones(width, height, num_zones, class_ids=(0, 2)):
+    """
+    Build zones in the same format the frontend sends.
+
+    Zones are vertical polygon strips across the frame; every third zone is a
+    two-point counting line instead.
+    """
+    zones = []
+    strip = width / max(1, num_zones)
+    for i in range(num_zones):
+        x0, x1 = i * strip + strip * 0.1, (i + 1) * strip - strip * 0.1
+        if i % 3 == 2:
+            points = [{'x': (x0 + x1) / 2, 'y': height * 0.1}, {'x': (x0 + x1) / 2, 'y': height * 0.9}]
+        else:
+            points = [
+                {'x': x0, 'y': height * 0.15}, {'x': x1, 'y': height * 0.15},
+                {'x': x1, 'y': height * 0.85}, {'x': x0, 'y': height * 0.85},
+            ]
+        zones.append({
+            'id': f'zone-{i + 1}',
+            'points': points,
+            'classIds': list(class_ids),
+            'color': [255, 200 - (i * 30) % 200, 0],
+            'label': f'Zone {i + 1}'
+        })
+    return zones
@@ -0,0 +1,2 @@
+# Importing app.services first avoids a circular import when a test starts with app.core
+import app.services  # noqa: F401
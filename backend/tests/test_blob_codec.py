@@ -0,0 +1,91 @@
+import json
+import random
+
+import pytest
+
+from app.services import blob_codec
+
+
+def _roundtrip(value):
+    blob = blob_codec.encode(value)
+    assert blob_codec.is_blob(blob)
+    return blob_codec.decode(blob)
+
+
+def _as_json(value):
+    return json.loads(json.dumps(value))
+
+
+@pytest.mark.parametrize('value', [
+    [],
+    {},
+    None,
+    [[0, 1, 2], [3, 4, 5]],
+    [[0.5, 1.25], [2.0, -3.5]],
+    [[1, 2], [3]],  # Ragged: stored as JSON
+    [{'time': 1.5, 'zone_id': 'zone-1', 'counts': {'2': 3, 0: 1}}],
+    {'zone-1': {'in': 3, 'out': 1}},
+    [{'a': 1}, {'b': 'x'}, {'a': 2.5}, {'a': None}, {'b': [1, 2]}],
+    [{'n': 2 ** 40}, {'n': -2 ** 40}, {'n': 7}],
+    [{'flag': True}, {'flag': False}, {'flag': 1}],
+])
+def test_roundtrip_matches_json(value):
+    assert _roundtrip(value) == _as_json(value)
+
+
+def _random_event(rng, keys):
+    event = {}
+    for key in keys:
+        kind = rng.randrange(8)
+        if kind == 0:
+            event[key] = rng.randrange(-300, 300)
+        elif kind == 1:
+            event[key] = rng.randrange(-2 ** 33, 2 ** 33)
+        elif kind == 2:
+            event[key] = round(rng.uniform(-1e3, 1e3), rng.randrange(6))
+        elif kind == 3:
+            event[key] = rng.choice(['zone-1', 'zone-2', 'ünïcode', ''])
+        elif kind == 4:
+            event[key] = {str(rng.randrange(5)): rng.randrange(10) for _ in range(rng.randrange(3))}
+        elif kind == 5:
+            event[key] = None
+        elif kind == 6:
+            event[key] = rng.random() < 0.5
+        else:
+            event[key] = [rng.randrange(10) for _ in range(rng.randrange(3))]
+    return event
+
+
+def test_random_records_match_json():
+    rng = random.Random(0)
+    for _ in range(200):
+        key_sets = [rng.sample(['time', 'zone_id', 'track_id', 'counts', 'duration', 'x'], rng.randrange(1, 5))
+                    for _ in range(rng.randrange(1, 4))]
+        records = [_random_event(rng, rng.choice(key_sets)) for _ in range(rng.randrange(1, 60))]
+        assert _roundtrip(records) == _as_json(records)
+
+
+def test_random_arrays_match_json():
+    rng = random.Random(1)
+    for _ in range(50):
+        rows, cols = rng.randrange(1, 20), rng.randrange(1, 20)
+        if rng.random() < 0.5:
+            value = [[rng.randrange(-10 ** 6, 10 ** 6) for _ in range(cols)] for _ in range(rows)]
+        else:
+            value = [[rng.uniform(-1, 1) for _ in range(cols)] for _ in range(rows)]
+        assert _roundtrip(value) == _as_json(value)
+
+
+def test_key_order_is_kept():
+    records = [{'b': 1, 'a': 2}, {'a': 3, 'b': 4}]
+    assert [list(r) for r in _roundtrip(records)] == [['b', 'a'], ['a', 'b']]
+
+
+def test_decode_rejects_other_data():
+    with pytest.raises(ValueError):
+        blob_codec.decode(b'[1, 2, 3]')
+    blob = blob_codec.encode([{'a': 1}])
+    with pytest.raises(ValueError):
+        blob_codec.decode(blob[:len(blob_codec.MAGIC)] + bytes([blob_codec.FORMAT_VERSION + 1]) + blob[4:])
+    with pytest.raises(ValueError):
+        blob_codec.decode(blob[:6] + b'garbage')
@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from app.services.blocking import Pool
+
+
+def test_timed_out_calls_leave_the_pool_idle():
+    pool = Pool('test', 1, 0.05)
+
+    async def call():
+        try:
+            await pool.run(time.sleep, 0.1)
+        except TimeoutError:
+            pass
+
+    async def main():
+        # One call runs, three time out while still queued
+        await asyncio.gather(*(call() for _ in range(4)))
+        await asyncio.sleep(0.2)
+
+    asyncio.run(main())
+    assert pool.get_stats() == {'workers': 1, 'running': 0, 'queued': 0, 'timeouts': 4}
+    assert pool.pending == 0
+
+
+def test_cancelled_calls_leave_the_pool_idle():
+    pool = Pool('test', 1, 5)
+
+    async def main():
+        running = asyncio.ensure_future(pool.run(time.sleep, 0.1))
+        queued = asyncio.ensure_future(pool.run(time.sleep, 0.1))
+        await asyncio.sleep(0.02)
+        queued.cancel()
+        await running
+        return await pool.run(sum, [1, 2])
+
+    assert asyncio.run(main()) == 3
+    assert pool.pending == 0
@@ -0,0 +1,28 @@
+import csv
+import io
+
+from app.api.routes.jobs import _export_content
+
+
+def _rows(job):
+    return list(csv.reader(io.StringIO(_export_content('task', job, 'csv').decode())))
+
+
+def test_rows_follow_event_times_not_process_time():
+    job = {'zones': [{'id': 'z1', 'label': 'Door'}], 'process_time': 300,
+           'detection_data': [{'time': 2.4, 'zone_id': 'z1', 'count': 3}]}
+    rows = _rows(job)
+    assert rows[0] == ['Timestamp (s)', 'Door']
+    assert rows[1:] == [['0', '0'], ['1', '0'], ['2', '3']]
+
+
+def test_time_ranges_keep_the_original_timeline():
+    # A 07:00-09:00 selection processed in 300 s: rows cover the range, not 0-300
+    job = {'zones': [{'id': 'z1', 'label': 'Door'}], 'process_time': 300,
+           'time_ranges': [{'start': 25200, 'end': 32400}],
+           'detection_data': [{'time': 25210.5, 'zone_id': 'z1', 'count': 4}]}
+    rows = _rows(job)[1:]
+    assert rows[0] == ['25200', '0']
+    assert rows[-1] == ['32400', '0']
+    assert len(rows) == 32400 - 25200 + 1
+    assert ['25210', '4'] in rows
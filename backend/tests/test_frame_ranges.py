@@ -0,0 +1,35 @@
+from app.core.detector import _frame_ranges
+
+
+def test_single_range():
+    assert _frame_ranges([{'start': 1.0, 'end': 2.0}], 30, 300) == [(30, 60)]
+
+
+def test_sorted_and_merged():
+    ranges = [{'start': 5.0, 'end': 6.0}, {'start': 1.0, 'end': 2.0}, {'start': 1.5, 'end': 3.0}]
+    assert _frame_ranges(ranges, 10, 100) == [(10, 30), (50, 60)]
+
+
+def test_adjacent_ranges_merge():
+    assert _frame_ranges([{'start': 0, 'end': 1}, {'start': 1, 'end': 2}], 10, 100) == [(0, 20)]
+
+
+def test_clipped_to_video():
+    assert _frame_ranges([{'start': 8.0, 'end': 20.0}], 10, 100) == [(80, 100)]
+    assert _frame_ranges([{'start': 20.0, 'end': 30.0}], 10, 100) == []
+
+
+def test_unknown_length_is_not_clipped():
+    assert _frame_ranges([{'start': 8.0, 'end': 20.0}], 10, 0) == [(80, 200)]
+
+
+def test_fractional_fps_rounds_to_frames_inside_range():
+    # 0.1s at 29.97 fps is frame 2.997: starts at frame 3, and float noise doesn't add a frame
+    assert _frame_ranges([{'start': 0.1, 'end': 1.0}], 29.97, 1000) == [(3, 30)]
+    assert _frame_ranges([{'start': 0.7, 'end': 1.4}], 10, 1000) == [(7, 14)]
+
+
+def test_empty_ranges_are_dropped():
+    # No frame timestamp falls inside
+    assert _frame_ranges([{'start': 1.01, 'end': 1.05}], 10, 100) == []
+    assert _frame_ranges([], 10, 100) == []
@@ -0,0 +1,42 @@
+import pytest
+
+from app.services.workers import FrameRing
+
+
+@pytest.fixture
+def ring():
+    writer = FrameRing(slots=4, slot_bytes=64)
+    reader = FrameRing(writer.name, slots=4, slot_bytes=64)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_write_then_read(ring):
+    writer, reader = ring
+    seq, slot = writer.write(b'frame-1')
+    assert reader.read(seq, slot) == b'frame-1'
+    # Reading doesn't consume the frame
+    assert reader.read(seq, slot) == b'frame-1'
+
+
+def test_variable_sizes(ring):
+    writer, reader = ring
+    frames = [bytes([i]) * size for i, size in enumerate((1, 64, 0, 17))]
+    written = [writer.write(frame) for frame in frames]
+    assert [reader.read(seq, slot) for seq, slot in written] == frames
+
+
+def test_overwritten_frame_is_dropped(ring):
+    writer, reader = ring
+    first = writer.write(b'old')
+    for i in range(4):
+        writer.write(b'new %d' % i)
+    assert reader.read(*first) is None
+
+
+def test_oversized_frame_is_rejected(ring):
+    writer, reader = ring
+    assert writer.write(b'x' * 65) is None
+    seq, slot = writer.write(b'y')
+    assert reader.read(seq, slot) == b'y'
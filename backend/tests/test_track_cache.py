@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from app.core import detector, heatmap, overlay, track_cache
+from benchmarks.stub_model import StubModel
+from benchmarks.synthetic import make_script, make_zones, write_video
+
+WIDTH, HEIGHT, FRAMES = 320, 192, 150
+
+
+@pytest.fixture
+def video(tmp_path, monkeypatch):
+    # The pipeline writes uploads/ and instance/ relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'uploads' / 'outputs').mkdir(parents=True)
+    script = make_script(WIDTH, HEIGHT, FRAMES, 8, seed=5)
+    write_video('video.mp4', script, WIDTH, HEIGHT)
+    return script
+
+
+def _run(script, task_id, zones, track_cache_key=None):
+    last = None
+    for last in detector.detection('video.mp4', zones, (WIDTH, HEIGHT), task_id, model=StubModel(script),
+                                   render_video=False, track_cache_key=track_cache_key):
+        pass
+    _, _, detection_events, dwell_events, line_crossing_counts, heatmap = last
+    return detection_events, dwell_events, line_crossing_counts, heatmap
+
+
+def test_recompute_matches_a_full_run(video):
+    _run(video, 'cached', make_zones(WIDTH, HEIGHT, 2), track_cache_key='key')
+    assert track_cache.exists('key')
+
+    # Different zones, including a counting line
+    zones = make_zones(WIDTH, HEIGHT, 3)
+    expected = _run(video, 'full', zones)
+    records, meta = track_cache.load('key')
+    *analytics, states = track_cache.recompute_analytics(records, meta, zones, return_states=True)
+
+    assert tuple(analytics[:3]) == expected[:3]
+    assert np.array_equal(analytics[3], expected[3].grid(heatmap.LEGACY_RESOLUTION))
+    assert len(expected[0]) > 0 and sum(c['in'] + c['out'] for c in expected[2].values()) > 0
+    assert (states == overlay.load('full')[1]['state']).all()
+
+
+def test_rendered_video_is_redrawn_from_the_cache(video):
+    _run(video, 'cached', make_zones(WIDTH, HEIGHT, 2), track_cache_key='key')
+
+    zones = make_zones(WIDTH, HEIGHT, 3)
+    expected = [frame for frame, *_ in detector.detection('video.mp4', zones, (WIDTH, HEIGHT), 'full',
+                                                          model=StubModel(video))]
+    records, meta = track_cache.load('key')
+    detection_events, _, _, _, states = track_cache.recompute_analytics(records, meta, zones, return_states=True)
+    rendered = [frame for frame, _ in detector.render_cached_tracks('video.mp4', zones, (WIDTH, HEIGHT), 'rerendered',
+                                                                    records, meta, states, detection_events)]
+
+    assert len(rendered) == len(expected) == FRAMES
+    assert all(np.array_equal(a, b) for a, b in zip(rendered, expected))
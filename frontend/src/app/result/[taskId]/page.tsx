@@ -1,10 +1,11 @@
 "use client";
 
-import { useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useParams, useRouter } from "next/navigation";
-import { useQuery } from "@tanstack/react-query";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
 import { api } from "@/utils/api";
 import { COCO_CLASSES } from "@/utils/types";
+import type { OverlayLayers, ProgressResponse } from "@/utils/types";
 import { LoadingOverlay } from "@/components/layout";
 import { Download, FileJson, Table, Clock, Users, Activity, BarChart3, Flame, Info, TrendingUp, Layers, Timer, ArrowLeftRight, PieChart, MousePointerClick, Monitor, Cpu, Calendar, Play } from "lucide-react";
 import { BentoGrid, BentoCard } from "@/components/dashboard/BentoGrid";
@@ -22,6 +23,20 @@ import CumulativeFlowChart from "@/components/dashboard/CumulativeFlowChart";
 import BounceRateChart from "@/components/dashboard/BounceRateChart";
 import ClassBreakdownChart from "@/components/dashboard/ClassBreakdownChart";
 import ZoneDistributionChart from "@/components/dashboard/ZoneDistributionChart";
+import ProgressiveVideo from "@/components/dashboard/ProgressiveVideo";
+import PreviewSummary from "@/components/dashboard/PreviewSummary";
+import OverlayCanvas from "@/components/dashboard/OverlayCanvas";
+
+// Finer than the 50x50 grid stored on the job, for the full-size video overlay
+const HEATMAP_OVERLAY_RESOLUTION = 100;
+
+const OVERLAY_LAYER_LABELS: [keyof OverlayLayers, string][] = [
+    ["boxes", "Boxes"],
+    ["ids", "IDs"],
+    ["dots", "Dots"],
+    ["zones", "Zones"],
+    ["counts", "Counts"],
+];
 
 export default function ResultPage() {
     const params = useParams();
@@ -30,20 +45,55 @@ export default function ResultPage() {
     const taskId = params.taskId as string;
 
     const [isHeatmapEnabled, setIsHeatmapEnabled] = useState(false);
+    const [liveProgress, setLiveProgress] = useState<ProgressResponse | null>(null);
+    const [overlayLayers, setOverlayLayers] = useState<OverlayLayers>({
+        boxes: true,
+        ids: false,
+        dots: true,
+        zones: true,
+        counts: true,
+    });
+    const videoRef = useRef<HTMLVideoElement>(null);
+    const queryClient = useQueryClient();
 
     const { data: job, isLoading } = useQuery({
         queryKey: ["job", taskId],
         queryFn: () => api.getJob(taskId),
         enabled: !!taskId,
-        refetchInterval: (query) => {
-            // Poll while processing
-            if (query.state.data?.status === "processing") {
-                return 1000;
-            }
-            return false;
-        },
     });
 
+    const isProcessing = job?.status === "processing";
+
+    const { data: heatmap } = useQuery({
+        queryKey: ["heatmap", taskId, HEATMAP_OVERLAY_RESOLUTION, job?.processTime],
+        queryFn: () => api.getHeatmap(taskId, { resolution: HEATMAP_OVERLAY_RESOLUTION }),
+        enabled: !!taskId && isHeatmapEnabled && job?.status === "completed",
+        retry: false, // Jobs processed before per-class heatmaps were stored return 404
+    });
+
+    // Progress is pushed over Server-Sent Events; the full job is refetched once it finishes
+    useEffect(() => {
+        if (!taskId || !isProcessing) return;
+
+        const source = new EventSource(api.getProgressStreamUrl(taskId));
+        let phase: string | null | undefined;
+        source.addEventListener("progress", (event) => {
+            const data = JSON.parse((event as MessageEvent).data) as ProgressResponse;
+            setLiveProgress(data);
+            // The preview pass has stored its results: refetch the job to show them
+            if (phase === "preview" && data.phase !== "preview") {
+                queryClient.invalidateQueries({ queryKey: ["job", taskId] });
+            }
+            phase = data.phase;
+            if (data.status === "completed" || data.status === "error") {
+                source.close();
+                queryClient.invalidateQueries({ queryKey: ["job", taskId] });
+            }
+        });
+
+        return () => source.close();
+    }, [taskId, isProcessing, queryClient]);
+
     if (isLoading) {
         return <LoadingOverlay message="Loading results..." />;
     }
@@ -57,9 +107,17 @@ export default function ResultPage() {
     }
 
     if (job.status === "processing") {
+        const progress = liveProgress?.progress ?? job.progress;
         return (
             <div className="flex-1 flex items-center justify-center">
                 <div className="flex flex-col items-center">
+                    {/* Annotated output so far (shown once the first HLS segment exists) */}
+                    {job.renderVideo !== false && (
+                        <ProgressiveVideo
+                            playlistUrl={api.getHlsPlaylistUrl(taskId)}
+                            className="w-[640px] max-w-full aspect-video bg-black rounded-lg mb-6"
+                        />
+                    )}
                     <div className="relative w-24 h-24 mb-4">
                         <svg className="w-full h-full -rotate-90" viewBox="0 0 100 100">
                             <circle
@@ -79,24 +137,36 @@ export default function ResultPage() {
                                 strokeWidth="6"
                                 strokeLinecap="round"
                                 strokeDasharray="264"
-                                strokeDashoffset={264 - (job.progress / 100) * 264}
+                                strokeDashoffset={264 - (progress / 100) * 264}
                             />
                         </svg>
                         <div className="absolute inset-0 flex items-center justify-center">
                             <span className="text-xl font-medium text-text-color tabular-nums">
-                                {job.progress}
+                                {progress}
                             </span>
                         </div>
                     </div>
                     <p className="text-lg font-medium text-text-color">
-                        Processing<span className="animate-pulse">...</span>
+                        {liveProgress?.phase === "preview" ? "Previewing" : "Processing"}
+                        <span className="animate-pulse">...</span>
                     </p>
+                    {liveProgress?.fps ? (
+                        <p className="text-sm text-secondary-text tabular-nums mt-1">
+                            {liveProgress.fps.toFixed(1)} fps
+                            {liveProgress.eta != null && ` · ${Math.ceil(liveProgress.eta)}s left`}
+                        </p>
+                    ) : null}
+                    {job.preview && <PreviewSummary job={job} preview={job.preview} />}
                 </div>
             </div>
         );
     }
 
-    const videoUrl = api.getOutputVideoUrl(taskId);
+    // Without a rendered video, the overlay data is drawn over the original upload
+    const showOverlay = job.renderVideo === false && !!job.hasOverlay;
+    const videoUrl = showOverlay
+        ? api.getMediaUrl(job.videoPath.replace("uploads/", ""))
+        : api.getOutputVideoUrl(taskId);
 
     // Calculate zone statistics
     const zoneStats: Record<string, { total: number; peak: number }> = {};
@@ -164,19 +234,48 @@ export default function ResultPage() {
                         noScroll
                         noSpacer
                         darkHeader
+                        headerAction={showOverlay ? (
+                            <div className="flex items-center gap-1">
+                                {OVERLAY_LAYER_LABELS.map(([layer, label]) => (
+                                    <button
+                                        key={layer}
+                                        onClick={() => setOverlayLayers((current) => ({ ...current, [layer]: !current[layer] }))}
+                                        className={`px-2 py-0.5 rounded-full text-[10px] font-medium transition-all ${overlayLayers[layer]
+                                            ? "bg-blue-500/20 text-blue-400 border border-blue-500/30"
+                                            : "bg-btn-bg text-secondary-text border border-primary-border hover:bg-btn-hover"
+                                            }`}
+                                        title={`Toggle ${label} Overlay`}
+                                    >
+                                        {label}
+                                    </button>
+                                ))}
+                            </div>
+                        ) : undefined}
                     >
                         <div className="relative w-full h-full bg-black flex items-center justify-center group">
                             <video
+                                ref={videoRef}
                                 src={videoUrl}
                                 controls
                                 className="w-full h-full object-contain"
                                 muted
                             />
+                            {showOverlay && (
+                                <OverlayCanvas
+                                    taskId={taskId}
+                                    videoRef={videoRef}
+                                    frameWidth={job.frameWidth}
+                                    frameHeight={job.frameHeight}
+                                    zones={job.zones}
+                                    detectionData={job.detectionData}
+                                    layers={overlayLayers}
+                                />
+                            )}
                             {/* Heatmap Overlay */}
                             {isHeatmapEnabled && (
                                 <div className="absolute inset-0 pointer-events-none z-10">
                                     <HeatmapChart
-                                        data={job.heatmapData}
+                                        data={heatmap?.grid ?? job.heatmapData}
                                         zones={job.zones}
                                         overlay={true}
                                         videoWidth={job.frameWidth}
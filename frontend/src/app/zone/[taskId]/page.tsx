@@ -6,7 +6,31 @@ import { useQuery } from "@tanstack/react-query";
 import { api } from "@/utils/api";
 import { ZoneCanvas, ZoneSidebar } from "@/components/zone";
 import { LoadingOverlay } from "@/components/layout";
-import type { Zone, Point, TrackerConfig } from "@/utils/types";
+import type { Zone, Point, TrackerConfig, TimeRange } from "@/utils/types";
+
+// "[[h:]m:]s" -> seconds
+function parseTime(text: string): number {
+    return text.split(":").reduce((total, part) => total * 60 + Number(part), 0);
+}
+
+function formatTime(seconds: number): string {
+    const h = Math.floor(seconds / 3600);
+    const m = Math.floor((seconds % 3600) / 60);
+    const s = Math.round((seconds % 60) * 100) / 100;
+    const ss = s < 10 ? `0${s}` : `${s}`;
+    return h > 0 ? `${h}:${m.toString().padStart(2, "0")}:${ss}` : `${m}:${ss}`;
+}
+
+// "7:00:00-9:00:00, 12:30-13:00" -> [{start, end}, ...]; null if the text is invalid
+function parseTimeRanges(text: string): TimeRange[] | null {
+    const ranges: TimeRange[] = [];
+    for (const part of text.split(",").map((p) => p.trim()).filter(Boolean)) {
+        const [start, end] = part.split("-").map((t) => parseTime(t.trim()));
+        if (!Number.isFinite(start) || !Number.isFinite(end) || start < 0 || end <= start) return null;
+        ranges.push({ start, end });
+    }
+    return ranges;
+}
 
 function generateZoneId(): string {
     return `zone_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`;
@@ -66,6 +90,9 @@ export default function ZonePage() {
         track_buffer: 30,
     });
     const [frameSize, setFrameSize] = useState({ width: 0, height: 0 });
+    const [renderVideo, setRenderVideo] = useState(true);
+    const [preview, setPreview] = useState(false);
+    const [timeRanges, setTimeRanges] = useState("");
     const [isProcessing, setIsProcessing] = useState(false);
     const [progress, setProgress] = useState(0);
 
@@ -93,6 +120,10 @@ export default function ZonePage() {
         if (job.confidence) setConfidence(job.confidence);
         if (job.model) setModel(job.model);
         if (job.trackerConfig) setTrackerConfig(job.trackerConfig);
+        if (job.renderVideo !== undefined) setRenderVideo(job.renderVideo);
+        if (job.timeRanges) {
+            setTimeRanges(job.timeRanges.map((r) => `${formatTime(r.start)}-${formatTime(r.end)}`).join(", "));
+        }
 
         // Initialize frame size from job data (important for frame-wide mode)
         if (job.frameWidth && job.frameHeight) {
@@ -188,6 +219,12 @@ export default function ZonePage() {
             zonesToProcess = completeZones;
         }
 
+        const ranges = parseTimeRanges(timeRanges);
+        if (ranges === null) {
+            alert("Invalid time ranges. Use e.g. 7:00:00-9:00:00, 12:30-13:00");
+            return;
+        }
+
         // Check if this is a live stream (RTSP/webcam)
         const isLiveStream = job?.sourceType === "rtsp" || job?.sourceType === "webcam";
 
@@ -202,6 +239,9 @@ export default function ZonePage() {
                 confidence,
                 model,
                 trackerConfig,
+                renderVideo,
+                preview,
+                timeRanges: ranges.length > 0 ? ranges : undefined,
             });
 
             // For live streams only: redirect immediately to /live page (no loader)
@@ -234,7 +274,7 @@ export default function ZonePage() {
             console.error("Failed to start processing:", error);
             setIsProcessing(false);
         }
-    }, [zones, confidence, model, trackerConfig, taskId, router, job?.sourceType, detectionMode, frameClassIds, frameSize]);
+    }, [zones, confidence, model, trackerConfig, renderVideo, preview, timeRanges, taskId, router, job?.sourceType, detectionMode, frameClassIds, frameSize]);
 
     if (isLoading) {
         return <LoadingOverlay message="Loading..." />;
@@ -309,6 +349,12 @@ export default function ZonePage() {
                     onConfidenceChange={setConfidence}
                     onModelChange={setModel}
                     onTrackerConfigChange={setTrackerConfig}
+                    renderVideo={renderVideo}
+                    onRenderVideoChange={setRenderVideo}
+                    preview={preview}
+                    onPreviewChange={setPreview}
+                    timeRanges={timeRanges}
+                    onTimeRangesChange={setTimeRanges}
                     onProcess={handleProcess}
                     isProcessing={isProcessing}
                 />
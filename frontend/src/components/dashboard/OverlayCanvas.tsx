@@ -0,0 +1,222 @@
+"use client";
+
+import { RefObject, useEffect, useRef } from "react";
+import { api } from "@/utils/api";
+import type { DetectionEvent, OverlayFrame, OverlayLayers, Zone } from "@/utils/types";
+
+// Overlay data is fetched in windows of this many seconds, one window ahead of the playhead
+const WINDOW_S = 30;
+
+// Dot colors by state (same as the dots drawn into rendered videos)
+const DOT_COLORS: Record<number, string> = {
+    1: "rgb(234, 67, 54)", // Red: matches a zone class, not counted
+    2: "rgb(51, 168, 83)", // Green: counted
+    3: "rgb(66, 133, 244)", // Blue: in a zone / crossing a line
+};
+
+function getColorFromClassId(classId: number): string {
+    const hue = ((classId * 137.508) % 360);
+    return `hsl(${hue}, 85%, 55%)`;
+}
+
+// Index of the last element with t <= time, or -1
+function lastAtOrBefore<T extends { t?: number; time?: number }>(items: T[], time: number): number {
+    let lo = 0;
+    let hi = items.length - 1;
+    let found = -1;
+    while (lo <= hi) {
+        const mid = (lo + hi) >> 1;
+        if ((items[mid].t ?? items[mid].time ?? 0) <= time) {
+            found = mid;
+            lo = mid + 1;
+        } else {
+            hi = mid - 1;
+        }
+    }
+    return found;
+}
+
+interface OverlayCanvasProps {
+    taskId: string;
+    videoRef: RefObject<HTMLVideoElement | null>;
+    frameWidth: number;
+    frameHeight: number;
+    zones: Zone[];
+    detectionData?: DetectionEvent[];
+    layers: OverlayLayers;
+}
+
+/**
+ * Draws a job's overlay data (boxes, track IDs, dots, zones, counts) over the
+ * original video, synced to its current time. Used when the job was processed
+ * without rendering an annotated video.
+ */
+export default function OverlayCanvas({
+    taskId,
+    videoRef,
+    frameWidth,
+    frameHeight,
+    zones,
+    detectionData,
+    layers,
+}: OverlayCanvasProps) {
+    const canvasRef = useRef<HTMLCanvasElement>(null);
+    const layersRef = useRef(layers);
+    layersRef.current = layers;
+    const drawRef = useRef<(() => void) | null>(null);
+
+    useEffect(() => {
+        const video = videoRef.current;
+        const canvas = canvasRef.current;
+        if (!video || !canvas) return;
+        const ctx = canvas.getContext("2d");
+        if (!ctx) return;
+
+        let cancelled = false;
+        let handle = 0;
+        const windows = new Map<number, OverlayFrame[]>();
+        const pending = new Set<number>();
+
+        // Detection events per zone in time order, for the count labels
+        const eventsByZone = new Map<string, DetectionEvent[]>();
+        for (const event of detectionData ?? []) {
+            const list = eventsByZone.get(event.zone_id) ?? [];
+            list.push(event);
+            eventsByZone.set(event.zone_id, list);
+        }
+
+        const loadWindow = (index: number) => {
+            if (index < 0 || windows.has(index) || pending.has(index)) return;
+            pending.add(index);
+            api.getOverlay(taskId, index * WINDOW_S, (index + 1) * WINDOW_S)
+                .then((data) => {
+                    if (cancelled) return;
+                    windows.set(index, data.frames);
+                    draw();
+                })
+                .catch((error) => console.error("Failed to load overlay:", error))
+                .finally(() => pending.delete(index));
+        };
+
+        const frameAt = (time: number): OverlayFrame | null => {
+            const index = Math.floor(time / WINDOW_S);
+            loadWindow(index);
+            loadWindow(index + 1);
+            const frames = windows.get(index);
+            if (!frames) return null;
+            const i = lastAtOrBefore(frames, time);
+            if (i >= 0) return frames[i];
+            // Before the first frame of this window: the last one of the previous window
+            const previous = windows.get(index - 1);
+            return previous?.length ? previous[previous.length - 1] : null;
+        };
+
+        const draw = () => {
+            const rect = canvas.getBoundingClientRect();
+            const dpr = window.devicePixelRatio || 1;
+            if (canvas.width !== Math.round(rect.width * dpr) || canvas.height !== Math.round(rect.height * dpr)) {
+                canvas.width = Math.round(rect.width * dpr);
+                canvas.height = Math.round(rect.height * dpr);
+            }
+            ctx.setTransform(1, 0, 0, 1, 0, 0);
+            ctx.clearRect(0, 0, canvas.width, canvas.height);
+            if (!frameWidth || !frameHeight) return;
+
+            // The video is letterboxed (object-contain): map frame pixels onto its content box
+            const scale = Math.min(rect.width / frameWidth, rect.height / frameHeight);
+            const offsetX = (rect.width - frameWidth * scale) / 2;
+            const offsetY = (rect.height - frameHeight * scale) / 2;
+            ctx.setTransform(dpr * scale, 0, 0, dpr * scale, dpr * offsetX, dpr * offsetY);
+            const px = 1 / scale; // One screen pixel in frame units
+
+            const current = layersRef.current;
+            const time = video.currentTime;
+
+            if (current.zones) {
+                ctx.lineWidth = 3 * px;
+                for (const zone of zones) {
+                    if (zone.points.length < 2) continue;
+                    ctx.strokeStyle = `rgb(${zone.color.join(",")})`;
+                    ctx.beginPath();
+                    zone.points.forEach((p, i) => (i === 0 ? ctx.moveTo(p.x, p.y) : ctx.lineTo(p.x, p.y)));
+                    if (zone.points.length > 2) ctx.closePath();
+                    ctx.stroke();
+                }
+            }
+
+            const frame = frameAt(time);
+            if (frame) {
+                ctx.font = `${12 * px}px sans-serif`;
+                ctx.textBaseline = "bottom";
+                for (const [x, y, w, h, trackId, classId, state] of frame.boxes) {
+                    const color = getColorFromClassId(classId);
+                    if (current.boxes) {
+                        ctx.strokeStyle = color;
+                        ctx.lineWidth = 2 * px;
+                        ctx.strokeRect(x - w / 2, y - h / 2, w, h);
+                    }
+                    if (current.ids) {
+                        ctx.fillStyle = color;
+                        ctx.fillText(`#${trackId}`, x - w / 2, y - h / 2 - 2 * px);
+                    }
+                    if (current.dots && DOT_COLORS[state]) {
+                        ctx.fillStyle = DOT_COLORS[state];
+                        ctx.beginPath();
+                        ctx.arc(x, y, 5 * px, 0, Math.PI * 2);
+                        ctx.fill();
+                    }
+                }
+            }
+
+            if (current.counts) {
+                ctx.font = `600 ${14 * px}px sans-serif`;
+                ctx.textBaseline = "top";
+                zones.forEach((zone, i) => {
+                    const events = eventsByZone.get(zone.id) ?? [];
+                    const last = events[lastAtOrBefore(events, time)];
+                    const label = zone.label || `Zone ${i + 1}`;
+                    const text = zone.points.length === 2
+                        ? `${label}: IN ${last?.in_count ?? 0} | OUT ${last?.out_count ?? 0}`
+                        : `${label}: ${last?.count ?? 0}`;
+                    ctx.fillStyle = getColorFromClassId(zone.classIds?.[0] ?? 0);
+                    ctx.fillText(text, 10 * px, (10 + i * 20) * px);
+                });
+            }
+        };
+
+        drawRef.current = draw;
+
+        // Redraw on every presented video frame where supported, otherwise every animation frame
+        const hasVideoFrameCallback = "requestVideoFrameCallback" in video;
+        const loop = () => {
+            if (cancelled) return;
+            draw();
+            handle = hasVideoFrameCallback
+                ? video.requestVideoFrameCallback(loop)
+                : requestAnimationFrame(loop);
+        };
+        // Paused seeks don't present frames through requestVideoFrameCallback in every browser
+        video.addEventListener("seeked", draw);
+        window.addEventListener("resize", draw);
+        loop();
+
+        return () => {
+            cancelled = true;
+            drawRef.current = null;
+            if (hasVideoFrameCallback) {
+                video.cancelVideoFrameCallback(handle);
+            } else {
+                cancelAnimationFrame(handle);
+            }
+            video.removeEventListener("seeked", draw);
+            window.removeEventListener("resize", draw);
+        };
+    }, [taskId, videoRef, frameWidth, frameHeight, zones, detectionData]);
+
+    // Toggling a layer while paused: no video frame will trigger a redraw
+    useEffect(() => {
+        drawRef.current?.();
+    }, [layers]);
+
+    return <canvas ref={canvasRef} className="absolute inset-0 w-full h-full pointer-events-none" />;
+}
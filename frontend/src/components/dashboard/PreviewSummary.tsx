@@ -0,0 +1,68 @@
+"use client";
+
+import { api } from "@/utils/api";
+import type { Job, PreviewResults } from "@/utils/types";
+import HeatmapChart from "@/components/dashboard/HeatmapChart";
+
+interface PreviewSummaryProps {
+    job: Job;
+    preview: PreviewResults;
+}
+
+/**
+ * Approximate zone counts and heatmap from the preview pass, shown while the
+ * full analysis is still running.
+ */
+export default function PreviewSummary({ job, preview }: PreviewSummaryProps) {
+    // Latest count per zone (events are in time order)
+    const counts: Record<string, number> = {};
+    preview.detectionData.forEach((event) => {
+        counts[event.zone_id] = event.count;
+    });
+
+    const frameUrl = job.framePath ? api.getMediaUrl(job.framePath.replace("uploads/", "")) : null;
+
+    return (
+        <div className="w-[640px] max-w-full mt-6 rounded-lg border border-primary-border bg-card-bg p-4">
+            <div className="flex items-center justify-between mb-3">
+                <span className="px-2 py-0.5 rounded-full text-[10px] font-medium bg-amber-500/20 text-amber-400 border border-amber-500/30">
+                    Preview · approximate
+                </span>
+                <span className="text-xs text-secondary-text tabular-nums">
+                    {preview.sampleFps} fps · {preview.imgsz}px · {preview.processTime}s
+                </span>
+            </div>
+            <div className="flex gap-4">
+                {frameUrl && preview.heatmapData && (
+                    <div className="relative w-1/2 aspect-video bg-black rounded overflow-hidden">
+                        {/* eslint-disable-next-line @next/next/no-img-element */}
+                        <img src={frameUrl} alt="" className="w-full h-full object-contain" />
+                        <HeatmapChart
+                            data={preview.heatmapData}
+                            zones={job.zones}
+                            overlay={true}
+                            videoWidth={job.frameWidth}
+                            videoHeight={job.frameHeight}
+                        />
+                    </div>
+                )}
+                <ul className="flex-1 text-sm space-y-1">
+                    {job.zones.map((zone, i) => {
+                        const label = zone.label || `Zone ${i + 1}`;
+                        const line = preview.lineCrossingData[zone.id];
+                        return (
+                            <li key={zone.id} className="flex justify-between">
+                                <span className="text-secondary-text">{label}</span>
+                                <span className="text-text-color tabular-nums">
+                                    {zone.points.length === 2 && line
+                                        ? `IN ${line.in} | OUT ${line.out}`
+                                        : `~${counts[zone.id] ?? 0}`}
+                                </span>
+                            </li>
+                        );
+                    })}
+                </ul>
+            </div>
+        </div>
+    );
+}
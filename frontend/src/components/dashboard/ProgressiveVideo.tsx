@@ -0,0 +1,158 @@
+"use client";
+
+import { useEffect, useRef, useState } from "react";
+
+// Matches the fixed H.264 profile/level the backend's HLS writer encodes with
+const HLS_MIME = "application/vnd.apple.mpegurl";
+const MSE_CODEC = 'video/mp4; codecs="avc1.640033"';
+const PLAYLIST_POLL_MS = 2000;
+// Only fetch segments this far ahead of the playhead
+const BUFFER_AHEAD_S = 30;
+
+interface Segment {
+    uri: string;
+    start: number;
+    duration: number;
+}
+
+interface Playlist {
+    init: string | null;
+    segments: Segment[];
+    ended: boolean;
+}
+
+function parsePlaylist(text: string): Playlist {
+    const playlist: Playlist = { init: null, segments: [], ended: false };
+    let start = 0;
+    let duration = 0;
+    for (const raw of text.split("\n")) {
+        const line = raw.trim();
+        if (line.startsWith("#EXT-X-MAP:")) {
+            playlist.init = line.match(/URI="([^"]+)"/)?.[1] ?? null;
+        } else if (line.startsWith("#EXTINF:")) {
+            duration = parseFloat(line.slice(8));
+        } else if (line === "#EXT-X-ENDLIST") {
+            playlist.ended = true;
+        } else if (line && !line.startsWith("#")) {
+            playlist.segments.push({ uri: line, start, duration });
+            start += duration;
+        }
+    }
+    return playlist;
+}
+
+interface ProgressiveVideoProps {
+    playlistUrl: string;
+    className?: string;
+}
+
+/**
+ * Plays the HLS output of a job that is still processing.
+ * Uses native HLS where available (Safari) and Media Source Extensions elsewhere,
+ * polling the playlist for new segments and fetching only what is near the playhead.
+ */
+export default function ProgressiveVideo({ playlistUrl, className }: ProgressiveVideoProps) {
+    const videoRef = useRef<HTMLVideoElement>(null);
+    const [isAvailable, setIsAvailable] = useState(false);
+
+    useEffect(() => {
+        const video = videoRef.current;
+        if (!video) return;
+
+        let cancelled = false;
+        let objectUrl: string | null = null;
+        let playlist: Playlist = { init: null, segments: [], ended: false };
+        let cursor = 0;
+        const appended = new Set<number>();
+        const base = playlistUrl.slice(0, playlistUrl.lastIndexOf("/") + 1);
+        const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+        const loadPlaylist = async () => {
+            const response = await fetch(playlistUrl, { cache: "no-store" });
+            if (!response.ok) return false;
+            playlist = parsePlaylist(await response.text());
+            return playlist.segments.length > 0;
+        };
+
+        const append = (buffer: SourceBuffer, data: ArrayBuffer) =>
+            new Promise<void>((resolve, reject) => {
+                buffer.addEventListener("updateend", () => resolve(), { once: true });
+                buffer.addEventListener("error", () => reject(new Error("appendBuffer failed")), { once: true });
+                buffer.appendBuffer(data);
+            });
+
+        const fetchSegment = async (uri: string) => (await fetch(base + uri)).arrayBuffer();
+
+        // Seeking outside what's buffered: continue from the segment containing the new position
+        const onSeeking = () => {
+            const index = playlist.segments.findIndex((s) => video.currentTime < s.start + s.duration);
+            if (index >= 0) cursor = index;
+        };
+
+        const run = async () => {
+            // Wait for the first segment to be written
+            while (!cancelled && !(await loadPlaylist().catch(() => false))) {
+                await sleep(PLAYLIST_POLL_MS);
+            }
+            if (cancelled) return;
+            setIsAvailable(true);
+
+            if (video.canPlayType(HLS_MIME)) {
+                video.src = playlistUrl;
+                return;
+            }
+            if (!window.MediaSource || !MediaSource.isTypeSupported(MSE_CODEC)) return;
+
+            const mediaSource = new MediaSource();
+            objectUrl = URL.createObjectURL(mediaSource);
+            video.src = objectUrl;
+            video.addEventListener("seeking", onSeeking);
+            await new Promise((resolve) => mediaSource.addEventListener("sourceopen", resolve, { once: true }));
+            const sourceBuffer = mediaSource.addSourceBuffer(MSE_CODEC);
+            if (playlist.init) {
+                await append(sourceBuffer, await fetchSegment(playlist.init));
+            }
+
+            while (!cancelled) {
+                if (cursor >= playlist.segments.length) {
+                    // Fill in anything skipped over by a seek
+                    const missing = playlist.segments.findIndex((_, i) => !appended.has(i));
+                    cursor = missing >= 0 ? missing : playlist.segments.length;
+                }
+                const segment = playlist.segments[cursor];
+                if (segment && segment.start < video.currentTime + BUFFER_AHEAD_S) {
+                    if (!appended.has(cursor)) {
+                        await append(sourceBuffer, await fetchSegment(segment.uri));
+                        appended.add(cursor);
+                    }
+                    cursor++;
+                    continue;
+                }
+                if (playlist.ended && appended.size === playlist.segments.length) {
+                    if (mediaSource.readyState === "open") mediaSource.endOfStream();
+                    return;
+                }
+                await sleep(PLAYLIST_POLL_MS);
+                if (!playlist.ended) await loadPlaylist().catch(() => false);
+            }
+        };
+
+        run().catch((error) => console.error("Progressive playback failed:", error));
+
+        return () => {
+            cancelled = true;
+            video.removeEventListener("seeking", onSeeking);
+            if (objectUrl) URL.revokeObjectURL(objectUrl);
+        };
+    }, [playlistUrl]);
+
+    return (
+        <video
+            ref={videoRef}
+            controls
+            muted
+            className={className}
+            style={isAvailable ? undefined : { display: "none" }}
+        />
+    );
+}
@@ -31,6 +31,12 @@ interface ZoneSidebarProps {
         match_thresh: number;
         track_buffer: number;
     }) => void;
+    renderVideo: boolean;
+    onRenderVideoChange: (value: boolean) => void;
+    preview: boolean;
+    onPreviewChange: (value: boolean) => void;
+    timeRanges: string;
+    onTimeRangesChange: (value: string) => void;
     onProcess: () => void;
     isProcessing: boolean;
 }
@@ -65,6 +71,12 @@ export function ZoneSidebar({
     onConfidenceChange,
     onModelChange,
     onTrackerConfigChange,
+    renderVideo,
+    onRenderVideoChange,
+    preview,
+    onPreviewChange,
+    timeRanges,
+    onTimeRangesChange,
     onProcess,
     isProcessing,
 }: ZoneSidebarProps) {
@@ -321,6 +333,48 @@ export function ZoneSidebar({
                     </select>
                 </div>
 
+                {/* Output: annotated video, or overlay data drawn over the original */}
+                <label className="mt-4 flex items-center justify-between text-sm cursor-pointer">
+                    <span className="text-secondary-text" title="When off, annotations are drawn over the original video instead (faster processing)">
+                        Render annotated video
+                    </span>
+                    <input
+                        type="checkbox"
+                        checked={renderVideo}
+                        onChange={(e) => onRenderVideoChange(e.target.checked)}
+                        className="accent-text-color cursor-pointer"
+                    />
+                </label>
+
+                {/* Approximate counts within seconds, replaced by the full analysis */}
+                <label className="mt-2 flex items-center justify-between text-sm cursor-pointer">
+                    <span className="text-secondary-text" title="Run a fast low-resolution pass first and show approximate counts while the full analysis runs">
+                        Quick preview first
+                    </span>
+                    <input
+                        type="checkbox"
+                        checked={preview}
+                        onChange={(e) => onPreviewChange(e.target.checked)}
+                        className="accent-text-color cursor-pointer"
+                    />
+                </label>
+
+                {/* Only analyze parts of the video (empty: all of it) */}
+                <div className="mt-4">
+                    <div className="flex justify-between text-sm mb-2">
+                        <span className="text-secondary-text" title="Comma-separated ranges, e.g. 7:00:00-9:00:00, 12:30-13:00. Times in results stay relative to the start of the video">
+                            Time ranges
+                        </span>
+                    </div>
+                    <input
+                        type="text"
+                        value={timeRanges}
+                        placeholder="Whole video"
+                        onChange={(e) => onTimeRangesChange(e.target.value)}
+                        className="w-full bg-btn-bg text-text-color border border-btn-border rounded-lg p-1.5 text-xs"
+                    />
+                </div>
+
                 {/* Advanced Settings */}
                 <div className="mt-4">
                     <button
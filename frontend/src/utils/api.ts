@@ -1,8 +1,11 @@
-import type { Job, ProgressResponse, SystemInfo, Zone, TrackerConfig } from "./types";
+import type { Job, ProgressResponse, SystemInfo, Zone, TrackerConfig, MotionGateConfig, RoiConfig, TimeRange, UploadStatus, OverlayResponse, HeatmapResponse } from "./types";
 
 // API base URL - configure via environment variable
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
+// Consecutive failed chunk attempts before an upload is abandoned
+const UPLOAD_MAX_RETRIES = 5;
+
 /**
  * API client for communicating with the FastAPI backend
  */
@@ -36,22 +39,48 @@ class ApiClient {
     // ============ Jobs API ============
 
     /**
-     * Upload a video file and create a new job
+     * Upload a video file and create a new job.
+     * Uses the resumable chunked protocol: a failed chunk is retried from the
+     * server's last confirmed offset instead of restarting the whole file.
      */
-    async uploadVideo(file: File): Promise<{ taskId: string }> {
-        const formData = new FormData();
-        formData.append("file", file);
-
-        const response = await fetch(`${this.baseUrl}/api/jobs`, {
+    async uploadVideo(
+        file: File,
+        onProgress?: (fraction: number) => void
+    ): Promise<{ taskId: string }> {
+        const upload = await this.request<UploadStatus>("/api/uploads", {
             method: "POST",
-            body: formData,
+            body: JSON.stringify({ filename: file.name, size: file.size }),
         });
 
-        if (!response.ok) {
-            throw new Error("Upload failed");
+        let offset = upload.offset;
+        let failures = 0;
+        while (offset < file.size) {
+            const end = Math.min(offset + upload.chunkSize, file.size);
+            try {
+                const response = await fetch(
+                    `${this.baseUrl}/api/uploads/${upload.uploadId}?offset=${offset}`,
+                    { method: "PUT", body: file.slice(offset, end) }
+                );
+                if (!response.ok && response.status !== 409) {
+                    throw new Error(`Chunk upload failed: ${response.status}`);
+                }
+                // 409 carries the offset the server expects next
+                offset = (await response.json()).offset ?? offset;
+                failures = 0;
+                onProgress?.(offset / file.size);
+            } catch (error) {
+                if (++failures > UPLOAD_MAX_RETRIES) {
+                    throw new Error("Upload failed");
+                }
+                await new Promise((resolve) => setTimeout(resolve, 1000 * failures));
+                const status = await this.request<UploadStatus>(`/api/uploads/${upload.uploadId}`);
+                offset = status.offset;
+            }
         }
 
-        return response.json();
+        return this.request<{ taskId: string }>(`/api/uploads/${upload.uploadId}/complete`, {
+            method: "POST",
+        });
     }
 
     /**
@@ -116,6 +145,11 @@ class ApiClient {
             confidence: number;
             model: string;
             trackerConfig?: TrackerConfig;
+            motionGate?: MotionGateConfig;
+            roi?: RoiConfig;
+            renderVideo?: boolean;
+            preview?: boolean;
+            timeRanges?: TimeRange[];
         }
     ): Promise<{ success: boolean; redirect?: string }> {
         return this.request(`/api/jobs/${taskId}/process`, {
@@ -131,6 +165,13 @@ class ApiClient {
         return this.request<ProgressResponse>(`/api/jobs/${taskId}/progress`);
     }
 
+    /**
+     * Get Server-Sent Events URL for live progress updates
+     */
+    getProgressStreamUrl(taskId: string): string {
+        return `${this.baseUrl}/api/jobs/${taskId}/progress/stream`;
+    }
+
     // ============ Export API ============
 
     /**
@@ -216,12 +257,53 @@ class ApiClient {
         return `${this.baseUrl}/media/${path}`;
     }
 
+    /**
+     * Get URL for the source video frame at a timestamp (seconds),
+     * optionally downscaled to a width in pixels
+     */
+    getFrameUrl(taskId: string, time: number, width?: number): string {
+        const params = new URLSearchParams({ t: time.toFixed(3) });
+        if (width) params.set("width", String(width));
+        return `${this.baseUrl}/api/jobs/${taskId}/frame?${params}`;
+    }
+
+    /**
+     * Get overlay annotations for frames in [start, end) seconds
+     */
+    async getOverlay(taskId: string, start: number, end?: number): Promise<OverlayResponse> {
+        const params = new URLSearchParams({ start: String(start) });
+        if (end !== undefined) params.set("end", String(end));
+        return this.request<OverlayResponse>(`/api/jobs/${taskId}/overlay?${params}`);
+    }
+
+    /**
+     * Get the activity heatmap at a resolution, optionally filtered by class and time range (seconds)
+     */
+    async getHeatmap(
+        taskId: string,
+        options: { resolution?: number; classes?: number[]; start?: number; end?: number } = {}
+    ): Promise<HeatmapResponse> {
+        const params = new URLSearchParams();
+        if (options.resolution) params.set("resolution", String(options.resolution));
+        options.classes?.forEach((classId) => params.append("classes", String(classId)));
+        if (options.start !== undefined) params.set("start", String(options.start));
+        if (options.end !== undefined) params.set("end", String(options.end));
+        return this.request<HeatmapResponse>(`/api/jobs/${taskId}/heatmap?${params}`);
+    }
+
     /**
      * Get output video URL
      */
     getOutputVideoUrl(taskId: string): string {
         return `${this.baseUrl}/media/outputs/output_${taskId}.mp4`;
     }
+
+    /**
+     * Get HLS playlist URL for the output video (written while processing)
+     */
+    getHlsPlaylistUrl(taskId: string): string {
+        return `${this.baseUrl}/media/outputs/hls_${taskId}/index.m3u8`;
+    }
 }
 
 // Export singleton instance
@@ -13,14 +13,43 @@ export interface Job {
   confidence: number;
   model: string;
   trackerConfig: TrackerConfig;
+  motionGate?: MotionGateConfig | null;
+  roi?: RoiConfig | null;
+  renderVideo?: boolean; // False: no annotated video, the overlay data is drawn instead
+  timeRanges?: TimeRange[] | null; // Parts of the video that were analyzed (null: all of it)
+  hasOverlay?: boolean;
   detectionData: DetectionEvent[];
   dwellData: DwellEvent[];
   lineCrossingData: Record<string, LineCrossing>;
   heatmapData: number[][] | null;  // 2D grid for activity heatmap
+  resultQuality?: "preview" | "final" | null; // Which pass the results above come from
+  preview?: PreviewResults | null; // Approximate results of the preview pass, if one ran
+  pipelineStats?: PipelineStats;
   processTime: number;
+  hlsPlaylist?: string | null; // Relative to /media; only when ffmpeg is available
+  contentHash?: string; // SHA-256 of the uploaded video
   sourceType: "file" | "rtsp" | "webcam";
   streamUrl?: string;
   createdAt: string;
+  revision?: number; // Bumped on every write; the response's ETag follows it
+}
+
+// Part of a video to analyze, in seconds from its start
+export interface TimeRange {
+  start: number;
+  end: number;
+}
+
+// Approximate results of the fast low-resolution pass that runs before the full analysis
+export interface PreviewResults {
+  quality: "preview";
+  sampleFps: number;
+  imgsz: number;
+  processTime: number;
+  detectionData: DetectionEvent[];
+  dwellData: DwellEvent[];
+  lineCrossingData: Record<string, LineCrossing>;
+  heatmapData: number[][] | null;
 }
 
 // Zone types
@@ -45,6 +74,50 @@ export interface TrackerConfig {
   track_buffer: number;
 }
 
+// Motion gate (skip inference on static frames)
+export interface MotionGateConfig {
+  enabled: boolean;
+  threshold: number;
+  min_changed_ratio: number;
+  refresh_interval: number;
+  downscale_width: number;
+  zones_only: boolean;
+}
+
+// Zone-aware ROI cropping / tiled inference
+export interface RoiConfig {
+  enabled: boolean;
+  padding: number;
+  tile: boolean;
+  tile_size: number;
+  overlap: number;
+  iou_threshold: number;
+}
+
+// Per-job pipeline statistics
+export interface PipelineStats {
+  motion_gate?: {
+    enabled: boolean;
+    frames_seen: number;
+    frames_skipped: number;
+    skip_ratio: number;
+  };
+  roi?: {
+    region: [number, number, number, number];
+    tiles: number;
+    pixel_ratio: number;
+  };
+  tracks?: {
+    active: number;
+    evicted: number;
+  };
+  track_cache?: {
+    hit: boolean; // true = analytics recomputed from cached tracks (no inference)
+    rows?: number;
+    frames?: number;
+  };
+}
+
 // Detection events
 export interface DetectionEvent {
   time: number;
@@ -81,10 +154,50 @@ export interface SystemInfo {
   version: string;
 }
 
+// Overlay data (annotations drawn over the original video)
+// Box: [centerX, centerY, width, height, trackId, classId, state]
+// state: 0 = not targeted, 1 = detected (red), 2 = counted (green), 3 = in zone / crossing (blue)
+export type OverlayBox = [number, number, number, number, number, number, number];
+
+export interface OverlayFrame {
+  t: number; // Seconds on the source video's timeline
+  boxes: OverlayBox[];
+}
+
+export interface OverlayResponse {
+  fps: number;
+  frameSize: [number, number];
+  frames: OverlayFrame[];
+}
+
+export interface OverlayLayers {
+  boxes: boolean;
+  ids: boolean;
+  dots: boolean;
+  zones: boolean;
+  counts: boolean;
+}
+
+// Heatmap summed from the stored per-class, time-sliced grid
+export interface HeatmapResponse {
+  resolution: number;
+  baseResolution: number;
+  sliceSeconds: number;
+  start: number; // Covered range, widened to whole slices
+  end: number;
+  classes: number[]; // Classes present in the data
+  total: number;
+  max: number;
+  grid: number[][];
+}
+
 // API response types
 export interface ProgressResponse {
   progress: number;
   status: string;
+  fps: number | null; // Only while the job is running on this server
+  eta: number | null; // Seconds remaining (estimate)
+  phase?: "preview" | "final" | null; // Pass currently running (jobs started with a preview)
 }
 
 export interface UploadResponse {
@@ -92,6 +205,14 @@ export interface UploadResponse {
   success: boolean;
 }
 
+export interface UploadStatus {
+  uploadId: string;
+  filename: string;
+  offset: number; // Bytes received so far (where the next chunk starts)
+  size: number;
+  chunkSize: number;
+}
+
 // COCO classes (subset of common ones)
 export const COCO_CLASSES: Record<number, string> = {
   0: "person",